@@ -0,0 +1,63 @@
+import geopandas as gpd
+import pandas as pd
+
+import settings
+from geoio import read_intermediate, write_intermediate
+from instrumentation import parse_profile_flag, step
+from stateAssign import STATUSES, StateIndex, disagreements
+
+# Assigns every herd of Merged_Herd_Population_Location to the state its centroid lies in (stateAssign.py) and
+# reports where that disagrees with the string keys of the herd table ("State Code", "State")
+# Herd centroids are in EPSG:3857 metres (herdAreas.py), the state polygons are projected to it once
+# Herds within settings.state_snap_distance of a state are given that state (simplified coastlines and borders)
+
+# Command line: only --profile (instrumentation.py)
+parse_profile_flag("Assign the herds to states by geometry and check the state keys.")
+
+# File paths
+herd_data_path = settings.merged_herd_location_csv_path
+us_states_path = settings.us_states_path
+herd_states_path = settings.herd_states_path
+
+# ✅ Step 1: Load the herd centroids and the state polygons
+with step("read herds and states") as s:
+    df_herds = read_intermediate(herd_data_path)
+    df_herds = df_herds.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+    gdf_states = gpd.read_file(us_states_path)
+    s.rows_out = len(df_herds)
+
+# ✅ Step 2: One bulk STRtree query for all centroids (a centroid on a border keeps the state of its key)
+key_column = "State Code" if "State Code" in df_herds.columns else "State"
+with step("assign herds to states", rows_in=len(df_herds)) as s:
+    index = StateIndex(gdf_states)
+    position, matches = index.locate(df_herds["longitude"], df_herds["latitude"],
+                                     max_distance=settings.state_snap_distance,
+                                     prefer=index.key_codes(df_herds[key_column]))
+    assigned = pd.Series(index.codes[position], dtype=object).where(position >= 0)
+    s.rows_out = int((position >= 0).sum())
+    s.extra.update(states=len(index), on_border=int((matches > 1).sum()),
+                   snapped=int(((matches == 0) & (position >= 0)).sum()))
+
+# ✅ Step 3: Compare with the string keys of the herd table
+df_states = df_herds[[c for c in ["Herd Code", "Herd Name", "State", "State Code"] if c in df_herds.columns]].copy()
+df_states["Assigned State"] = assigned
+df_states["States At Centroid"] = matches
+df_states["State Check"] = disagreements(index, df_herds[key_column], assigned)
+
+counts = df_states["State Check"].value_counts().reindex(STATUSES, fill_value=0)
+print(f"✅ {len(df_states)} herds assigned to {df_states['Assigned State'].nunique()} states by geometry, "
+      f"compared with '{key_column}':")
+for status, count in counts.items():
+    print(f"   - {status}: {count}")
+if (matches > 1).any():
+    print(f"   ({(matches > 1).sum()} centroids lie in more than one state polygon, on a border)")
+
+conflicts = df_states[df_states["State Check"] != "agrees"]
+if len(conflicts):
+    print(f"⚠️ {len(conflicts)} herds disagree with '{key_column}':")
+    print(conflicts.head(20).to_string(index=False))
+
+# ✅ Step 4: Save the assignment next to the herd table
+with step("write herd states", rows_in=len(df_states)):
+    output_path = write_intermediate(df_states, herd_states_path)
+print(f"✅ Herd states saved to: {output_path}")
@@ -0,0 +1,2 @@
+# Benchmarks for the DataLamp hot paths, run from the repository root, e.g.:
+#   python -m benchmarks.bench_overlap
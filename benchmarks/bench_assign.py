@@ -0,0 +1,86 @@
+import argparse
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import Point
+
+from benchmarks.synthetic import herd_locations, state_boundaries
+from stateAssign import StateIndex, disagreements
+
+# Assigning herd centroids to the state polygons: testing every point against every state (one shapely call per
+# pair), a GeoPandas sjoin, and the bulk STRtree query of stateAssign.py, with detailed (--vertices) boundaries
+# The synthetic states overlap a little, like points on a shared border: all variants must give the first state in
+# state order, and with 5% of the state keys swapped, disagreements() must flag exactly the rows whose key is none of
+# the states at the centroid
+
+
+def with_loop(states, x, y):
+    geometries = list(shapely.from_wkb(shapely.to_wkb(states.geometry.to_numpy())))  # not prepared by StateIndex
+    codes = states["stusab"].to_numpy(dtype=object)
+    assigned = np.full(len(x), None, dtype=object)
+    for i, (px, py) in enumerate(zip(x, y)):
+        point = Point(px, py)
+        for code, geometry in zip(codes, geometries):
+            if geometry.intersects(point):
+                assigned[i] = code
+                break
+    return assigned
+
+
+def with_sjoin(states, x, y):
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y), crs=states.crs)
+    joined = gpd.sjoin(points, states[["stusab", "geometry"]], predicate="intersects", how="left")
+    return joined.sort_values("index_right", kind="stable").groupby(level=0)["stusab"].first().reindex(
+        points.index).to_numpy(dtype=object), joined
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the geometric state assignment.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--vertices", type=int, nargs="+", default=[300, 20_000], help="vertices per state")
+    parser.add_argument("--loop-max", type=int, default=10_000, help="largest size of the per-point loop")
+    args = parser.parse_args()
+
+    print(f"{'Vertices':>8} {'Points':>7} {'loop [s]':>9} {'sjoin [s]':>10} {'STRtree [s]':>12} {'speedup':>8}")
+    for n_vertices in args.vertices:
+        states = gpd.GeoDataFrame(pd.concat(state_boundaries(n_vertices).values(), ignore_index=True),
+                                  crs="EPSG:4326").to_crs("EPSG:3857")
+        for n in args.sizes:
+            herds = herd_locations(n)
+            x, y = herds["longitude"].to_numpy(), herds["latitude"].to_numpy()
+            (expected, joined), sjoin_seconds = timed(with_sjoin, states, x, y)
+            assigned, strtree_seconds = timed(lambda: StateIndex(states).assign(x, y))
+            assert pd.Series(assigned).equals(pd.Series(expected)), "STRtree and sjoin assign different states"
+            loop = "-"
+            if n <= args.loop_max:
+                looped, loop_seconds = timed(with_loop, states, x, y)
+                assert pd.Series(looped).equals(pd.Series(expected)), "loop and sjoin assign different states"
+                loop = f"{loop_seconds:.3f}"
+
+            # Swap 5% of the keys to another state, only keys that are none of the states at the centroid disagree
+            rng = np.random.default_rng(0)
+            keys = herds["State Code"].to_numpy(dtype=object).copy()
+            swapped = rng.random(n) < 0.05
+            keys[swapped] = rng.choice(states["stusab"].to_numpy(dtype=object), swapped.sum())
+            index = StateIndex(states)
+            status = disagreements(index, keys, index.assign(x, y, prefer=index.key_codes(keys)))
+            at_centroid = joined.groupby(level=0)["stusab"].agg(set).reindex(range(n))
+            expected_agrees = np.array([key in codes for key, codes in zip(keys, at_centroid)])
+            assert np.array_equal(np.asarray(status == "agrees"), expected_agrees), "disagreements differ"
+
+            speedup = sjoin_seconds / strtree_seconds
+            print(f"{n_vertices:>8} {n:>7} {loop:>9} {sjoin_seconds:>10.3f} {strtree_seconds:>12.3f} {speedup:>7.1f}x")
+    print("✅ STRtree, sjoin and the loop assign the same states, disagreements() flags the swapped keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_formats import synthetic_herd_areas
+from centroids import centroid_coords
+
+# Centroids of the herd-area polygons: reprojecting every polygon to EPSG:3857 and back (the original scripts)
+# vs. centroids.py (centroids in the layer's CRS, only the points are transformed)
+# Reports the time of both and the distance between their centroids in EPSG:3857 metres
+
+
+def original_centroids(gdf):
+    projected = gdf.to_crs(epsg=3857)
+    x, y = projected.geometry.centroid.x.values, projected.geometry.centroid.y.values
+    projected.to_crs(epsg=4326)
+    return x, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark herd-area centroid computation.")
+    parser.add_argument("--herd-areas", type=int, nargs="+", default=[500, 2000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'polygons':>8} {'original [s]':>13} {'centroids.py [s]':>17} {'memoized [ms]':>14} "
+          f"{'median err [m]':>15} {'max err [m]':>12}")
+    for n in args.herd_areas:
+        # The BLM layer comes in geographic NAD83 coordinates
+        gdf = synthetic_herd_areas(n).to_crs(epsg=4269)
+
+        start = time.perf_counter()
+        reference_x, reference_y = original_centroids(gdf)
+        original_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        x, y = centroid_coords(gdf, "EPSG:3857")
+        fast_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        centroid_coords(gdf, "EPSG:3857")
+        memo_time = time.perf_counter() - start
+
+        # EPSG:3857 metres are stretched by 1 / cos(latitude), convert the error to metres on the ground
+        latitude = np.degrees(2 * np.arctan(np.exp(reference_y / 6378137.0)) - np.pi / 2)
+        error = np.hypot(x - reference_x, y - reference_y) * np.cos(np.radians(latitude))
+        print(f"{n:>8} {original_time:>13.3f} {fast_time:>17.3f} {memo_time * 1000:>14.3f} "
+              f"{np.median(error):>15.1f} {error.max():>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
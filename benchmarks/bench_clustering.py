@@ -0,0 +1,55 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_herds
+from clustering import cluster, hdbscan_memory, sweep
+
+# Parameter sweeps with the clustering module
+# An HDBSCAN sweep over min_cluster_size with a fresh model per combination vs. sweep() with the cached spanning
+# trees (the labels must be identical), and single runs of every method for comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clustering sweeps (cached HDBSCAN trees).")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--min-cluster-sizes", type=int, nargs="+", default=[5, 8, 10, 15, 20, 30, 50, 80])
+    parser.add_argument("--min-samples", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_herds(args.points)
+    coords = np.column_stack((df["longitude"], df["latitude"]))
+    grid = {"min_cluster_size": args.min_cluster_sizes, "min_samples": [args.min_samples]}
+
+    start = time.perf_counter()
+    fresh = [cluster(coords, "hdbscan", min_cluster_size=m, min_samples=args.min_samples)
+             for m in args.min_cluster_sizes]
+    fresh_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        cached = sweep(coords, "hdbscan", grid, memory=hdbscan_memory(folder))
+        cached_time = time.perf_counter() - start
+
+    for labels, result in zip(fresh, cached):
+        assert np.array_equal(labels, result["labels"]), f"labels differ for {result['params']}"
+
+    print(f"{len(coords)} points, {len(args.min_cluster_sizes)} values of min_cluster_size")
+    print(f"HDBSCAN sweep, fresh model per value: {fresh_time:8.2f} s")
+    print(f"HDBSCAN sweep, cached trees:          {cached_time:8.2f} s ({fresh_time / cached_time:.1f}x), identical labels")
+    for result in cached:
+        print(f"  min_cluster_size={result['params']['min_cluster_size']:<4} {result['clusters']:>5} clusters, "
+              f"{result['noise']:>6} noise, {result['seconds']:.2f} s")
+
+    print(f"\n{'method':<10} {'time [s]':>9} {'clusters':>9}")
+    for method, params in [("kmeans", {"n_clusters": 50}), ("minibatch", {"n_clusters": 50}),
+                           ("grid", {"cell_size": 20000})]:
+        start = time.perf_counter()
+        labels = cluster(coords, method, **params)
+        print(f"{method:<10} {time.perf_counter() - start:>9.3f} {len(np.unique(labels)):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import time
+
+import numpy as np
+import shapely
+
+from benchmarks.synthetic import herd_areas, state_boundary
+from clustering import cluster
+from pointSampling import allocate_points, sample_points_in_herds, sample_points_in_polygon
+
+# Population-proportional point densities (pointSampling.py, settings.point_density) at 1k, 10k and 100k points per
+# state: sampling uniform in the state and spread over the herd areas, then clustering with HDBSCAN on all points vs.
+# "hdbscan_sample" (HDBSCAN on --sample-size points, labels passed on to the nearest sampled point) and the grid
+# The state is synthetic Nevada (benchmarks/synthetic.py) with detailed boundaries and its herd areas
+# Times are also given per point, they should stay about flat from 1k to 100k (near-linear); the agreement of the
+# sampled labels with the full HDBSCAN labels is the adjusted Rand index. Checks: the herd points add up per herd and
+# lie inside their herd area, and with at most sample_size points "hdbscan_sample" is plain HDBSCAN
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def nevada(n_vertices, n_herds, seed=0):
+    state = state_boundary("NV", n_vertices, seed).geometry.iloc[0]
+    herds = herd_areas(n_herds, seed=seed)
+    herds = herds[herds["State"] == "NV"].reset_index(drop=True)
+    populations = np.random.default_rng(seed).lognormal(5, 1.2, len(herds))
+    return state, herds.geometry.to_numpy(), populations
+
+
+def check_herd_points(herd_geometries, populations, seed=0):
+    """Every herd gets its share of the points, and they lie inside it."""
+    counts = allocate_points(5000, populations)
+    assert counts.sum() == 5000, "allocated counts do not add up"
+    coords = sample_points_in_herds(herd_geometries, populations, 5000, seed)
+    assert len(coords) == 5000, "wrong number of herd points"
+    start = 0
+    for geometry, count in zip(herd_geometries, counts):
+        assert shapely.contains_xy(geometry, coords[start:start + count, 0], coords[start:start + count, 1]).all(), \
+            "herd point outside its herd area"
+        start += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark population-proportional sampling and clustering.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--vertices", type=int, default=2000, help="vertices of the state boundary")
+    parser.add_argument("--herds", type=int, default=600, help="herd areas of all states (NV gets about a fifth)")
+    parser.add_argument("--sample-size", type=int, default=5000)
+    parser.add_argument("--full-max", type=int, default=100_000, help="largest size clustered with full HDBSCAN")
+    args = parser.parse_args()
+    from sklearn.metrics import adjusted_rand_score
+
+    state, herd_geometries, populations = nevada(args.vertices, args.herds)
+    check_herd_points(herd_geometries, populations)
+    small = sample_points_in_polygon(state, min(args.sample_size, 2000), 0)
+    assert np.array_equal(cluster(small, "hdbscan", min_cluster_size=5, min_samples=3),
+                          cluster(small, "hdbscan_sample", sample_size=args.sample_size, min_cluster_size=5,
+                                  min_samples=3)), "hdbscan_sample differs from HDBSCAN below the sample size"
+    cluster(small, "hdbscan")  # imports hdbscan before the timings
+
+    print(f"Nevada, {args.vertices} vertices, {len(herd_geometries)} herd areas, sample size {args.sample_size}\n")
+    print(f"{'Points':>7} {'Step':<22} {'Time [s]':>9} {'us/point':>9} {'Clusters':>9} {'ARI':>6}")
+    for n in args.sizes:
+        uniform, uniform_time = timed(lambda: sample_points_in_polygon(state, n, 1))
+        herd_points, herd_time = timed(lambda: sample_points_in_herds(herd_geometries, populations, n, 1))
+        rows = [("sample uniform", uniform_time, None, None), ("sample herds", herd_time, None, None)]
+
+        full = None
+        if n <= args.full_max:
+            full, seconds = timed(lambda: cluster(herd_points, "hdbscan", min_cluster_size=5, min_samples=3))
+            rows.append(("HDBSCAN", seconds, full, None))
+        sampled, seconds = timed(lambda: cluster(herd_points, "hdbscan_sample", sample_size=args.sample_size,
+                                                 min_cluster_size=5, min_samples=3))
+        rows.append(("HDBSCAN sample", seconds, sampled, adjusted_rand_score(full, sampled) if full is not None
+                     else None))
+        labels, seconds = timed(lambda: cluster(herd_points, "grid", cell_size=0.25))
+        rows.append(("grid 0.25 deg", seconds, labels, None))
+
+        for name, seconds, labels, ari in rows:
+            clusters = f"{len(set(np.unique(labels).tolist()) - {-1})}" if labels is not None else "-"
+            print(f"{n:>7} {name:<22} {seconds:>9.3f} {seconds / n * 1e6:>9.2f} {clusters:>9} "
+                  f"{f'{ari:.2f}' if ari is not None else '-':>6}")
+    print("✅ Herd points add up per herd and lie in their herd areas, small states are clustered by plain HDBSCAN")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import Polygon
+
+from geoio import read_intermediate, write_intermediate
+
+# Load/save timings and file sizes of the intermediate formats (GeoJSON/CSV vs. GeoParquet vs. Feather)
+# on the repo's state and cluster files and on a synthetic herd-area polygon layer
+
+
+def repo_frames():
+    frames = {}
+    states = [gpd.read_file(p) for p in sorted(glob.glob("States_Separated/*.geojson"))]
+    if states:
+        frames["States_Separated (all states)"] = pd.concat(states, ignore_index=True)
+    clustered = [gpd.read_file(p) for p in sorted(glob.glob("Clustered_States_Dots/*.geojson"))]
+    if clustered:
+        frames["Clustered_States_Dots (all states)"] = pd.concat(clustered, ignore_index=True)
+    return frames
+
+
+def synthetic_herd_areas(n, seed=0):
+    """Herd-area-like polygons (a few hundred vertices each) with the BLM attribute columns."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, 300, endpoint=False)
+    polygons = []
+    for _ in range(n):
+        radius = rng.uniform(0.05, 0.4) * (1 + 0.2 * rng.standard_normal(len(angles))).clip(0.5, 1.5)
+        centre = (rng.uniform(-120, -104), rng.uniform(32, 48))
+        polygons.append(Polygon(np.column_stack((centre[0] + radius * np.cos(angles),
+                                                 centre[1] + radius * np.sin(angles)))))
+    return gpd.GeoDataFrame({
+        "ADMIN_ST": rng.choice(["AZ", "CA", "NV", "OR", "UT", "WY"], n),
+        "HA_NAME": [f"Herd Area {i}" for i in range(n)],
+        "HA_NO": [f"NV{i:04d}" for i in range(n)],
+        "Longitude": rng.uniform(-1.3e7, -1.1e7, n),
+        "Latitude": rng.uniform(3.8e6, 6.0e6, n),
+    }, geometry=polygons, crs="EPSG:4326")
+
+
+def time_format(df, fmt, folder, repeats):
+    path = os.path.join(folder, "frame.geojson")
+    start = time.perf_counter()
+    for _ in range(repeats):
+        out_path = write_intermediate(df, path, fmt)
+    save = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        read_intermediate(path, fmt)
+    load = (time.perf_counter() - start) / repeats
+    return save, load, os.path.getsize(out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GeoJSON vs. GeoParquet vs. Feather intermediates.")
+    parser.add_argument("--herd-areas", type=int, default=2000, help="polygons in the synthetic herd-area layer")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = repo_frames()
+    frames[f"synthetic herd areas ({args.herd_areas} polygons)"] = synthetic_herd_areas(args.herd_areas)
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name, df in frames.items():
+            print(f"\n{name}: {len(df)} rows")
+            print(f"{'format':<9} {'save [s]':>9} {'load [s]':>9} {'size [MB]':>10}")
+            for fmt in ("geojson", "parquet", "feather"):
+                save, load, size = time_format(df, fmt, folder, args.repeats)
+                print(f"{fmt:<9} {save:>9.3f} {load:>9.3f} {size / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
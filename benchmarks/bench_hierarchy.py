@@ -0,0 +1,93 @@
+import argparse
+import itertools
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_merge import load_herds
+from benchmarks.synthetic import build_gdf, make_herds
+from dotMerging import DotMerger
+from mergeHierarchy import MergeHierarchy
+
+# Cuts through the merge hierarchy vs. a full DotMerger run for every parameter set of the grid
+# Every cut must give the same dots as DotMerger.run (coordinates, counts, radii, labels, iteration and merge pass
+# counts, converged) bit for bit; the times are for the whole grid: one run per parameter set, or one hierarchy per
+# (merge_threshold, growth_step) with a cut per max_outer_iterations, and the same cuts from the saved hierarchies
+# The default populations are scaled down so the runs take several growth iterations
+
+
+def check_equal(merger, cut, params):
+    for name in ("x", "y", "count", "radius", "labels"):
+        assert np.array_equal(getattr(merger, name), getattr(cut, name)), f"{name} differs for {params}"
+        assert getattr(merger, name).dtype == getattr(cut, name).dtype, f"{name} dtype differs for {params}"
+    for name in ("outer_iterations", "merge_passes", "converged"):
+        assert getattr(merger, name) == getattr(cut, name), f"{name} differs for {params}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check cuts through the merge hierarchy.")
+    parser.add_argument("--csv", help="Merged_Herd_Population_Location.csv; synthetic herds are used if omitted")
+    parser.add_argument("--herds", type=int, default=5000)
+    parser.add_argument("--population-scale", type=float, default=0.01,
+                        help="factor on the herd populations; small populations merge over more growth iterations")
+    parser.add_argument("--merge-thresholds", type=float, nargs="+", default=[1.0, 1.10, 1.25])
+    parser.add_argument("--growth-steps", type=float, nargs="+", default=[30, 100, 300])
+    parser.add_argument("--max-outer-iterations", type=int, nargs="+", default=[0, 1, 2, 3, 5, 8, 12, 20, 30])
+    args = parser.parse_args()
+
+    df = load_herds(args.csv) if args.csv else make_herds(args.herds)
+    df["Total Population"] = np.round(df["Total Population"] * args.population_scale)
+    gdf = build_gdf(df)
+    x, y = gdf.geometry.x.values, gdf.geometry.y.values
+    count, radius = gdf["count"].values, gdf["radius"].values
+    deepest = max(args.max_outer_iterations)
+    grid = list(itertools.product(args.merge_thresholds, args.growth_steps))
+
+    start = time.perf_counter()
+    runs = {}
+    for threshold, growth_step in grid:
+        for iterations in args.max_outer_iterations:
+            merger = DotMerger(x, y, count, radius, threshold=threshold, growth_step=growth_step)
+            runs[threshold, growth_step, iterations] = merger.run(iterations, verbose=False)
+    run_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        levels = {}
+        for threshold, growth_step in grid:
+            hierarchy, _ = MergeHierarchy.load_or_build(x, y, count, radius, threshold, growth_step, deepest, folder)
+            levels[threshold, growth_step] = hierarchy.levels
+            for iterations in args.max_outer_iterations:
+                key = (threshold, growth_step, iterations)
+                check_equal(runs[key], hierarchy.cut(iterations), key)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for threshold, growth_step in grid:
+            hierarchy, status = MergeHierarchy.load_or_build(x, y, count, radius, threshold, growth_step, deepest,
+                                                             folder)
+            assert status == "loaded"
+            for iterations in args.max_outer_iterations:
+                key = (threshold, growth_step, iterations)
+                check_equal(runs[key], hierarchy.cut(iterations), key)
+        load_time = time.perf_counter() - start
+
+    # A hierarchy built for one growth iteration resumes the run for the deeper cuts
+    for threshold, growth_step in grid:
+        hierarchy = MergeHierarchy(x, y, count, radius, threshold, growth_step).extend(1)
+        for iterations in args.max_outer_iterations:
+            key = (threshold, growth_step, iterations)
+            check_equal(runs[key], hierarchy.cut(iterations), key)
+
+    print(f"{len(x)} herds, {len(grid)} (merge_threshold, growth_step) pairs x "
+          f"{len(args.max_outer_iterations)} values of max_outer_iterations")
+    print(f"levels per pair: {', '.join(f'{t}/{g}: {n}' for (t, g), n in levels.items())}")
+    print(f"DotMerger.run per parameter set:   {run_time:8.2f} s")
+    print(f"hierarchy per pair + cuts:         {build_time:8.2f} s ({run_time / build_time:.1f}x)")
+    print(f"saved hierarchies + cuts:          {load_time:8.2f} s ({run_time / load_time:.1f}x)")
+    print("✅ Every cut (built, saved and resumed) is identical to DotMerger.run")
+
+
+if __name__ == "__main__":
+    main()
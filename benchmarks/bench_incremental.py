@@ -0,0 +1,83 @@
+import argparse
+import time
+
+import numpy as np
+
+import settings
+from benchmarks.bench_merge import load_herds
+from benchmarks.synthetic import build_gdf, make_herds
+from dotMerging import DotMerger
+from mergeNeighbourhoods import NeighbourhoodMerge, same_dots
+
+# Incremental dot merging (mergeNeighbourhoods.py) after a yearly update of the herds vs. a full DotMerger run
+# The herds are merged once to get the snapshot of the "last run", then --changed random herds are updated (new
+# counts), added (missing from the last run) or removed (only in the last run), and the dots are merged again, reusing
+# the unchanged neighbourhoods; the result must be identical to DotMerger.run on the new herds (coordinates, counts,
+# radii, labels, iteration and merge pass counts). Below --min-dots (settings.incremental_min_dots) both are a full run
+
+
+def changed_herds(kind, x, y, count, radius, changed, rng):
+    """The herds of the last run and the new herds after updating, adding or removing ``changed`` random herds."""
+    herds = rng.choice(len(count), min(changed, len(count)), replace=False)
+    dots = (x, y, count, radius)
+    if kind == "update":
+        updated = count.copy()
+        updated[herds] += rng.integers(1, 10, len(herds))
+        return dots, (x, y, updated, radius), len(herds)
+    kept = np.setdiff1d(np.arange(len(count)), herds)
+    fewer = tuple(values[kept] for values in dots)
+    return (fewer, dots, len(herds)) if kind == "add" else (dots, fewer, len(herds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check the incremental dot merge.")
+    parser.add_argument("--csv", help="Merged_Herd_Population_Location.csv; synthetic herds are used if omitted")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[180, 1000, 5000, 20000])
+    parser.add_argument("--population-scale", type=float, default=0.01,
+                        help="factor on the herd populations; large populations join everything into one neighbourhood")
+    parser.add_argument("--changed", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--kinds", nargs="+", choices=["update", "add", "remove"], default=["update", "add", "remove"])
+    parser.add_argument("--growth-step", type=float, default=30)
+    parser.add_argument("--merge-threshold", type=float, default=1.10)
+    parser.add_argument("--max-outer-iterations", type=int, default=30)
+    parser.add_argument("--min-dots", type=int, default=settings.incremental_min_dots,
+                        help="fewer dots are merged in full")
+    args = parser.parse_args()
+    params = dict(threshold=args.merge_threshold, growth_step=args.growth_step,
+                  max_outer_iterations=args.max_outer_iterations, min_dots=args.min_dots)
+
+    inputs = [load_herds(args.csv)] if args.csv else [make_herds(n) for n in args.sizes]
+    print(f"{'Herds':>7} {'Change':<6} {'Herds':>5} {'Neighb.':>7} {'Reused':>7} {'Full [s]':>9} {'Incr. [s]':>9} "
+          f"{'Speedup':>8}")
+    for df in inputs:
+        df["Total Population"] = np.round(df["Total Population"] * args.population_scale)
+        gdf = build_gdf(df)
+        dots = (gdf.geometry.x.values, gdf.geometry.y.values, gdf["count"].values, gdf["radius"].values)
+
+        rng = np.random.default_rng(0)
+        for kind in args.kinds:
+            for changed in args.changed:
+                last, new, n_changed = changed_herds(kind, *dots, changed, rng)
+                previous = NeighbourhoodMerge(*last, **params)
+                previous.run()
+                snapshot = previous.snapshot()
+
+                start = time.perf_counter()
+                full = DotMerger(*new, threshold=args.merge_threshold, growth_step=args.growth_step)
+                full.run(args.max_outer_iterations, verbose=False)
+                full_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                merge = NeighbourhoodMerge(*new, **params)
+                merger = merge.run(snapshot)
+                incremental_time = time.perf_counter() - start
+
+                assert same_dots(full, merger), \
+                    f"incremental merge differs for {len(new[0])} herds, {n_changed} herds {kind}d"
+                print(f"{len(new[0]):>7} {kind:<6} {n_changed:>5} {len(merge):>7} {merge.reused:>7} {full_time:>9.3f} "
+                      f"{incremental_time:>9.3f} {full_time / incremental_time:>7.1f}x")
+    print("✅ Every incremental merge is identical to DotMerger.run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+import settings
+from benchmarks.synthetic import STATES, herd_locations
+from excelIngest import parse_count_columns, read_excel_cached, stream_excel
+
+# Excel ingestion: pd.read_excel + three string passes (the original cleanPopulation.py) vs. the streamed,
+# column-selected read + one-pass count parsing of excelIngest.py, and the cached second read
+# Time and peak traced memory (tracemalloc) per variant; all variants must give the same table
+
+POPULATION_COLUMNS = ["Unnamed: 0", "Estimated Populations", "Unnamed: 9", "Unnamed: 10"]
+HERD_COLUMNS = ["State", "State Code", "Herd Name", "Herd Code", "Horses", "Burros", "Total Population"]
+
+
+def write_statistics_workbook(path, years, seed=0):
+    """BLM-statistics-like sheet: two metadata rows, a partly empty header, one block of state rows per year
+    with counts as "12,345" strings, TOTAL rows, notes and empty separator rows."""
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Bureau of Land Management - Herd Area and Herd Management Area Statistics"])
+    ws.append(["As of March 1"])
+    ws.append([None, "HMA Acres BLM", "HMA Acres Other", "HMA Total", "HA Acres BLM", "HA Acres Other", "HA Total",
+               "AML", "Estimated Populations", None, None, "Percent of AML"])
+    for year in range(years):
+        for state in STATES:
+            horses, burros = int(rng.integers(0, 40000)), int(rng.integers(0, 5000))
+            acres = rng.integers(10_000, 20_000_000, 6)
+            ws.append([state, *[f"{a:,}" for a in acres], int(rng.integers(100, 20000)), f"{horses:,}",
+                       f"{burros:,}" if burros else 0, f"{horses + burros:,}", float(rng.uniform(50, 400))])
+        ws.append(["TOTAL", None, None, None, None, None, None, None, "1,234,567", "12,345", "1,246,912"])
+        ws.append(["Population estimates as of March 1, " + str(2000 + year)])
+        ws.append([])
+    wb.save(path)
+
+
+def write_herd_workbook(path, n_herds, seed=0):
+    df = herd_locations(n_herds, seed).drop(columns=["latitude", "longitude"])
+    df["HMA Acres"] = np.random.default_rng(seed).integers(1000, 2_000_000, len(df))
+    df["Notes"] = "Estimated"
+    df.to_excel(path, index=False)
+
+
+def clean_original(path):
+    df = pd.read_excel(path, skiprows=2)
+    df = df.rename(columns={"Unnamed: 0": "State", "Estimated Populations": "Horses", "Unnamed: 9": "Burros",
+                            "Unnamed: 10": "Total Population"})
+    df = df[["State", "Horses", "Burros", "Total Population"]]
+    df = df.dropna(subset=["State"])
+    df = df[~df["State"].str.contains("TOTAL|March", na=False)]
+    for column in ["Horses", "Burros", "Total Population"]:
+        df[column] = df[column].astype(str).str.replace(",", "").astype(float).astype(int)
+    return df
+
+
+def clean_streamed(path, read):
+    df = read(path, skiprows=2, usecols=POPULATION_COLUMNS)
+    df = df.rename(columns={"Unnamed: 0": "State", "Estimated Populations": "Horses", "Unnamed: 9": "Burros",
+                            "Unnamed: 10": "Total Population"})
+    df = df[["State", "Horses", "Burros", "Total Population"]]
+    df = df.dropna(subset=["State"])
+    df = df[~df["State"].str.contains("TOTAL|March", na=False)].copy()
+    return parse_count_columns(df, ["Horses", "Burros", "Total Population"])
+
+
+def traced(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def report(name, seconds, peak):
+    print(f"{name:<34} {seconds:>9.3f} {peak / 1e6:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Excel ingestion of cleanPopulation.py and mergeHerdData.py.")
+    parser.add_argument("--years", type=int, default=200, help="yearly blocks in the synthetic statistics workbook")
+    parser.add_argument("--herds", type=int, default=20000, help="rows of the synthetic Herd_Population.xlsx")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        settings.cache_dir = os.path.join(folder, "cache")
+        statistics_path = os.path.join(folder, "statistics.xlsx")
+        herd_path = os.path.join(folder, "herds.xlsx")
+        write_statistics_workbook(statistics_path, args.years)
+        write_herd_workbook(herd_path, args.herds)
+
+        print(f"{'variant':<34} {'time [s]':>9} {'peak mem [MB]':>14}")
+        reference, seconds, peak = traced(lambda: clean_original(statistics_path))
+        report(f"population, original ({len(reference)} rows)", seconds, peak)
+        streamed, seconds, peak = traced(lambda: clean_streamed(statistics_path, stream_excel))
+        report("population, streamed + one pass", seconds, peak)
+        cached, seconds, peak = traced(lambda: clean_streamed(statistics_path, read_excel_cached))
+        report("population, first cached read", seconds, peak)
+        cached, seconds, peak = traced(lambda: clean_streamed(statistics_path, read_excel_cached))
+        report("population, cached", seconds, peak)
+        for result in (streamed, cached):
+            pd.testing.assert_frame_equal(result, reference, check_dtype=False)
+            assert (result.dtypes.iloc[1:] == np.int64).all()
+
+        reference, seconds, peak = traced(lambda: pd.read_excel(herd_path)[HERD_COLUMNS])
+        report(f"herds, pd.read_excel ({len(reference)} rows)", seconds, peak)
+        streamed, seconds, peak = traced(lambda: stream_excel(herd_path, usecols=HERD_COLUMNS))
+        report("herds, streamed", seconds, peak)
+        read_excel_cached(herd_path, usecols=HERD_COLUMNS)
+        cached, seconds, peak = traced(lambda: read_excel_cached(herd_path, usecols=HERD_COLUMNS))
+        report("herds, cached", seconds, peak)
+        pd.testing.assert_frame_equal(streamed, reference)
+        pd.testing.assert_frame_equal(cached, reference)
+
+        # All columns, without usecols, must match too
+        pd.testing.assert_frame_equal(stream_excel(statistics_path, skiprows=2), pd.read_excel(statistics_path, skiprows=2))
+        print("✅ Streamed and cached tables are identical to pd.read_excel")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+import settings
+from benchmarks.synthetic import named_herds
+from herdMatching import HerdNameMatcher, clean_herd_name, find_best_match
+
+# Fuzzy herd-name matching: blocked HerdNameMatcher vs. the original extractOne over all herd-area names
+# The original is timed on a sample of rows (it is O(rows x choices)) and extrapolated to all rows
+# Checks, on the sampled synthetic rows and (with --real) on all rows of Herd_Population.xlsx against the herd areas
+# of the GDB: rapidfuzz's rounded WRatio over all names gives exactly the matches of fuzzywuzzy's extractOne, and
+# blocking by state only changes the rows whose original match is a herd area of another state
+
+def check_matches(areas, population, reference, unblocked, blocked):
+    """Asserts that the matcher reproduces the original matches; returns the rows changed by blocking."""
+    names = population["Herd Name Cleaned"].to_numpy(dtype=object)
+    differ = [(name, old, new) for name, old, new in zip(names, reference, unblocked) if old != new]
+    assert not differ, f"HerdNameMatcher and extractOne differ for {len(differ)} names, e.g. {differ[:5]}"
+
+    # Blocking only drops the herd areas of other states, whose names can win for a misspelt or mislabelled row
+    area_states = areas.groupby("HA_NAME Cleaned")["ADMIN_ST"].agg(set)
+    in_state = np.array([old is not None and state in area_states[old]
+                         for old, state in zip(reference, population["State Code"])], dtype=bool)
+    differ = [(name, old, new) for name, old, new, keep in zip(names, reference, blocked, in_state)
+              if keep and old != new]
+    assert not differ, f"blocking changes {len(differ)} matches within the state, e.g. {differ[:5]}"
+    return int(sum(old != new for old, new in zip(reference, blocked)))
+
+
+def real_names():
+    """Herd names of Herd_Population.xlsx and the herd-area names of the GDB, like mergeHerdData.py."""
+    from excelIngest import read_excel
+    from herdAreas import load_herd_centroids
+
+    population = read_excel(settings.herd_population_excel_path, usecols=["State Code", "Herd Name"])
+    areas = load_herd_centroids()
+    return areas[["ADMIN_ST", "HA_NAME"]], population.dropna(subset=["Herd Name"]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy herd-name matching.")
+    parser.add_argument("--herds", type=int, default=1800, help="number of herds (about 10x the BLM herd count)")
+    parser.add_argument("--reference-rows", type=int, default=100, help="rows timed with the original matcher")
+    parser.add_argument("--real", action="store_true",
+                        help="also check all rows of Herd_Population.xlsx against the herd areas of the GDB")
+    args = parser.parse_args()
+
+    areas, population = named_herds(args.herds)
+    areas["HA_NAME Cleaned"] = areas["HA_NAME"].apply(clean_herd_name)
+    population["Herd Name Cleaned"] = population["Herd Name"].apply(clean_herd_name)
+
+    start = time.perf_counter()
+    matcher = HerdNameMatcher(areas["HA_NAME Cleaned"], areas["ADMIN_ST"], threshold=80)
+    blocked = matcher.match(population["Herd Name Cleaned"], population["State Code"])
+    blocked_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    unblocked = HerdNameMatcher(areas["HA_NAME Cleaned"], threshold=80).match(population["Herd Name Cleaned"])
+    unblocked_time = time.perf_counter() - start
+
+    sample = population.head(args.reference_rows)
+    start = time.perf_counter()
+    reference = sample["Herd Name Cleaned"].apply(
+        lambda name: find_best_match(name, areas["HA_NAME Cleaned"].unique())
+    ).values
+    reference_time = (time.perf_counter() - start) / len(sample) * len(population)
+
+    changed = check_matches(areas, sample, reference, unblocked[:len(sample)], blocked[:len(sample)])
+    matched = np.mean([m is not None for m in blocked])
+
+    print(f"{len(population)} herd rows x {areas['HA_NAME Cleaned'].nunique()} herd-area names")
+    print(f"original extractOne (extrapolated): {reference_time:8.2f} s")
+    print(f"HerdNameMatcher, all names:         {unblocked_time:8.2f} s  identical on {len(sample)} rows")
+    print(f"HerdNameMatcher, blocked by state:  {blocked_time:8.2f} s  {changed} of {len(sample)} rows matched "
+          f"in their state instead")
+    print(f"matched at threshold 80: {matched:.1%}")
+
+    if args.real:
+        if not os.path.exists(settings.herd_population_excel_path):
+            print(f"⚠️ No {settings.herd_population_excel_path}, the real names are not checked")
+            return
+        areas, population = real_names()
+        areas["HA_NAME Cleaned"] = areas["HA_NAME"].apply(clean_herd_name)
+        population["Herd Name Cleaned"] = population["Herd Name"].apply(clean_herd_name)
+        choices = areas["HA_NAME Cleaned"].unique()
+        reference = [find_best_match(name, choices) for name in population["Herd Name Cleaned"]]
+        unblocked = HerdNameMatcher(areas["HA_NAME Cleaned"], threshold=80).match(population["Herd Name Cleaned"])
+        blocked = HerdNameMatcher(areas["HA_NAME Cleaned"], areas["ADMIN_ST"], threshold=80).match(
+            population["Herd Name Cleaned"], population["State Code"])
+        changed = check_matches(areas, population, reference, unblocked, blocked)
+        print(f"Herd_Population.xlsx: {len(population)} rows identical to extractOne, {changed} matched in their "
+              f"state instead")
+    print("✅ HerdNameMatcher gives the matches of fuzzywuzzy's extractOne")
+
+
+if __name__ == "__main__":
+    main()
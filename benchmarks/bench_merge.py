@@ -0,0 +1,55 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import build_gdf, make_herds
+from dotMerging import DotMerger, merge_and_grow_reference
+
+# Compares the array-based DotMerger with the original GeoDataFrame merge-and-grow loop
+# The final dots must be identical bit for bit (coordinates, counts and radii)
+
+
+def load_herds(csv_path):
+    df = pd.read_csv(csv_path)
+    return df.dropna(subset=["latitude", "longitude"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the merge-and-grow loop (DotMerger vs. original loop).")
+    parser.add_argument("--csv", help="Merged_Herd_Population_Location.csv; synthetic herds are used if omitted")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--growth-step", type=float, default=30)
+    parser.add_argument("--merge-threshold", type=float, default=1.10)
+    parser.add_argument("--max-outer-iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    inputs = [load_herds(args.csv)] if args.csv else [make_herds(n) for n in args.sizes]
+    for df in inputs:
+        gdf = build_gdf(df)
+
+        start = time.perf_counter()
+        reference = merge_and_grow_reference(gdf, args.merge_threshold, args.growth_step, args.max_outer_iterations)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        merger = DotMerger.from_geodataframe(gdf, threshold=args.merge_threshold, growth_step=args.growth_step)
+        merger.run(args.max_outer_iterations, verbose=False)
+        result = merger.to_geodataframe(source=gdf)
+        merger_time = time.perf_counter() - start
+
+        equal = (len(result) == len(reference)
+                 and np.array_equal(result.geometry.x.values, reference.geometry.x.values)
+                 and np.array_equal(result.geometry.y.values, reference.geometry.y.values)
+                 and np.array_equal(result["count"].values, reference["count"].values)
+                 and np.array_equal(result["radius"].values, reference["radius"].values))
+        assert equal, f"DotMerger output differs from the original loop for n={len(gdf)}"
+
+        print(f"n={len(gdf):>6}: {len(result):>5} dots, original {reference_time:.3f} s, "
+              f"DotMerger {merger_time:.3f} s ({reference_time / merger_time:.0f}x), identical: {equal}")
+        merger.report()
+
+
+if __name__ == "__main__":
+    main()
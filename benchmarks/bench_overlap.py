@@ -0,0 +1,40 @@
+import argparse
+import time
+
+from benchmarks.synthetic import make_dots
+from dotMerging import get_overlap_clusters, get_overlap_clusters_bfs
+
+# Compares the KD-tree overlap detection with the original distance-matrix/BFS version
+# Both versions must return exactly the same clusters, so every size where the BFS version runs is also an equivalence check
+# The BFS version is O(n²) in memory and runs a Python loop over every pair, so it is skipped above --max-bfs-n
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark overlap detection (KD-tree vs. BFS).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000, 20000, 50000, 100000])
+    parser.add_argument("--threshold", type=float, default=1.10)
+    parser.add_argument("--max-bfs-n", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'n':>8} {'clusters':>9} {'kdtree [s]':>11} {'bfs [s]':>9} {'speedup':>8}  equal")
+    for n in args.sizes:
+        gdf = make_dots(n)
+        fast, fast_time = time_call(get_overlap_clusters, gdf, args.threshold)
+
+        if n <= args.max_bfs_n:
+            reference, bfs_time = time_call(get_overlap_clusters_bfs, gdf, args.threshold)
+            equal = fast == reference
+            assert equal, f"KD-tree clusters differ from the BFS clusters for n={n}"
+            print(f"{n:>8} {len(fast):>9} {fast_time:>11.4f} {bfs_time:>9.3f} {bfs_time / fast_time:>7.0f}x  {equal}")
+        else:
+            print(f"{n:>8} {len(fast):>9} {fast_time:>11.4f} {'skipped':>9} {'-':>8}  -")
+
+
+if __name__ == "__main__":
+    main()
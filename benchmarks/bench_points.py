@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point
+
+from clustering import cluster
+from instrumentation import peak_rss_mb
+from pointStore import PointStore
+
+# Peak RSS of large sampled point sets as shapely Points (the old clusterStates.py) vs. a PointStore (pointStore.py)
+# Every variant takes the same random points through the steps of clusterStates.py: coordinates for the clustering,
+# grid clustering (a cheap stand-in for HDBSCAN, which would dominate the time), jitter, then the GeoDataFrame for
+# the export. "objects" keeps a list of shapely Points in a GeoDataFrame and extracts the coordinates again for every
+# step; "store" and "memmap" keep one structured array (in memory or memory-mapped) and only make the shapely points
+# for the export. The peak RSS is reported before the export (the working set) and after it, above the RSS of the
+# imports; the cluster labels and final coordinates of all variants must be identical
+
+
+def random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 1000, n), rng.uniform(0, 1000, n), rng.uniform(-0.02, 0.02, size=(n, 2))
+
+
+def with_objects(x, y, jitter):
+    gdf = gpd.GeoDataFrame(geometry=[Point(px, py) for px, py in zip(x, y)], crs="EPSG:3857")
+    coords = np.array(gdf.geometry.apply(lambda geom: [geom.x, geom.y]).tolist())
+    gdf["Cluster_ID"] = cluster(coords, "grid", cell_size=1.0)
+    gdf["geometry"] = gpd.points_from_xy(gdf.geometry.x + jitter[:, 0], gdf.geometry.y + jitter[:, 1], crs=gdf.crs)
+    working = peak_rss_mb()
+    return gdf, working
+
+
+def with_store(x, y, jitter, path=None):
+    points = PointStore.from_xy(x, y, crs="EPSG:3857", path=path)
+    points["cluster"] = cluster(points.coords(), "grid", cell_size=1.0)
+    points.move(jitter[:, 0], jitter[:, 1])
+    working = peak_rss_mb()
+    return points.to_geodataframe(columns={"cluster": "Cluster_ID"}), working
+
+
+def run_variant(args):
+    """Child process: one variant, prints its time and peak RSS (above the imports) as JSON."""
+    x, y, jitter = random_points(args.points)
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if args.variant == "objects":
+        _, working = with_objects(x, y, jitter)
+    else:
+        path = os.path.join(args.folder, "points.points") if args.variant == "memmap" else None
+        _, working = with_store(x, y, jitter, path)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "working_mb": working - before, "export_mb": peak_rss_mb() - before}))
+
+
+def measure(variant, n, folder):
+    command = [sys.executable, "-m", "benchmarks.bench_points", "--variant", variant, "--points", str(n),
+               "--folder", folder]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark shapely point lists against the PointStore.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 300_000, 1_000_000])
+    parser.add_argument("--variant", choices=["objects", "store", "memmap"], help=argparse.SUPPRESS)
+    parser.add_argument("--points", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.variant:
+        run_variant(args)
+        return
+
+    # Same labels and coordinates from every variant
+    x, y, jitter = random_points(20_000)
+    expected, _ = with_objects(x, y, jitter)
+    with tempfile.TemporaryDirectory() as folder:
+        for path in (None, os.path.join(folder, "points.points")):
+            result, _ = with_store(x, y, jitter, path)
+            assert result["Cluster_ID"].equals(expected["Cluster_ID"]), "cluster labels differ"
+            assert np.array_equal(result.geometry.x, expected.geometry.x), "x differs"
+            assert np.array_equal(result.geometry.y, expected.geometry.y), "y differs"
+
+    print(f"{'Points':>9} {'Variant':<8} {'Time [s]':>9} {'Peak RSS before export':>23} {'with export':>12}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            for variant in ("objects", "store", "memmap"):
+                m = measure(variant, n, folder)
+                print(f"{n:>9} {variant:<8} {m['seconds']:>9.2f} {m['working_mb']:>20.0f} MB {m['export_mb']:>9.0f} MB")
+    print("✅ The PointStore gives the same labels and coordinates as the shapely points")
+
+
+if __name__ == "__main__":
+    main()
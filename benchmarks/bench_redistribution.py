@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import herd_areas, population_table
+from geoio import read_intermediate, write_intermediate
+from redistribution import check_shares, join_population, redistribute_population
+
+# mergeDatasets.py before and after redistribution.py, on a synthetic herd-area layer (benchmarks/synthetic.py)
+# "baseline" is the old script: the duplicated body loads everything twice, merges the population table and the state
+# totals onto the whole herd table, maps a dict and writes the GeoJSON and the CSV copy; "current" loads once,
+# redistributes with the categorical key and writes the requested formats only (--formats)
+# Both tables must be identical (columns, order, dtypes and values); every variant runs in its own process so the
+# peak RSS is its own. The RSS ratio stays at about 1.0: the peak is reached while reading the herd-area GeoJSON,
+# which both variants do the same way (redistribution.py does not aim to lower it)
+
+
+def baseline(population_path, herds_path, output_dir):
+    for _ in range(2):  # the script body was there twice
+        df_population = read_intermediate(population_path)
+        df_herd_areas = read_intermediate(herds_path)
+        df_population["State"] = df_population["State"].str.upper()
+        df_herd_areas["State"] = df_herd_areas["State"].str.upper()
+        df_merged = df_herd_areas.merge(df_population, on="State", how="left")
+    df_merged["Horses"] = pd.to_numeric(df_merged["Horses"], errors="coerce").fillna(0)
+    df_merged["Burros"] = pd.to_numeric(df_merged["Burros"], errors="coerce").fillna(0)
+    state_totals = df_merged.groupby("State")[["Horses", "Burros"]].sum().reset_index()
+    state_totals["Total Animals"] = state_totals["Horses"] + state_totals["Burros"]
+    df_merged = df_merged.merge(state_totals[["State", "Total Animals"]], on="State", how="left")
+    df_population_dict = df_population.set_index("State")["Total Population"].to_dict()
+    df_merged["Total Population"] = (
+        (df_merged["Horses"] + df_merged["Burros"]) / df_merged["Total Animals"]
+    ) * df_merged["State"].map(df_population_dict)
+    df_merged = df_merged[df_merged["geometry"].notnull() & ~df_merged["geometry"].is_empty]
+    if output_dir:
+        write_intermediate(df_merged, os.path.join(output_dir, "Merged_Herd_Population.geojson"))
+        df_merged.to_csv(os.path.join(output_dir, "Merged_Herd_Population.csv"), index=False)
+    return df_merged
+
+
+def current(population_path, herds_path, output_dir, formats=("intermediate",)):
+    df_population = read_intermediate(population_path)
+    df_herd_areas = read_intermediate(herds_path)
+    df_merged = redistribute_population(join_population(df_herd_areas, df_population), df_population)
+    check_shares(df_merged, df_population)
+    df_merged = df_merged[df_merged["geometry"].notnull() & ~df_merged["geometry"].is_empty]
+    if output_dir:
+        if "intermediate" in formats:
+            write_intermediate(df_merged, os.path.join(output_dir, "Merged_Herd_Population.geojson"))
+        if "csv" in formats:
+            df_merged.to_csv(os.path.join(output_dir, "Merged_Herd_Population.csv"), index=False)
+    return df_merged
+
+
+def run_variant(args):
+    """Child process: runs one variant and prints its wall time and peak RSS as JSON."""
+    start = time.perf_counter()
+    if args.variant == "baseline":
+        baseline(args.population, args.herds, args.output)
+    else:
+        current(args.population, args.herds, args.output, args.formats)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": peak}))
+
+
+def measure(variant, paths, folder, formats):
+    command = [sys.executable, "-m", "benchmarks.bench_redistribution", "--variant", variant,
+               "--population", paths["population"], "--herds", paths["herds"], "--output", folder,
+               "--formats", *formats]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mergeDatasets.py before and after redistribution.py.")
+    parser.add_argument("--areas", type=int, nargs="+", default=[1000, 10000], help="herd areas in the layer")
+    parser.add_argument("--vertices", type=int, default=100, help="vertices per herd-area polygon")
+    parser.add_argument("--formats", nargs="+", default=["intermediate"], help="formats written by the current version")
+    parser.add_argument("--variant", choices=["baseline", "current"], help=argparse.SUPPRESS)
+    parser.add_argument("--population", help=argparse.SUPPRESS)
+    parser.add_argument("--herds", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.variant:
+        run_variant(args)
+        return
+
+    print(f"{'Areas':>7} {'Baseline [s]':>12} {'Current [s]':>11} {'Speedup':>8} {'Baseline RSS':>12} "
+          f"{'Current RSS':>11} {'RSS ratio':>9}")
+    for n in args.areas:
+        with tempfile.TemporaryDirectory() as folder:
+            paths = {"population": os.path.join(folder, "population.csv"),
+                     "herds": os.path.join(folder, "filtered_herds.geojson")}
+            population_table().to_csv(paths["population"], index=False)
+            herd_areas(n, args.vertices).to_file(paths["herds"], driver="GeoJSON")
+
+            old = baseline(paths["population"], paths["herds"], None)
+            new = current(paths["population"], paths["herds"], None)
+            assert list(old.columns) == list(new.columns), "columns differ"
+            assert old.dtypes.equals(new.dtypes), "dtypes differ"
+            assert old.equals(new), f"redistributed tables differ for {n} herd areas"
+
+            base = measure("baseline", paths, folder, args.formats)
+            ours = measure("current", paths, folder, args.formats)
+        print(f"{n:>7} {base['seconds']:>12.2f} {ours['seconds']:>11.2f} {base['seconds'] / ours['seconds']:>7.1f}x "
+              f"{base['peak_rss_mb']:>9.0f} MB {ours['peak_rss_mb']:>8.0f} MB "
+              f"{ours['peak_rss_mb'] / base['peak_rss_mb']:>9.2f}")
+    print("✅ The redistributed tables are identical to the old mergeDatasets.py")
+
+
+if __name__ == "__main__":
+    main()
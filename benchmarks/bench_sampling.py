@@ -0,0 +1,55 @@
+import argparse
+import os
+import time
+
+import geopandas as gpd
+import numpy as np
+
+from pointSampling import generate_cluster_points_reference, sample_points_in_polygon
+
+# Points per second of the batched point-in-polygon sampler vs. the original one-point-at-a-time sampler,
+# for every state in States_Separated
+
+
+def points_per_second(func, repeats):
+    start = time.perf_counter()
+    total = 0
+    for _ in range(repeats):
+        total += func()
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark point sampling inside the state shapes.")
+    parser.add_argument("--states-folder", default="States_Separated")
+    parser.add_argument("--num-points", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'state':<6} {'fill':>6} {'original [pts/s]':>17} {'batched [pts/s]':>16} {'speedup':>8}")
+    for state_file in sorted(os.listdir(args.states_folder)):
+        if not state_file.endswith(".geojson"):
+            continue
+        df_state = gpd.read_file(os.path.join(args.states_folder, state_file))
+        geometry = df_state.geometry.iloc[0]
+        minx, miny, maxx, maxy = geometry.bounds
+        fill = geometry.area / ((maxx - minx) * (maxy - miny))
+
+        # The original sampler derives the point count from the population, 5 animals per point gives num_points
+        reference = points_per_second(
+            lambda: len(generate_cluster_points_reference(geometry, args.num_points * 5, df_state.crs)), args.repeats)
+        rng = np.random.default_rng(args.seed)
+        batched = points_per_second(
+            lambda: len(sample_points_in_polygon(geometry, args.num_points, rng)), args.repeats)
+
+        # Same seed, same points
+        first = sample_points_in_polygon(geometry, args.num_points, args.seed)
+        assert np.array_equal(first, sample_points_in_polygon(geometry, args.num_points, args.seed))
+
+        state_name = state_file.replace(".geojson", "")
+        print(f"{state_name:<6} {fill:>6.2f} {reference:>17.0f} {batched:>16.0f} {batched / reference:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import state_boundaries
+from cutoutRender import CutoutRenderer, Style, aspect_for, dashed
+from instrumentation import peak_rss_mb
+from textureTiles import write_texture
+
+# High-resolution textures of the cutout: the whole image drawn at once (CutoutRenderer.to_png, Pillow) vs. the tiled
+# renderer streaming to PNG and to tiled TIFF (textureTiles.py), at 8k, 16k and 32k pixels wide
+# The cutout is synthetic (benchmarks/synthetic.py): detailed state outlines (dashed, some of them red) and random
+# dots, as in clusterStates_dots.py. Every run is its own process; "setup" only builds the renderer, its peak RSS
+# (imports and geometries) is the floor of the others. "whole" is skipped above --whole-max
+# The PNG and the TIFF must decode to the same pixels, and the pixels must not depend on the tile size
+
+
+def cutout(n_vertices=2000, n_dots=1500, seed=0):
+    states = gpd.GeoDataFrame(pd.concat(state_boundaries(n_vertices, seed).values(), ignore_index=True),
+                              crs="EPSG:4326")
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = states.total_bounds
+    renderer = CutoutRenderer(24, 15, background="black", aspect=aspect_for(states))
+    renderer.add_paths(states.geometry, dashed("white", 1.0, alpha=0.8))
+    renderer.add_paths(states.geometry.iloc[:3], Style("red", 0.8))
+    renderer.add_circles(rng.uniform(minx, maxx, n_dots), rng.uniform(miny, maxy, n_dots),
+                         rng.uniform(1, 5, n_dots), Style("white", 0.5, fill="white"))
+    return renderer
+
+
+def run_variant(args):
+    """Child process: one variant at one width, prints its time, peak RSS and file size as JSON."""
+    renderer = cutout()
+    start = time.perf_counter()
+    path = None
+    if args.variant == "whole":
+        path = os.path.join(args.folder, "whole.png")
+        renderer.to_png(path, dpi=72 * args.width / renderer.layout(72, title=False)[1])
+    elif args.variant != "setup":
+        path = os.path.join(args.folder, "texture.png" if args.variant == "png" else "texture.tif")
+        write_texture(renderer, {args.variant: path}, args.width)
+    seconds = time.perf_counter() - start
+    file_mb = os.path.getsize(path) / 2**20 if path else 0.0
+    print(json.dumps({"seconds": seconds, "rss_mb": peak_rss_mb() or 0, "file_mb": file_mb}))
+
+
+def measure(variant, width, folder):
+    command = [sys.executable, "-m", "benchmarks.bench_texture", "--variant", variant, "--width", str(width),
+               "--folder", folder]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check_pixels(folder, width=1500):
+    from PIL import Image
+    renderer = cutout(n_vertices=300, n_dots=300)
+    paths = {"png": os.path.join(folder, "check.png"), "tiff": os.path.join(folder, "check.tif")}
+    write_texture(renderer, paths, width, tile=256)
+    write_texture(renderer, {"png": os.path.join(folder, "check_128.png")}, width, tile=128)
+    with Image.open(paths["png"]) as png, Image.open(paths["tiff"]) as tiff, \
+            Image.open(os.path.join(folder, "check_128.png")) as small_tiles:
+        pixels = np.asarray(png)
+        assert np.array_equal(pixels, np.asarray(tiff)), "PNG and TIFF pixels differ"
+        assert np.array_equal(pixels, np.asarray(small_tiles)), "pixels depend on the tile size"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark whole-image and tiled cutout textures.")
+    parser.add_argument("--widths", type=int, nargs="+", default=[8192, 16384, 32768])
+    parser.add_argument("--whole-max", type=int, default=32768, help="largest width drawn as one image")
+    parser.add_argument("--variant", choices=["setup", "whole", "png", "tiff"], help=argparse.SUPPRESS)
+    parser.add_argument("--width", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.variant:
+        run_variant(args)
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        check_pixels(folder)
+
+    with tempfile.TemporaryDirectory() as folder:
+        setup = measure("setup", 0, folder)
+    print(f"Peak RSS of the imports and the renderer: {setup['rss_mb']:.0f} MB\n")
+    print(f"{'Width':>6} {'Variant':<8} {'Time [s]':>9} {'Peak RSS':>10} {'File':>9}")
+    for width in args.widths:
+        for variant in ("whole", "png", "tiff"):
+            if variant == "whole" and width > args.whole_max:
+                continue
+            with tempfile.TemporaryDirectory() as folder:
+                m = measure(variant, width, folder)
+            print(f"{width:>6} {variant:<8} {m['seconds']:>9.2f} {m['rss_mb']:>7.0f} MB {m['file_mb']:>6.1f} MB")
+    print("✅ The PNG and TIFF textures have the same pixels, for any tile size")
+
+
+if __name__ == "__main__":
+    main()
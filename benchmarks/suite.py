@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import geopandas as gpd
+import numpy as np
+from sklearn.cluster import KMeans
+
+import settings
+from benchmarks.synthetic import (build_gdf, herd_locations, make_dots, named_herds, population_table,
+                                  state_boundaries)
+from cutoutRender import CutoutRenderer, Style, aspect_for, dashed, dot_radius
+from dotMerging import DotMerger, get_overlap_clusters
+from fabrication import FabricationExport
+from herdMatching import HerdNameMatcher, clean_herd_name
+from pointSampling import generate_cluster_points
+
+try:
+    import hdbscan
+except ImportError:  # the HDBSCAN case is skipped without it
+    hdbscan = None
+
+# Times the hot paths of the pipeline on synthetic inputs (benchmarks/synthetic.py) and writes a JSON results file
+#   python -m benchmarks.suite --output results.json
+#   python -m benchmarks.suite --output new.json --compare results.json
+# Every case reports the best and the median of --repeats runs; --compare prints the ratio to an earlier results
+# file, so a regression between two commits shows up as a ratio well above 1
+
+DEFAULT_SIZES = [180, 1800, 18000]
+
+
+def measure(func, repeats):
+    """Runs func() repeats times and returns the run times and the last result."""
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def case_overlap(n, repeats):
+    gdf = make_dots(n)
+    times, clusters = measure(lambda: get_overlap_clusters(gdf, settings.merge_threshold), repeats)
+    return times, {"clusters": len(clusters)}
+
+
+def case_merge(n, repeats):
+    gdf = build_gdf(herd_locations(n))
+
+    def run():
+        merger = DotMerger.from_geodataframe(gdf, threshold=settings.merge_threshold, growth_step=settings.growth_step)
+        merger.run(settings.max_outer_iterations, verbose=False)
+        return merger
+
+    times, merger = measure(run, repeats)
+    return times, {"dots": len(merger.x), "outer_iterations": merger.outer_iterations}
+
+
+def case_sampling(states, population, repeats):
+    totals = population.set_index("State")["Total Population"]
+
+    def run():
+        return sum(len(generate_cluster_points(gdf.geometry.iloc[0], totals[state], gdf.crs, np.random.default_rng(0)))
+                   for state, gdf in states.items())
+
+    times, points = measure(run, repeats)
+    return times, {"states": len(states), "points": points}
+
+
+def sampled_state_points(states, population):
+    totals = population.set_index("State")["Total Population"]
+    points = {}
+    for state, gdf in states.items():
+        cluster_gdf = generate_cluster_points(gdf.geometry.iloc[0], totals[state], gdf.crs, np.random.default_rng(0))
+        points[state] = np.column_stack((cluster_gdf.geometry.x, cluster_gdf.geometry.y))
+    return points
+
+
+def case_hdbscan(points, repeats):
+    def run():
+        return sum(len(set(hdbscan.HDBSCAN(min_cluster_size=settings.hdbscan_min_cluster_size,
+                                           min_samples=settings.hdbscan_min_samples).fit_predict(coords)) - {-1})
+                   for coords in points.values())
+
+    times, clusters = measure(run, repeats)
+    return times, {"states": len(points), "clusters": clusters}
+
+
+def case_kmeans(points, repeats):
+    def run():
+        for coords in points.values():
+            KMeans(n_clusters=min(settings.kmeans_fallback_clusters, len(coords)), random_state=42,
+                   n_init=10).fit_predict(coords)
+
+    times, _ = measure(run, repeats)
+    return times, {"states": len(points)}
+
+
+def case_matching(n, repeats):
+    areas, population = named_herds(n)
+    choice_names = areas["HA_NAME"].map(clean_herd_name)
+    names = population["Herd Name"].map(clean_herd_name)
+
+    def run():
+        matcher = HerdNameMatcher(choice_names, areas["ADMIN_ST"], threshold=80)
+        return matcher.match(names, population["State Code"])
+
+    times, matches = measure(run, repeats)
+    return times, {"matched": int(sum(m is not None for m in matches))}
+
+
+def case_export(n, states, repeats, folder):
+    """The cutout render of clusterStates_dots.py (PNG and SVG) for the merged dots of n herds."""
+    merger = DotMerger.from_geodataframe(build_gdf(herd_locations(n)), threshold=settings.merge_threshold,
+                                         growth_step=settings.growth_step)
+    merger.run(settings.max_outer_iterations, verbose=False)
+    gdf_final = merger.to_geodataframe(crs="EPSG:3857").to_crs("EPSG:4326")
+    sqrt_pop = np.sqrt(gdf_final["count"])
+    gdf_final["hole_size"] = 2 + (sqrt_pop - sqrt_pop.min()) / max(sqrt_pop.max() - sqrt_pop.min(), 1e-12) * 18
+    gdf_states = gpd.GeoDataFrame(gpd.pd.concat(states.values(), ignore_index=True), crs="EPSG:4326")
+
+    def cutout():
+        renderer = CutoutRenderer(24, 15, background="black", aspect=aspect_for(gdf_states))
+        renderer.add_paths(gdf_states.geometry, dashed("white", 1.0, alpha=0.8))
+        renderer.add_circles(gdf_final.geometry.x, gdf_final.geometry.y, dot_radius(gdf_final["hole_size"] ** 1.5),
+                             Style("white", 0.5, fill="white"))
+        return renderer
+
+    def run():
+        renderer = cutout()
+        renderer.to_png(os.path.join(folder, "cutout.png"), dpi=300)
+        renderer.to_svg(os.path.join(folder, "cutout.svg"))
+
+    times, _ = measure(run, repeats)
+    fabrication = FabricationExport(cutout()).to_svg(os.path.join(folder, "cutout_fabrication.svg"))
+    return times, {"dots": len(gdf_final), "png_bytes": os.path.getsize(os.path.join(folder, "cutout.png")),
+                   "svg_bytes": os.path.getsize(os.path.join(folder, "cutout.svg")),
+                   "fabrication_svg_bytes": fabrication["bytes"]}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                                    text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {"commit": commit, "dirty": dirty, "python": platform.python_version(), "numpy": np.__version__,
+            "geopandas": gpd.__version__, "platform": platform.platform(), "cpus": os.cpu_count(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+
+
+def run_suite(sizes, repeats, vertices, only=None):
+    states = state_boundaries(vertices)
+    population = population_table()
+    results = []
+
+    def record(name, n, measured):
+        times, extra = measured
+        row = {"name": name, "n": n, "repeats": len(times), "best_s": min(times),
+               "median_s": statistics.median(times), **extra}
+        results.append(row)
+        print(f"{name:<10} {n:>8} {row['best_s']:>10.4f} {row['median_s']:>10.4f}  "
+              + ", ".join(f"{k}={v}" for k, v in extra.items()))
+
+    def selected(name):
+        return not only or name in only
+
+    print(f"{'case':<10} {'n':>8} {'best [s]':>10} {'median [s]':>10}")
+    for n in sizes:
+        if selected("overlap"):
+            record("overlap", n, case_overlap(n, repeats))
+        if selected("merge"):
+            record("merge", n, case_merge(n, repeats))
+        if selected("matching"):
+            record("matching", n, case_matching(n, repeats))
+
+    if selected("sampling"):
+        record("sampling", len(states), case_sampling(states, population, repeats))
+    if selected("hdbscan") or selected("kmeans"):
+        points = sampled_state_points(states, population)
+        n_points = sum(len(p) for p in points.values())
+        if selected("hdbscan"):
+            if hdbscan is None:
+                print("⚠️ hdbscan is not installed, skipping the HDBSCAN case")
+            else:
+                record("hdbscan", n_points, case_hdbscan(points, repeats))
+        if selected("kmeans"):
+            record("kmeans", n_points, case_kmeans(points, repeats))
+    if selected("export"):
+        with tempfile.TemporaryDirectory() as folder:
+            record("export", sizes[0], case_export(sizes[0], states, repeats, folder))
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["name"], r["n"]): r for r in baseline["results"]}
+    print(f"\nCompared to {baseline_path} (commit {baseline['environment'].get('commit')}), ratio of best times:")
+    for row in results:
+        old = previous.get((row["name"], row["n"]))
+        if old is None:
+            continue
+        ratio = row["best_s"] / old["best_s"] if old["best_s"] else float("inf")
+        flag = "  ⚠️ slower" if ratio > 1.2 else ""
+        print(f"{row['name']:<10} {row['n']:>8} {old['best_s']:>10.4f} → {row['best_s']:>10.4f}  {ratio:5.2f}x{flag}")
+
+
+CASES = ["overlap", "merge", "matching", "sampling", "hdbscan", "kmeans", "export"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the DataLamp benchmark suite on synthetic inputs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="herd counts for the size-dependent cases (overlap, merge, matching)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--vertices", type=int, default=300, help="vertices per synthetic state boundary")
+    parser.add_argument("--only", nargs="*", metavar="CASE", help=f"cases to run: {', '.join(CASES)}")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", metavar="RESULTS", help="earlier results file to compare against")
+    args = parser.parse_args()
+    unknown = set(args.only or []) - set(CASES)
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+
+    results = run_suite(args.sizes, args.repeats, args.vertices, args.only)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, default=int)
+    print(f"✅ Results saved to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
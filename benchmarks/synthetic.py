@@ -0,0 +1,203 @@
+import argparse
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+from shapely.geometry import Polygon
+
+# Synthetic inputs in the schemas of the real pipeline files, at any scale, and the fixtures of the benchmarks
+# write_dataset() lays them out like settings.py expects them, so the scripts can run on them with
+# DATALAMP_DATA_DIR pointing at the folder:
+#   <folder>/Final_Cleaned_Population_Data.csv        State, Horses, Burros, Total Population
+#   <folder>/Merged_Herd_Population_Location.csv      mergeHerdData.py output (centroids in EPSG:3857 metres)
+#   herd_areas() builds a filtered_herds.geojson layer (herd-area polygons) for mergeDatasets.py on request
+#   <folder>/DataLamp/States_Separated/<ST>.geojson   one state boundary per file (EPSG:4326)
+
+# The ten states with wild horse & burro populations: centre (lon, lat), half size in degrees, horses, burros
+STATES = {
+    "AZ": ("Arizona", (-111.7, 34.3), (3.2, 3.0), 6000, 4800),
+    "CA": ("California", (-119.6, 37.2), (4.0, 4.8), 8000, 3200),
+    "CO": ("Colorado", (-105.5, 39.0), (3.5, 2.0), 1300, 0),
+    "ID": ("Idaho", (-114.6, 45.5), (2.7, 3.5), 600, 0),
+    "MT": ("Montana", (-109.6, 47.0), (6.0, 2.5), 200, 0),
+    "NM": ("New Mexico", (-106.1, 34.4), (3.0, 2.7), 250, 0),
+    "NV": ("Nevada", (-116.7, 39.3), (3.0, 3.5), 33000, 4700),
+    "OR": ("Oregon", (-120.5, 44.0), (3.8, 2.0), 4000, 50),
+    "UT": ("Utah", (-111.7, 39.3), (2.4, 2.7), 5200, 450),
+    "WY": ("Wyoming", (-107.5, 43.0), (3.5, 2.0), 4300, 0),
+}
+WORDS = ["Rock", "Springs", "Mountain", "Valley", "Creek", "Desert", "Butte", "Canyon", "Flat", "Ridge", "Lake",
+         "Red", "Black", "White", "Antelope", "Sand", "Wash", "Peak", "Hills", "Basin", "Pine", "Cedar", "Salt",
+         "Horse", "Wild", "North", "South", "East", "West", "Big", "Little", "Dry", "Eagle", "Bear", "Cold"]
+
+
+def population_table(population_scale=1.0):
+    """Final_Cleaned_Population_Data.csv: one row per state."""
+    rows = []
+    for state, (_, _, _, horses, burros) in STATES.items():
+        horses, burros = int(horses * population_scale), int(burros * population_scale)
+        rows.append({"State": state, "Horses": horses, "Burros": burros, "Total Population": horses + burros})
+    return pd.DataFrame(rows)
+
+
+def state_boundary(state, n_vertices=300, seed=0):
+    """A wobbly polygon around the state's centre, in the columns clusterStates.py reads from States_Separated."""
+    name, (lon, lat), (half_w, half_h), horses, burros = STATES[state]
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    # Smooth noise on the radius, so the boundary is irregular but never self-intersecting
+    wobble = np.ones(n_vertices)
+    for k in range(2, 9):
+        wobble += rng.uniform(-0.08, 0.08) / k * np.cos(k * angles + rng.uniform(0, 2 * np.pi))
+    polygon = Polygon(np.column_stack((lon + half_w * wobble * np.cos(angles), lat + half_h * wobble * np.sin(angles))))
+    return gpd.GeoDataFrame(
+        {"name": [name], "stusab": [state], "State": [state], "Horses": [horses], "Burros": [burros],
+         "Total Population": [horses + burros]},
+        geometry=[polygon], crs="EPSG:4326"
+    )
+
+
+def state_boundaries(n_vertices=300, seed=0):
+    return {state: state_boundary(state, n_vertices, seed + i) for i, state in enumerate(STATES)}
+
+
+def herd_locations(n_herds, seed=0):
+    """Merged_Herd_Population_Location.csv: herds clustered inside the states, centroids in EPSG:3857 metres."""
+    rng = np.random.default_rng(seed)
+    codes = list(STATES)
+    weights = np.array([STATES[s][3] + STATES[s][4] for s in codes], dtype=float) ** 0.5
+    states = rng.choice(codes, size=n_herds, p=weights / weights.sum())
+
+    # Herds come in groups (neighbouring HMAs), a group centre is picked inside the state's box
+    centres = np.array([STATES[s][1] for s in states])
+    half_sizes = np.array([STATES[s][2] for s in states])
+    n_groups = max(1, n_herds // 8)
+    group = rng.integers(0, n_groups, n_herds)
+    group_offset = rng.uniform(-0.7, 0.7, size=(n_groups, 2))
+    lon = centres[:, 0] + half_sizes[:, 0] * group_offset[group, 0] + rng.normal(0, 0.03, n_herds)
+    lat = centres[:, 1] + half_sizes[:, 1] * group_offset[group, 1] + rng.normal(0, 0.03, n_herds)
+    x, y = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True).transform(lon, lat)
+
+    horses = rng.lognormal(5, 1.2, n_herds).astype(int)
+    burros = np.where(rng.random(n_herds) < 0.2, rng.lognormal(4, 1, n_herds), 0).astype(int)
+    return pd.DataFrame({
+        "State": [STATES[s][0] for s in states],
+        "State Code": states,
+        "Herd Name": [" ".join(rng.choice(WORDS, size=rng.integers(2, 4), replace=False)) for _ in range(n_herds)],
+        "Herd Code": [f"{s}{i:04d}" for i, s in enumerate(states)],
+        "Horses": horses,
+        "Burros": burros,
+        "Total Population": horses + burros,
+        "latitude": np.asarray(y),
+        "longitude": np.asarray(x),
+    })
+
+
+def herd_areas(n_areas, n_vertices=100, seed=0):
+    """filtered_herds.geojson: one wobbly herd-area polygon (EPSG:4326) around every herd of herd_locations()."""
+    herds = herd_locations(n_areas, seed)
+    rng = np.random.default_rng(seed + 1)
+    lon, lat = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True).transform(
+        herds["longitude"].values, herds["latitude"].values
+    )
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    sizes = rng.uniform(0.05, 0.25, n_areas)
+    wobble = 1 + 0.15 * np.sin(np.outer(rng.integers(2, 7, n_areas), angles) + rng.uniform(0, np.pi, (n_areas, 1)))
+    polygons = [
+        Polygon(np.column_stack((x + size * w * np.cos(angles), y + size * w * np.sin(angles))))
+        for x, y, size, w in zip(lon, lat, sizes, wobble)
+    ]
+    return gpd.GeoDataFrame({
+        "HA_NAME": herds["Herd Name"],
+        "HA_NO": herds["Herd Code"],
+        "State": herds["State Code"],
+        "ACRES": np.round(sizes * 5e5, 1),
+    }, geometry=polygons, crs="EPSG:4326")
+
+
+def named_herds(n_herds, seed=0):
+    """Synthetic herd areas (ADMIN_ST, HA_NAME) and population rows (State Code, Herd Name) with typos."""
+    rng = np.random.default_rng(seed)
+    names = [" ".join(rng.choice(WORDS, size=rng.integers(2, 4), replace=False)) for _ in range(n_herds)]
+    states = rng.choice(list(STATES), size=n_herds)
+    areas = pd.DataFrame({"ADMIN_ST": states, "HA_NAME": names})
+
+    def noisy(name):
+        if rng.random() < 0.3:
+            i = rng.integers(0, len(name))
+            name = name[:i] + name[i + 1:]
+        if rng.random() < 0.3:
+            name += " (HMA)"
+        return name.upper() if rng.random() < 0.2 else name
+
+    population = pd.DataFrame({"State Code": states, "Herd Name": [noisy(n) for n in names]})
+    return areas, population.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def make_herds(n, seed=0):
+    """Synthetic herd centroids in the shape clusterStates_dots.py builds from Merged_Herd_Population_Location.csv."""
+    rng = np.random.default_rng(seed)
+    # About 180 herds spread over ~2000 km, like the BLM data; the area grows with n to keep the density
+    centres = rng.uniform(0, np.sqrt(n / 180) * 2e6, size=(max(1, n // 10), 2))
+    coords = centres[rng.integers(0, len(centres), n)] + rng.normal(0, 3000, size=(n, 2))
+    df = pd.DataFrame({
+        "longitude": coords[:, 0],
+        "latitude": coords[:, 1],
+        "Total Population": rng.integers(0, 2000, n).astype(float),
+    })
+    return df
+
+
+def build_gdf(df):
+    """The herd dots of clusterStates_dots.py: a point per herd with its population as count and radius 30."""
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["longitude"], df["latitude"]), crs="EPSG:3857")
+    gdf["count"] = df["Total Population"].fillna(1)
+    gdf["radius"] = 30
+    return gdf
+
+
+def make_dots(n, seed=0):
+    """Random dots in a square sized so that roughly a third of them overlap a neighbour."""
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(n) * 250
+    x = rng.uniform(0, side, n)
+    y = rng.uniform(0, side, n)
+    gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y), crs="EPSG:3857")
+    gdf["radius"] = rng.choice([30, 60, 90, 200], size=n, p=[0.6, 0.2, 0.15, 0.05])
+    return gdf
+
+
+def write_dataset(folder, n_herds=180, n_vertices=300, population_scale=1.0, seed=0):
+    """Writes the three inputs in the folder layout of settings.py and returns their paths."""
+    states_dir = os.path.join(folder, "DataLamp", "States_Separated")
+    os.makedirs(states_dir, exist_ok=True)
+    paths = {
+        "population": os.path.join(folder, "Final_Cleaned_Population_Data.csv"),
+        "herds": os.path.join(folder, "Merged_Herd_Population_Location.csv"),
+        "states": states_dir,
+    }
+    population_table(population_scale).to_csv(paths["population"], index=False)
+    herd_locations(n_herds, seed).to_csv(paths["herds"], index=False)
+    for state, gdf in state_boundaries(n_vertices, seed).items():
+        gdf.to_file(os.path.join(states_dir, f"{state}.geojson"), driver="GeoJSON")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic DataLamp input dataset.")
+    parser.add_argument("folder", help="output folder, use it as DATALAMP_DATA_DIR")
+    parser.add_argument("--herds", type=int, default=180, help="rows of Merged_Herd_Population_Location.csv")
+    parser.add_argument("--vertices", type=int, default=300, help="vertices per state boundary")
+    parser.add_argument("--population-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_dataset(args.folder, args.herds, args.vertices, args.population_scale, args.seed)
+    for name, path in paths.items():
+        print(f"✅ {name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import weakref
+
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+
+# Polygon centroids without reprojecting the polygons
+# The centroids are computed once in the layer's own CRS with vectorized shapely 2 (area-weighted, in C),
+# then only the resulting points are transformed to the target CRS, instead of reprojecting every vertex
+# of every herd area to EPSG:3857 and back; the result is memoized on the frame's geometry array
+
+# How the centroids are computed, part of the key of the cached centroid tables (herdAreas.py): change it whenever
+# centroid_coords gives other values, so no table of the old method is reused
+CENTROID_METHOD = "centroid in the layer CRS, points transformed (v2)"
+
+# Centroids per geometry array (by id, with a weak reference) and target CRS, dropped together with the array
+_memo = {}
+
+
+def _memo_for(geometries):
+    key = id(geometries)
+    entry = _memo.get(key)
+    if entry is None or entry[0]() is not geometries:
+        entry = (weakref.ref(geometries, lambda _, key=key: _memo.pop(key, None)), {})
+        _memo[key] = entry
+    return entry[1]
+
+
+def centroid_coords(gdf, crs="EPSG:3857"):
+    """Returns (x, y) arrays of the polygon centroids in ``crs``.
+
+    The centroids of small polygons (like herd areas) barely depend on the CRS they are computed in,
+    benchmarks/bench_centroids.py measures the difference to reprojecting the polygons first.
+    """
+    geometries = gdf.geometry.values
+    key = (CRS.from_user_input(crs).to_string(), gdf.crs.to_string() if gdf.crs is not None else None)
+    cached = _memo_for(geometries)
+    if key in cached:
+        return cached[key]
+
+    points = shapely.centroid(np.asarray(geometries))
+    x, y = shapely.get_x(points), shapely.get_y(points)
+    if gdf.crs is not None and not CRS.from_user_input(crs).equals(gdf.crs):
+        x, y = Transformer.from_crs(gdf.crs, crs, always_xy=True).transform(x, y)
+        x, y = np.asarray(x), np.asarray(y)
+
+    cached[key] = (x, y)
+    return x, y
+
+
+def add_centroid_columns(gdf, crs="EPSG:3857", x_column="longitude", y_column="latitude"):
+    """Adds the centroid coordinates (in ``crs``) as two columns and returns the frame."""
+    x, y = centroid_coords(gdf, crs)
+    gdf[x_column] = x
+    gdf[y_column] = y
+    return gdf
@@ -1,37 +1,47 @@
-import pandas as pd
+import settings
+from excelIngest import parse_count_columns, read_excel
+from geoio import write_intermediate
+from instrumentation import parse_profile_flag, step
 
-# path to the Excel file
-excel_file_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\BLM Herd Area and Herd Management Area Statistics.xlsx"
-
-# loads the Excel file and skips the metadata rows
-df_population = pd.read_excel(excel_file_path, skiprows=2)
-
-# renames the relevant columns
-df_population = df_population.rename(columns={
-    "Unnamed: 0": "State",
-    "Estimated Populations": "Horses",
-    "Unnamed: 9": "Burros",
-    "Unnamed: 10": "Total Population"
-})
-
-# selects only relevant columns
-df_population = df_population[["State", "Horses", "Burros", "Total Population"]]
+# Command line: only --profile (instrumentation.py)
+parse_profile_flag("Clean the BLM population statistics.")
 
-# removes irrelevant rows
-df_population = df_population.dropna(subset=["State"])
-df_population = df_population[~df_population["State"].str.contains("TOTAL|March", na=False)]
-
-# converts the population columns to numeric values by removing commas
-df_population["Horses"] = df_population["Horses"].astype(str).str.replace(",", "").astype(float).astype(int)
-df_population["Burros"] = df_population["Burros"].astype(str).str.replace(",", "").astype(float).astype(int)
-df_population["Total Population"] = df_population["Total Population"].astype(str).str.replace(",", "").astype(float).astype(int)
-
-# saves the cleaned data to new CSV and Excel file
-cleaned_csv_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Final_Cleaned_Population_Data.csv"
-cleaned_excel_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Final_Cleaned_Population_Data.xlsx"
-
-df_population.to_csv(cleaned_csv_path, index=False)
-df_population.to_excel(cleaned_excel_path, index=False)
+# path to the Excel file
+excel_file_path = settings.population_excel_path
+
+# loads the Excel file and skips the metadata rows (only the columns used below, see excelIngest.py)
+with step("read population Excel") as s:
+    df_population = read_excel(excel_file_path, skiprows=2,
+                               usecols=["Unnamed: 0", "Estimated Populations", "Unnamed: 9", "Unnamed: 10"])
+    s.rows_out = len(df_population)
+
+with step("clean population table", rows_in=len(df_population)) as s:
+    # renames the relevant columns
+    df_population = df_population.rename(columns={
+        "Unnamed: 0": "State",
+        "Estimated Populations": "Horses",
+        "Unnamed: 9": "Burros",
+        "Unnamed: 10": "Total Population"
+    })
+
+    # selects only relevant columns
+    df_population = df_population[["State", "Horses", "Burros", "Total Population"]]
+
+    # removes irrelevant rows
+    df_population = df_population.dropna(subset=["State"])
+    df_population = df_population[~df_population["State"].str.contains("TOTAL|March", na=False)]
+
+    # converts the population columns to numeric values by removing commas (all three columns in one pass)
+    df_population = parse_count_columns(df_population, ["Horses", "Burros", "Total Population"])
+    s.rows_out = len(df_population)
+
+# saves the cleaned data to new CSV (or Parquet/Feather, see settings.intermediate_format) and Excel file
+cleaned_csv_path = settings.cleaned_population_csv_path
+cleaned_excel_path = settings.cleaned_population_excel_path
+
+with step("write cleaned population", rows_in=len(df_population)):
+    write_intermediate(df_population, cleaned_csv_path)
+    df_population.to_excel(cleaned_excel_path, index=False)
 
 # prints the cleaned data
 print("Cleaned population data successfully saved!")
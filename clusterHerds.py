@@ -1,77 +1,118 @@
 import geopandas as gpd
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
+import argparse
 import warnings
 import os
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["OPENBLAS_NUM_THREADS"] = "1"
 
+import settings
+from centroids import centroid_coords
+from clustering import cluster_groups
+from geoio import read_intermediate
+from instrumentation import enable_profiling, step
 
-warnings.filterwarnings("ignore", category=UserWarning, message="Geometry is in a geographic CRS")
-
-# ✅ **Step 1: Load Data**
-filtered_gdf_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\processed_herd_areas.geojson"
-population_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Final_Cleaned_Population_Data.csv"
-
-filtered_gdf = gpd.read_file(filtered_gdf_path)
-population_data = pd.read_csv(population_data_path)
-
-# ✅ **Step 2: Ensure Column Consistency**
-if "ADMIN_ST" not in population_data.columns and "State" in population_data.columns:
-    print("⚠️ 'ADMIN_ST' not found in population data. Renaming 'State' to 'ADMIN_ST'.")
-    population_data.rename(columns={"State": "ADMIN_ST"}, inplace=True)
 
-print("🔍 Unique states in `filtered_gdf`: ", filtered_gdf["ADMIN_ST"].unique())
-print("🔍 Unique states in `population_data`: ", population_data["ADMIN_ST"].unique())
+warnings.filterwarnings("ignore", category=UserWarning, message="Geometry is in a geographic CRS")
 
-# ✅ **Step 3: Merge Population Data**
-filtered_gdf = filtered_gdf.merge(population_data, on="ADMIN_ST", how="left")
+# Paths
+filtered_gdf_path = settings.processed_herd_areas_path
+population_data_path = settings.cleaned_population_csv_path
 
-# ✅ **Step 4: Convert CRS for Accurate Centroid Calculations**
-if filtered_gdf.crs is None or filtered_gdf.crs.is_geographic:
-    print("🔄 Converting CRS to projected CRS (EPSG: 3857)...")
-    filtered_gdf = filtered_gdf.to_crs(epsg=3857)
 
 # ✅ **Step 5: Clustering Function**
-def cluster_by_state(gdf, default_clusters=5):
-    clustered_gdf = gdf.copy()
-    clustered_gdf["cluster"] = -1
-
-    for state, state_gdf in clustered_gdf.groupby("ADMIN_ST"):
-        coords = state_gdf.geometry.centroid.apply(lambda point: (point.x, point.y))
-        coords = np.array(coords.tolist())
-
+# Centroids are taken once as arrays, every state is clustered on its own (in worker processes with --workers)
+# and the labels are written into one preallocated array
+# "cluster" is the KMeans label within the state like before, "cluster_uid" numbers the clusters of all states
+# consecutively (in state order), -1 stays -1 for rows without a state
+def cluster_by_state(gdf, default_clusters=5, workers=1):
+    centroid_x, centroid_y = centroid_coords(gdf, "EPSG:3857")
+    coords = np.column_stack((centroid_x, centroid_y))
+    labels = np.full(len(gdf), -1, dtype=np.int64)
+    uids = np.full(len(gdf), -1, dtype=np.int64)
+
+    # Positions of the rows of each state, in sorted state order like groupby
+    state_positions = gdf.groupby("ADMIN_ST").indices
+
+    jobs = {}
+    for state, positions in state_positions.items():
         # Adjust clusters dynamically if points are too few
-        n_clusters = min(len(coords), default_clusters)
+        n_clusters = min(len(positions), default_clusters)
         if n_clusters < 2:
             print(f"⚠️ Not enough points to cluster for {state}, assigning all to one cluster.")
-            clustered_gdf.loc[state_gdf.index, "cluster"] = 0
+            labels[positions] = 0
             continue
 
         # KMeans Clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        state_gdf["cluster"] = kmeans.fit_predict(coords)
-        clustered_gdf.loc[state_gdf.index, "cluster"] = state_gdf["cluster"]
-
-    return clustered_gdf
-
-
-# ✅ **Step 6: Apply Clustering**
-clustered_gdf = cluster_by_state(filtered_gdf, default_clusters=10)
-
-# ✅ **Step 7: Save the Clustered Data**
-output_clustered_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\clustered_herds_by_state.geojson"
-clustered_gdf.to_file(output_clustered_path, driver="GeoJSON")
-print(f"✅ Clustered herd data saved to: {output_clustered_path}")
-
-# ✅ **Step 8: Plot the Clusters**
-plt.figure(figsize=(10, 6))
-plt.scatter(clustered_gdf.geometry.centroid.x, clustered_gdf.geometry.centroid.y,
-            c=clustered_gdf["cluster"], cmap="viridis", marker="o", alpha=0.7)
-plt.xlabel("Longitude")
-plt.ylabel("Latitude")
-plt.title("Clustering of Herd Areas by State")
-plt.colorbar(label="Cluster ID")
-plt.show()
+        jobs[state] = (coords[positions], "kmeans", {"n_clusters": n_clusters, "random_state": 42, "n_init": 10})
+
+    state_labels = cluster_groups(jobs, workers)
+
+    offset = 0
+    for state, positions in state_positions.items():
+        if state in state_labels:
+            labels[positions] = state_labels[state]
+        uids[positions] = labels[positions] + offset
+        offset += labels[positions].max() + 1
+
+    clustered_gdf = gdf.assign(cluster=labels, cluster_uid=uids)
+    return clustered_gdf, centroid_x, centroid_y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster the herd areas of every state.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (states are independent, 1 = serial)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run every step under cProfile (see instrumentation.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling()
+
+    # ✅ **Step 1: Load Data**
+    with step("read herd areas and population") as s:
+        filtered_gdf = read_intermediate(filtered_gdf_path)
+        population_data = read_intermediate(population_data_path)
+        s.rows_out = len(filtered_gdf)
+
+    # ✅ **Step 2: Ensure Column Consistency**
+    if "ADMIN_ST" not in population_data.columns and "State" in population_data.columns:
+        print("⚠️ 'ADMIN_ST' not found in population data. Renaming 'State' to 'ADMIN_ST'.")
+        population_data.rename(columns={"State": "ADMIN_ST"}, inplace=True)
+
+    print("🔍 Unique states in `filtered_gdf`: ", filtered_gdf["ADMIN_ST"].unique())
+    print("🔍 Unique states in `population_data`: ", population_data["ADMIN_ST"].unique())
+
+    # ✅ **Step 3: Merge Population Data**
+    filtered_gdf = filtered_gdf.merge(population_data, on="ADMIN_ST", how="left")
+
+    # ✅ **Step 4: Compute Centroids in a Projected CRS (EPSG: 3857)** and **Step 6: Apply Clustering**
+    # Only the centroid points are transformed, the polygons stay in their CRS (centroids.py)
+    with step("cluster herd areas by state", rows_in=len(filtered_gdf)) as s:
+        clustered_gdf, centroid_x, centroid_y = cluster_by_state(
+            filtered_gdf, default_clusters=settings.herd_clusters_per_state, workers=args.workers
+        )
+        s.rows_out = len(clustered_gdf)
+        s.extra["workers"] = args.workers
+
+    # ✅ **Step 7: Save the Clustered Data**
+    output_clustered_path = settings.clustered_herds_path
+    with step("write clustered herds", rows_in=len(clustered_gdf)):
+        clustered_gdf.to_file(output_clustered_path, driver="GeoJSON")
+    print(f"✅ Clustered herd data saved to: {output_clustered_path}")
+
+    # ✅ **Step 8: Plot the Clusters** (pyplot is only imported here, it is the slowest import of the script)
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(10, 6))
+    plt.scatter(centroid_x, centroid_y,
+                c=clustered_gdf["cluster"], cmap="viridis", marker="o", alpha=0.7)
+    plt.xlabel("Longitude")
+    plt.ylabel("Latitude")
+    plt.title("Clustering of Herd Areas by State")
+    plt.colorbar(label="Cluster ID")
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,238 @@
-import geopandas as gpd
 import pandas as pd
 import os
+import argparse
+import time
+import zlib
 import numpy as np
-import matplotlib.pyplot as plt
-from shapely.geometry import Point
-from sklearn.cluster import KMeans
-import hdbscan
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import settings
+from clustering import cluster, preload
+from cutoutRender import CutoutRenderer, Style, aspect_for, dot_radius, label_colors
+from fabrication import export_svg
+from geoio import intermediate_path, read_intermediate
+from instrumentation import enable_profiling, step
+from pointSampling import sample_point_store
+from pointStore import store_path
 
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["OPENBLAS_NUM_THREADS"] = "1"
 
 # Paths
-states_folder = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\States_Separated"
-population_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Final_Cleaned_Population_Data.csv"
-output_folder = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\Clustered_States"
-
-# Ensure the output folder exists
-os.makedirs(output_folder, exist_ok=True)
-
-# Load population data
-df_population = pd.read_csv(population_data_path)
-
-# Function to generate cluster points inside state shape
-def generate_cluster_points(state_geometry, state_population, crs):
-    """Generates spaced cluster points inside state boundary, scaled by population size."""
-    if pd.isna(state_population) or state_population <= 0:
-        return None
-
-    # Adjust clustering density dynamically with upper and lower limits
-    num_points = min(500, max(50, int(state_population / 5)))  # Limits the density
-
-    points = []
-    minx, miny, maxx, maxy = state_geometry.bounds
-
-    while len(points) < num_points:
-        random_point = Point(np.random.uniform(minx, maxx), np.random.uniform(miny, maxy))
-        if state_geometry.contains(random_point):  # Ensure point is inside state shape
-            points.append(random_point)
-
-    # Create GeoDataFrame
-    return gpd.GeoDataFrame(geometry=points, crs=crs)
-
-# Process each state file
-for state_file in os.listdir(states_folder):
-    if state_file.endswith(".geojson"):
-        state_path = os.path.join(states_folder, state_file)
-
-        # Load state boundary
-        df_state = gpd.read_file(state_path)
-
-        # Extract state name
-        state_name = state_file.replace(".geojson", "")
-
-        # Get state population from dataset
-        state_population_row = df_population[df_population["State"] == state_name]
-        if state_population_row.empty:
-            print(f"⚠️ No population data for {state_name}, skipping...")
-            continue
-        state_population = state_population_row["Total Population"].values[0]
-
-        print(f"✅ Processing {state_name} (Population: {state_population})...")
-
-        # Get CRS from df_state
-        state_crs = df_state.crs
-
-        # Generate cluster points inside the state shape
-        cluster_gdf = generate_cluster_points(df_state.geometry.iloc[0], state_population, state_crs)
-
-        if cluster_gdf is None or len(cluster_gdf) == 0:
-            print(f"⚠️ No clusters generated for {state_name}")
-            continue
-
-        print(f"🟢 Generated {len(cluster_gdf)} cluster points for {state_name}")
-
-        # Convert points to numeric arrays
-        point_coords = cluster_gdf.geometry.apply(lambda geom: [geom.x, geom.y]).tolist()
-
-        # Apply DBSCAN first (prevents forced clustering)
-        dbscan = hdbscan.HDBSCAN(min_cluster_size=5, min_samples=3)
-        cluster_labels = dbscan.fit_predict(point_coords)
-
-        # If DBSCAN fails (i.e., assigns everything to -1), use KMeans as fallback
-        if len(set(cluster_labels)) == 1:  # Only noise detected
-            print(f"⚠️ DBSCAN failed for {state_name}, using KMeans fallback...")
-            kmeans = KMeans(n_clusters=min(20, len(cluster_gdf)), random_state=42, n_init=10)
-            cluster_labels = kmeans.fit_predict(point_coords)
-
-        cluster_gdf["Cluster_ID"] = cluster_labels
-
-        # Avoid Overlapping Clusters: Apply force-directed jitter
-        def add_jitter(coord, scale=0.02):
-            """Applies slight movement to avoid overlaps."""
-            return coord + np.random.uniform(-scale, scale)
-
-        cluster_gdf["geometry"] = cluster_gdf.geometry.apply(lambda p: Point(add_jitter(p.x), add_jitter(p.y)))
-
-        # Merge state boundary and cluster points
-        cluster_gdf["type"] = "cluster"
-        df_state["type"] = "boundary"
-        merged_gdf = pd.concat([df_state, cluster_gdf], ignore_index=True)
-
-        # Save clustered state for 3D use
-        clustered_geojson = os.path.join(output_folder, f"{state_name}_clustered.geojson")
-        merged_gdf.to_file(clustered_geojson, driver="GeoJSON")
-
-        # Save SVG for visualization of clustering
-        svg_path = os.path.join(output_folder, f"{state_name}_clustered.svg")
-        fig, ax = plt.subplots(figsize=(6, 6))
-        df_state.boundary.plot(ax=ax, edgecolor="black", linewidth=1.5)
-        cluster_gdf.plot(ax=ax, column="Cluster_ID", cmap="tab10", legend=True, markersize=8, alpha=0.75)
-        ax.set_axis_off()
-        plt.savefig(svg_path, format="svg", bbox_inches="tight")
-        plt.close(fig)
-
-        print(f"✅ Clustered {state_name} saved for 3D modeling: {clustered_geojson}, {svg_path}")
+states_folder = settings.states_separated_dir
+population_data_path = settings.cleaned_population_csv_path
+output_folder = settings.clustered_states_dir
+
+# Styles of the per-state SVGs (state outline and cluster points), shared by all states
+state_outline = Style("black", 1.5)
+cluster_dots = Style(alpha=0.75)
+
+# Base seed for the sampled points and the jitter, every state gets its own seed derived from it,
+# so the results are reproducible and do not depend on which worker processes a state
+random_seed = settings.random_seed
+
+
+def state_seed(state_name, base_seed=random_seed):
+    """Stable per-state seed (independent of processing order and of Python's hash randomization)."""
+    return np.random.SeedSequence([base_seed, zlib.crc32(state_name.encode("utf-8"))])
+
+
+# Clusters one state and saves its GeoJSON and SVG, returns a row for the summary table
+def process_state(state_file, state_population, base_seed=random_seed, herds=None):
+    start = time.perf_counter()
+    state_path = os.path.join(states_folder, state_file)
 
-print(f"✅ All clustered states saved separately in: {output_folder}")
+    # Extract state name
+    state_name = state_file.replace(".geojson", "")
+    summary = {"state": state_name, "status": "ok", "points": 0, "clusters": 0, "seconds": 0.0}
+    rng = np.random.default_rng(state_seed(state_name, base_seed))
+
+    # Load state boundary
+    df_state = read_intermediate(state_path)
+
+    print(f"✅ Processing {state_name} (Population: {state_population})...")
+
+    # Get CRS from df_state
+    state_crs = df_state.crs
+
+    # Generate cluster points inside the state shape, kept as arrays (x, y, cluster) until they are saved
+    # (with settings.point_density = "herds" spread over the state's herd areas, see pointSampling.py)
+    if herds is not None and herds.crs != state_crs:
+        herds = herds.to_crs(state_crs)
+    points = sample_point_store(df_state.geometry.iloc[0], state_population, state_crs, rng,
+                                path=store_path(f"cluster_points_{state_name}"), herds=herds)
+
+    if points is None or len(points) == 0:
+        if points is not None:
+            points.discard()
+        print(f"⚠️ No clusters generated for {state_name}")
+        summary.update(status="no points", seconds=time.perf_counter() - start)
+        return summary
+
+    print(f"🟢 Generated {len(points)} cluster points for {state_name}")
+
+    # Convert points to numeric arrays
+    point_coords = points.coords()
+
+    # Apply DBSCAN first (prevents forced clustering)
+    # Above settings.hdbscan_sample_size points only a sample is clustered and the labels are passed on (clustering.py)
+    large = len(points) > settings.hdbscan_sample_size
+    cluster_labels = cluster(point_coords, "hdbscan_sample", sample_size=settings.hdbscan_sample_size,
+                             random_state=base_seed, min_cluster_size=settings.hdbscan_min_cluster_size,
+                             min_samples=settings.hdbscan_min_samples)
+
+    # If DBSCAN fails (i.e., assigns everything to -1), use KMeans as fallback (MiniBatchKMeans for large states)
+    if len(np.unique(cluster_labels)) == 1:  # Only noise detected
+        print(f"⚠️ DBSCAN failed for {state_name}, using KMeans fallback...")
+        cluster_labels = cluster(point_coords, "minibatch" if large else "kmeans",
+                                 n_clusters=settings.kmeans_fallback_clusters, random_state=42,
+                                 n_init=3 if large else 10)
+        summary["status"] = "ok (KMeans fallback)"
+
+    points["cluster"] = cluster_labels
+
+    # Avoid Overlapping Clusters: Apply force-directed jitter
+    jitter = rng.uniform(-0.02, 0.02, size=(len(points), 2))  # slight movement to avoid overlaps
+    points.move(jitter[:, 0], jitter[:, 1])
+
+    # The shapely points are only made now, for the GeoJSON
+    cluster_gdf = points.to_geodataframe(columns={"cluster": "Cluster_ID"})
+
+    # Merge state boundary and cluster points
+    cluster_gdf["type"] = "cluster"
+    df_state["type"] = "boundary"
+    merged_gdf = pd.concat([df_state, cluster_gdf], ignore_index=True)
+
+    # Save clustered state for 3D use
+    clustered_geojson = os.path.join(output_folder, f"{state_name}_clustered.geojson")
+    merged_gdf.to_file(clustered_geojson, driver="GeoJSON")
+
+    # Save SVG for visualization of clustering
+    svg_path = os.path.join(output_folder, f"{state_name}_clustered.svg")
+    renderer = CutoutRenderer(6, 6, aspect=aspect_for(df_state))
+    renderer.add_paths(df_state.geometry, state_outline)
+    renderer.add_circles(points["x"], points["y"], dot_radius(8), cluster_dots,
+                         colors=label_colors(points["cluster"], "tab10"))
+    export_svg(renderer, svg_path)
+
+    print(f"✅ Clustered {state_name} saved for 3D modeling: {clustered_geojson}, {svg_path}")
+    summary.update(points=len(points), clusters=len(set(np.unique(cluster_labels).tolist()) - {-1}),
+                   seconds=time.perf_counter() - start)
+    points.discard()
+    return summary
+
+
+def timed_process_state(state_file, state_population, base_seed=random_seed, herds=None):
+    """process_state() as one instrumented step, also in the worker processes."""
+    with step(f"cluster state {state_file.replace('.geojson', '')}") as s:
+        summary = process_state(state_file, state_population, base_seed, herds)
+        s.rows_out = summary["points"]
+        s.extra["clusters"] = summary["clusters"]
+    return summary
+
+
+def failed_state(state_name, error):
+    """Summary row of a state whose clustering raised, so the other states still finish."""
+    print(f"⚠️ Clustering failed for {state_name}: {error}")
+    return {"state": state_name, "status": f"failed: {type(error).__name__}", "points": 0, "clusters": 0,
+            "seconds": 0.0}
+
+
+def cluster_states(jobs, workers=1, base_seed=random_seed):
+    """Clusters the (state file, population, herds) jobs, in worker processes if workers > 1, returns the summary rows.
+
+    herds are the herd areas of the state for settings.point_density = "herds" (None otherwise).
+    """
+    summary_rows = []
+    if workers > 1:
+        # Process each state file in its own worker, the slowest state bounds the total time
+        # The clustering packages are imported once per process, not per state: here for forked workers, in the
+        # initializer for spawned ones
+        preload("hdbscan", "kmeans")
+        with ProcessPoolExecutor(max_workers=workers, initializer=preload, initargs=("hdbscan", "kmeans")) as executor:
+            futures = {executor.submit(timed_process_state, state_file, population, base_seed, herds): state_file
+                       for state_file, population, herds in jobs}
+            for future in as_completed(futures):
+                state_name = futures[future].replace(".geojson", "")
+                try:
+                    summary_rows.append(future.result())
+                except Exception as e:
+                    summary_rows.append(failed_state(state_name, e))
+    else:
+        # Process each state file, a failing state is reported like in the workers
+        for state_file, population, herds in jobs:
+            try:
+                summary_rows.append(timed_process_state(state_file, population, base_seed, herds))
+            except Exception as e:
+                summary_rows.append(failed_state(state_file.replace(".geojson", ""), e))
+    return summary_rows
+
+
+def print_summary(rows, wall_time):
+    """Prints per-state timing and status as a table."""
+    print(f"\n{'State':<6} {'Status':<22} {'Points':>6} {'Clusters':>8} {'Time [s]':>9}")
+    for row in sorted(rows, key=lambda r: r["state"]):
+        print(f"{row['state']:<6} {row['status']:<22} {row['points']:>6} {row['clusters']:>8} {row['seconds']:>9.2f}")
+    print(f"Sum of state times: {sum(r['seconds'] for r in rows):.2f} s, wall time: {wall_time:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster every state in States_Separated.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (states are independent, 1 = serial)")
+    parser.add_argument("--seed", type=int, default=random_seed, help="base seed for the per-state seeds")
+    parser.add_argument("--profile", action="store_true",
+                        help="run every step under cProfile (see instrumentation.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling()
+
+    # Ensure the output folder exists
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Load population data
+    with step("read population data") as s:
+        df_population = read_intermediate(population_data_path)
+        s.rows_out = len(df_population)
+
+    # Herd areas and their population per state, to spread the points over (settings.point_density = "herds")
+    state_herds = {}
+    if settings.point_density == "herds":
+        herds_path = settings.merged_herd_population_geojson_path
+        if os.path.exists(intermediate_path(herds_path)) or os.path.exists(herds_path):
+            with step("read merged herd population") as s:
+                df_herds = read_intermediate(herds_path, columns=["State", "Total Population", "geometry"])
+                s.rows_out = len(df_herds)
+            state_herds = dict(tuple(df_herds.groupby(df_herds["State"].str.upper())))
+        else:
+            print(f"⚠️ No herd areas at {herds_path}, the points are spread over the whole states")
+
+    # Collect the states to process
+    jobs = []
+    summary_rows = []
+    for state_file in sorted(os.listdir(states_folder)):
+        if state_file.endswith(".geojson"):
+            state_name = state_file.replace(".geojson", "")
+
+            # Get state population from dataset
+            state_population_row = df_population[df_population["State"] == state_name]
+            if state_population_row.empty:
+                print(f"⚠️ No population data for {state_name}, skipping...")
+                summary_rows.append({"state": state_name, "status": "no population data",
+                                     "points": 0, "clusters": 0, "seconds": 0.0})
+                continue
+            jobs.append((state_file, state_population_row["Total Population"].values[0],
+                         state_herds.get(state_name.upper())))
+
+    start = time.perf_counter()
+    with step("cluster all states", rows_in=len(jobs)) as s:
+        summary_rows.extend(cluster_states(jobs, args.workers, args.seed))
+        s.rows_out = sum(row["points"] for row in summary_rows)
+        s.extra["workers"] = args.workers
+
+    print(f"✅ All clustered states saved separately in: {output_folder}")
+    print_summary(summary_rows, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,116 +1,109 @@
-import pandas as pd
-import geopandas as gpd
-import matplotlib.pyplot as plt
-from shapely.geometry import Point
-from scipy.spatial import distance_matrix
 import numpy as np
 import os
 
-# Pandas is used for reading and handling tabular data, GeoPandas extends it to support geospatial data
-# Matplotlib is used for plotting, and Shapely is used to create Point geometries from longitude and latitude so we can map them
-# SciPy is used for calculating distances between points, provides distance_matrix
+import incremental
+import settings
+from cutoutRender import CutoutRenderer, add_cutout_layers, aspect_for, cutout_borders
+from fabrication import describe, export_svg
+from dotMerging import DotMerger
+from mergeHierarchy import MergeHierarchy
+from mergeNeighbourhoods import same_dots
+from pointStore import PointStore, store_path
+from stateAssign import StateIndex
+from geoio import read_intermediate, write_intermediate
+from instrumentation import parse_profile_flag, step
+
+# Pandas and GeoPandas (through geoio and cutoutRender) are used for reading the herd table and the state borders
+# cutoutRender writes the SVG and PNG of the cutout directly from the geometries (Pillow is used there for the PNG)
+# dotMerging provides the array-based merge-and-grow engine with KD-tree overlap detection (SciPy is used there for the spatial index)
+# mergeHierarchy keeps every growth iteration of a merge run on disk, so other max_outer_iterations are only a cut
+# stateAssign finds the state of every dot with one STRtree query (and the dots that reach across a state border)
+# incremental (with settings.incremental) merges only the neighbourhoods of changed herds again (mergeNeighbourhoods.py)
 # Numpy is used for numerical operations, e.g. for handling arrays and mathematical functions
 # os is used for file path handling and directory creation
 
+# Command line: only --profile (instrumentation.py)
+parse_profile_flag("Merge the herd dots and render the cutout.")
+
 # File paths
-herd_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Merged_Herd_Population_Location.csv"
-us_states_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\US States\us-state-boundaries.geojson"
-output_dir = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp"
+herd_data_path = settings.merged_herd_location_csv_path
+us_states_path = settings.us_states_path
+output_dir = settings.project_dir
 
 # Load data
-df = pd.read_csv(herd_data_path)
-df = df.dropna(subset=["latitude", "longitude"])
-gdf = gpd.GeoDataFrame(
-    df,
-    geometry=gpd.points_from_xy(df["longitude"], df["latitude"]),
-    crs="EPSG:3857"
-)
+# The herds are kept as a PointStore (pointStore.py): x, y, count and radius in one structured array, the shapely
+# points are only made for the final GeoDataFrame. EPSG:3857 is a projected coordinate system (in meters) used for
+# distance calculations
+with step("read merged herd locations") as s:
+    df = read_intermediate(herd_data_path)
+    df = df.dropna(subset=["latitude", "longitude"])
+    s.rows_out = len(df)
 
 # Initial attributes
-# creates the geo-dataframe with the herd data, EPSG:3857 is a projected coordinate system (in meters) used for distance calculations
-gdf["count"] = df["Total Population"].fillna(1)
-gdf["radius"] = 30  # keep small to preserve detail
+herds = PointStore.from_xy(
+    df["longitude"], df["latitude"],
+    count=df["Total Population"].fillna(1),
+    radius=settings.initial_radius,  # keep small to preserve detail
+    crs="EPSG:3857", path=store_path("herd_dots")
+)
 
 # Parameters for merging and growth
-growth_step = 30
-merge_threshold = 1.10
-max_outer_iterations = 30
-
-# The function uses a distance matrix to find pairs of dots that are close enough to be considered overlapping, then builds an adjacency list to represent the graph of overlapping dots
-# after, it uses a breadth-first search (BFS) to find all connected clusters
-def get_overlap_clusters(geo_points, threshold):
-    coords = np.vstack((geo_points.geometry.x, geo_points.geometry.y)).T
-    dist = distance_matrix(coords, coords)
-    n = len(geo_points)
-    adjacency = [[] for _ in range(n)]
-    for i in range(n):
-        for j in range(i + 1, n):
-            r1, r2 = geo_points.iloc[i]["radius"], geo_points.iloc[j]["radius"]
-            if dist[i, j] < (r1 + r2) * threshold:
-                adjacency[i].append(j)
-                adjacency[j].append(i)
-
-    visited = set()
-    dot_clusters = []
-    for i in range(n):
-        if i not in visited:
-            queue = [i]
-            dot_cluster = []
-            while queue:
-                curr = queue.pop()
-                if curr not in visited:
-                    visited.add(curr)
-                    dot_cluster.append(curr)
-                    queue.extend(adjacency[curr])
-            dot_clusters.append(dot_cluster)
-    return dot_clusters
+growth_step = settings.growth_step
+merge_threshold = settings.merge_threshold
+max_outer_iterations = settings.max_outer_iterations
 
-# Main iterative loop
+# Main iterative loop (DotMerger from dotMerging.py)
 # The outer loop iterates until either all dots are merged or the maximum number of iterations is reached
 # The inner loop merges overlapping dots and grows their radius and continues until no more overlaps are found
-
-for outer in range(max_outer_iterations):
-    merged = False
-    while True:
-        clusters = get_overlap_clusters(gdf, merge_threshold)
-
-        if len(clusters) == len(gdf):  # overlaps
-            break
-
-        merged = True
-        merged_points, merged_counts, merged_radii = [], [], []
-
-
-        for cluster in clusters:
-            pts = gdf.iloc[cluster]
-            total = pts["count"].sum()
-            weights = pts["count"].values
-            if total == 0:
-                x = pts.geometry.x.mean()
-                y = pts.geometry.y.mean()
-            else:
-                x = np.average(pts.geometry.x, weights=weights)
-                y = np.average(pts.geometry.y, weights=weights)
-
-            merged_points.append(Point(x, y))
-            merged_counts.append(total)
-            merged_radii.append(np.sqrt(total) * 200)
-
-        gdf = gpd.GeoDataFrame(
-            {"geometry": merged_points, "count": merged_counts, "radius": merged_radii},
-            crs="EPSG:3857"
+# The dots are kept as NumPy arrays while merging, only dots that changed are re-checked for overlaps,
+# and the GeoDataFrame is built once at the end (from the herd table only if no dots were merged)
+# The run is saved per (merge_threshold, growth_step) as a merge hierarchy (mergeHierarchy.py): rendering again, or
+# with another max_outer_iterations, cuts the saved hierarchy instead of merging again, with the same result
+# In incremental mode, the herds are split into neighbourhoods that can never touch each other and only those with
+# changed herds are merged again, the others are taken from the last run (same result as merging everything)
+
+with step("merge and grow dots", rows_in=len(herds)) as s:
+    x, y, count, radius = herds["x"], herds["y"], herds["count"], herds["radius"]
+    if incremental.mode() == "off":
+        hierarchy, status = MergeHierarchy.load_or_build(
+            x, y, count, radius,
+            threshold=merge_threshold, growth_step=growth_step, max_outer_iterations=max_outer_iterations
         )
-
-    # After merging, grow
-    gdf["radius"] += growth_step
-
-    # Recheck overlaps after growth
-    post_growth_clusters = get_overlap_clusters(gdf, merge_threshold)
-    if len(post_growth_clusters) == len(gdf):
-        print(f"Fully complete after {outer + 1} growth iterations — no overlaps remain.")
-        break
+        merger = hierarchy.cut(max_outer_iterations)
+        print(f"✅ Merge hierarchy {status}: {hierarchy.levels} growth iterations, cut at {merger.outer_iterations}")
+        s.extra["hierarchy"] = status
     else:
-        print(f"Growth iteration {outer + 1} complete — still {len(gdf)} dots")
+        merger, changes, neighbourhoods = incremental.merge_dots(
+            df, x, y, count, radius,
+            threshold=merge_threshold, growth_step=growth_step, max_outer_iterations=max_outer_iterations
+        )
+        if changes is not None:
+            changes.report("Herd location changes")
+            s.extra.update(changes.counts())
+        print(f"🔁 Merged {len(neighbourhoods) - neighbourhoods.reused} of {len(neighbourhoods)} neighbourhoods "
+              f"({neighbourhoods.status})")
+        s.extra.update(neighbourhoods=len(neighbourhoods), neighbourhoods_reused=neighbourhoods.reused)
+        if incremental.mode() == "verify":
+            full = DotMerger(x, y, count, radius, threshold=merge_threshold, growth_step=growth_step)
+            full.run(max_outer_iterations, verbose=False)
+            incremental.check_identical("dot merge", same_dots(merger, full))
+    merger.report()
+    gdf = merger.to_geodataframe(crs=herds.crs, source=df)
+    herds.discard()
+    s.rows_out = len(gdf)
+    s.extra.update(outer_iterations=merger.outer_iterations, merge_passes=merger.merge_passes)
+
+# States of the dots (stateAssign.py), in EPSG:3857 like the merge: "state" holds the centre, a dot whose radius
+# reaches into more than one state is "cross_border"
+gdf_states, gdf_west = cutout_borders(us_states_path)
+with step("assign dots to states", rows_in=len(gdf)) as s:
+    state_index = StateIndex(gdf_states)
+    dot_x, dot_y = gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()
+    gdf["state"] = state_index.assign(dot_x, dot_y, max_distance=settings.state_snap_distance)
+    gdf["cross_border"] = state_index.reach(dot_x, dot_y, gdf["radius"].to_numpy()) > 1
+    s.extra.update(outside=int(gdf["state"].isna().sum()), cross_border=int(gdf["cross_border"].sum()))
+print(f"🗺️ {gdf['state'].nunique()} states, {int(gdf['cross_border'].sum())} dots across a state border, "
+      f"{int(gdf['state'].isna().sum())} outside all states")
 
 # Final conversion and size scaling
 gdf_final = gdf.to_crs("EPSG:4326") #Converts coordinates back to latitude/longitude (EPSG:4326)
@@ -118,36 +111,20 @@ sqrt_pop = np.sqrt(gdf_final["count"])
 sqrt_min, sqrt_max = sqrt_pop.min(), sqrt_pop.max()
 gdf_final["hole_size"] = 2 + (sqrt_pop - sqrt_min) / (sqrt_max - sqrt_min) * (20 - 2)
 
-# borders
-gdf_states = gpd.read_file(us_states_path).to_crs("EPSG:4326")
-excluded = ['Alaska', 'Hawaii', 'Puerto Rico', 'American Samoa', 'Guam',
-            'Commonwealth of the Northern Mariana Islands', 'United States Virgin Islands']
-gdf_states = gdf_states[~gdf_states['name'].isin(excluded)]
-western_states = ["Arizona", "California", "Colorado", "Idaho", "Montana", "Nevada",
-                  "New Mexico", "Oregon", "Utah", "Wyoming"]
-gdf_west = gdf_states[gdf_states["name"].isin(western_states)]
-
-# Final plot
-fig, ax = plt.subplots(figsize=(24, 15), facecolor="black")
-ax.set_facecolor("black")
-gdf_states.boundary.plot(ax=ax, color="white", linewidth=1.0, linestyle="dashed", alpha=0.8)
-gdf_west.boundary.plot(ax=ax, color="red", linewidth=0.8)
-
-gdf_final.plot(
-    ax=ax,
-    marker='o',
-    color='white',
-    linewidth=0.5,
-    markersize=gdf_final["hole_size"] ** 1.5,
-    alpha=1
-)
-
-ax.set_xticks([])
-ax.set_yticks([])
-ax.set_title("Merged Herd Population Clusters", color="white", fontsize=16)
-
-# Export
-os.makedirs(output_dir, exist_ok=True)
-plt.savefig(os.path.join(output_dir, "herd_distribution_cutout_FINAL.png"), dpi=300, bbox_inches='tight', facecolor='black')
-plt.savefig(os.path.join(output_dir, "herd_distribution_cutout_FINAL.svg"), format='svg', bbox_inches='tight', facecolor='black')
-plt.show()
+# The final dots for the UV texture (uvTexture.py)
+write_intermediate(gdf_final[["count", "radius", "hole_size", "state", "cross_border", "geometry"]],
+                   settings.cutout_dots_path)
+
+with step("render cutout", rows_in=len(gdf_final)) as s:
+    # Final plot, drawn once from the geometry arrays and written as SVG and PNG (cutoutRender.py)
+    renderer = CutoutRenderer(24, 15, background="black", aspect=aspect_for(gdf_states))
+    add_cutout_layers(renderer, gdf_final, gdf_states, gdf_west)
+    renderer.set_title("Merged Herd Population Clusters", color="white", size=16)
+
+    # Export
+    os.makedirs(output_dir, exist_ok=True)
+    renderer.to_png(settings.cutout_png_path, dpi=300)
+    report = export_svg(renderer, settings.cutout_svg_path)
+    if report is not None:
+        print(f"📐 Cutter SVG: {describe(report)}")
+        s.extra.update(report)
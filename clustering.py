@@ -0,0 +1,150 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import settings
+
+# One entry point for the clustering used by clusterStates.py and clusterHerds.py
+#   labels = cluster(coords, "hdbscan", min_cluster_size=5, min_samples=3)
+# Methods: "kmeans", "minibatch" (MiniBatchKMeans), "hdbscan", "hdbscan_sample" and "grid" (square bins of cell_size)
+# "hdbscan_sample" is HDBSCAN for 100k+ points: only a random sample of sample_size points is clustered, every point
+# takes the label of its nearest sampled point (a KD-tree query), so the time grows about linearly with the points;
+# with at most sample_size points it is plain HDBSCAN
+# HDBSCAN can be given a joblib Memory: its minimum spanning tree (the KD-tree and core distances) depends only on the
+# points and min_samples, so a sweep over min_cluster_size builds it once and only re-runs the cheap condensing step
+# scikit-learn and hdbscan are imported by the method that uses them (hdbscan alone takes about 2 s to import), so the
+# scripts that only use the grid (e.g. fabrication.py) or only render do not pay for them
+
+METHODS = ("kmeans", "minibatch", "hdbscan", "hdbscan_sample", "grid")
+
+
+def hdbscan_memory(location=None):
+    """joblib Memory for HDBSCAN's spanning trees, under cache_dir/hdbscan unless another folder is given."""
+    from joblib import Memory
+    return Memory(location or os.path.join(settings.cache_dir, "hdbscan"), verbose=0)
+
+
+def _kmeans(coords, n_clusters=8, random_state=42, n_init=10, **params):
+    from sklearn.cluster import KMeans
+    n_clusters = min(n_clusters, len(coords))
+    return KMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init, **params).fit_predict(coords)
+
+
+def _minibatch(coords, n_clusters=8, random_state=42, n_init=3, batch_size=1024, **params):
+    from sklearn.cluster import MiniBatchKMeans
+    n_clusters = min(n_clusters, len(coords))
+    return MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init,
+                           batch_size=batch_size, **params).fit_predict(coords)
+
+
+def _hdbscan(coords, min_cluster_size=5, min_samples=None, memory=None, **params):
+    try:
+        import hdbscan
+    except ImportError:
+        raise ImportError("method='hdbscan' needs the hdbscan package") from None
+    if memory is not None:
+        params["memory"] = memory
+    return hdbscan.HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples, **params).fit_predict(coords)
+
+
+def _hdbscan_sample(coords, sample_size=5000, random_state=42, **params):
+    if len(coords) <= sample_size:
+        return _hdbscan(coords, **params)
+    from scipy.spatial import cKDTree
+    sample = np.sort(np.random.default_rng(random_state).choice(len(coords), sample_size, replace=False))
+    sample_labels = np.asarray(_hdbscan(coords[sample], **params))
+    _, nearest = cKDTree(coords[sample]).query(coords)
+    labels = sample_labels[nearest]
+    labels[sample] = sample_labels  # sampled points keep their own label (also with duplicate coordinates)
+    return labels
+
+
+def _grid(coords, cell_size=1.0, origin=None):
+    """Square bins of cell_size, labelled in order of the bins (row by row)."""
+    origin = coords.min(axis=0) if origin is None else np.asarray(origin, dtype=float)
+    cells = np.floor((coords - origin) / cell_size).astype(np.int64)
+    _, labels = np.unique(cells, axis=0, return_inverse=True)
+    return labels.reshape(-1)
+
+
+_ALGORITHMS = {"kmeans": _kmeans, "minibatch": _minibatch, "hdbscan": _hdbscan, "hdbscan_sample": _hdbscan_sample,
+               "grid": _grid}
+_MODULES = {"kmeans": "sklearn.cluster", "minibatch": "sklearn.cluster", "hdbscan": "hdbscan",
+            "hdbscan_sample": "hdbscan"}
+
+
+def preload(*methods):
+    """Imports the packages of the given methods now (missing packages are left to the method to report).
+
+    Called before a process pool is started, forked workers inherit the packages instead of each importing them
+    again; as the pool's initializer it also covers spawned workers (Windows, macOS), which import them once at
+    start-up instead of inside their first job.
+    """
+    import importlib
+    for method in methods:
+        if method in _MODULES:
+            try:
+                importlib.import_module(_MODULES[method])
+            except ImportError:
+                pass
+
+
+def cluster(coords, method="kmeans", **params):
+    """Cluster labels (one int per point, -1 is noise for HDBSCAN) of an (n, 2) coordinate array."""
+    if method not in _ALGORITHMS:
+        raise ValueError(f"Unknown clustering method {method!r}, use one of {', '.join(METHODS)}")
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.asarray(_ALGORITHMS[method](coords, **params))
+
+
+def _cluster_job(job):
+    coords, method, params = job
+    return cluster(coords, method, **params)
+
+
+def cluster_groups(jobs, workers=1):
+    """Clusters independent groups of points, in worker processes if workers > 1.
+
+    ``jobs`` maps a group key to (coords, method, params); returns a dict group key -> labels in the same order.
+    Scripts that use workers > 1 have to run their code under ``if __name__ == "__main__"`` (spawned workers
+    import the main module).
+    """
+    keys = list(jobs)
+    if workers > 1 and len(keys) > 1:
+        methods = sorted({method for _, method, _ in jobs.values()})
+        preload(*methods)
+        with ProcessPoolExecutor(max_workers=min(workers, len(keys)), initializer=preload,
+                                 initargs=methods) as executor:
+            labels = list(executor.map(_cluster_job, [jobs[key] for key in keys]))
+    else:
+        labels = [_cluster_job(jobs[key]) for key in keys]
+    return dict(zip(keys, labels))
+
+
+def sweep(coords, method, param_grid, memory=None):
+    """Clusters the same points with every combination of param_grid ({name: [values]}).
+
+    For HDBSCAN the spanning trees are cached in ``memory`` (hdbscan_memory(), the persistent cache_dir/hdbscan, if not
+    given), combinations that only differ in min_cluster_size (or the other selection parameters) reuse them, and so
+    do later sweeps over the same points.
+    Returns one dict per combination: params, labels, clusters, noise and seconds.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    if method == "hdbscan" and memory is None:
+        memory = hdbscan_memory()
+    names = list(param_grid)
+    results = []
+    for values in itertools.product(*(param_grid[name] for name in names)):
+        params = dict(zip(names, values))
+        start = time.perf_counter()
+        labels = cluster(coords, method, **params, **({"memory": memory} if method == "hdbscan" else {}))
+        results.append({
+            "params": params, "labels": labels, "clusters": len(set(labels.tolist()) - {-1}),
+            "noise": int((labels == -1).sum()), "seconds": time.perf_counter() - start,
+        })
+    return results
@@ -0,0 +1,354 @@
+import math
+from xml.sax.saxutils import escape
+
+import numpy as np
+import shapely
+
+# Renders the cutout maps (state outlines and population dots) straight from geometry arrays
+# The SVG is written as text (one <path> per layer, one <circle> per dot) and the PNG is drawn with Pillow from the
+# same layers, so no matplotlib figure is created; styles are plain objects that can be shared between many renders
+# Units follow matplotlib: line widths, dash lengths and dot radii are in points (1/72 inch), sizes in inches
+# matplotlib is only imported when a color is first converted (it takes 0.2 s), not with this module, so importing
+# the scripts that render (clusterStates.py, stateBoundaries.py) stays cheap
+# cutout_borders() and add_cutout_layers() build the herd cutout of clusterStates_dots.py, which uvTexture.py also
+# rasterizes as a texture (textureTiles.py)
+
+# States left out of the cutout, and the states with wild horses and burros (outlined in red)
+EXCLUDED_STATES = ["Alaska", "Hawaii", "Puerto Rico", "American Samoa", "Guam",
+                   "Commonwealth of the Northern Mariana Islands", "United States Virgin Islands"]
+WESTERN_STATES = ["Arizona", "California", "Colorado", "Idaho", "Montana", "Nevada",
+                  "New Mexico", "Oregon", "Utah", "Wyoming"]
+
+
+class Style:
+    """Stroke/fill of a layer; colors are anything matplotlib understands ("white", "#ff0000", (1, 0, 0))."""
+
+    __slots__ = ("stroke", "stroke_width", "fill", "dash", "alpha")
+
+    def __init__(self, stroke=None, stroke_width=1.0, fill=None, dash=None, alpha=1.0):
+        self.stroke = stroke
+        self.stroke_width = stroke_width
+        self.fill = fill
+        self.dash = dash  # (on, off) in points, e.g. matplotlib's "dashed" is (3.7, 1.6) times the line width
+        self.alpha = alpha
+
+
+def to_rgb(color):
+    from matplotlib.colors import to_rgb
+    return to_rgb(color)
+
+
+def to_hex(color):
+    from matplotlib.colors import to_hex
+    return to_hex(color)
+
+
+def dashed(stroke, stroke_width=1.0, alpha=1.0):
+    """matplotlib's linestyle="dashed" for the given line width."""
+    return Style(stroke, stroke_width, dash=(3.7 * stroke_width, 1.6 * stroke_width), alpha=alpha)
+
+
+def geographic_aspect(miny, maxy):
+    """y stretch GeoPandas uses for EPSG:4326 plots, 1 / cos(mean latitude)."""
+    return 1 / math.cos(math.radians((miny + maxy) / 2))
+
+
+def aspect_for(gdf):
+    """Aspect of a frame like GeoDataFrame.plot sets it (stretched for geographic CRS, 1 otherwise)."""
+    if gdf.crs is not None and gdf.crs.is_geographic and len(gdf):
+        _, miny, _, maxy = gdf.total_bounds
+        return geographic_aspect(miny, maxy)
+    return 1.0
+
+
+def geometry_paths(geometries):
+    """Coordinate arrays of every ring/line of (multi)polygons and (multi)lines, and whether each one is closed."""
+    parts = shapely.get_parts(np.asarray(geometries, dtype=object))
+    parts = parts[~shapely.is_empty(parts)]
+    type_ids = shapely.get_type_id(parts)
+    polygons = parts[type_ids == 3]
+    lines = parts[(type_ids == 1) | (type_ids == 2)]
+    rings = shapely.get_rings(polygons) if len(polygons) else np.empty(0, dtype=object)
+
+    paths = []
+    for items, closed in ((rings, True), (lines, False)):
+        if not len(items):
+            continue
+        coords = shapely.get_coordinates(items)
+        splits = np.cumsum(shapely.get_num_coordinates(items))[:-1]
+        paths.extend((part, closed) for part in np.split(coords, splits))
+    return paths
+
+
+class Layer:
+    __slots__ = ("kind", "data", "style", "colors", "geometries")
+
+    def __init__(self, kind, data, style, colors=None, geometries=None):
+        self.kind = kind
+        self.data = data
+        self.style = style
+        self.colors = colors
+        self.geometries = geometries  # the source geometries of a "paths" layer (fabrication.py simplifies them)
+
+
+class CutoutRenderer:
+    """Collects layers in data coordinates and writes them as SVG and/or PNG.
+
+    The drawing is scaled to fit ``width`` x ``height`` inches (keeping the aspect ratio, y stretched by ``aspect``)
+    and cropped to the drawing plus ``pad`` inches, like savefig(bbox_inches="tight").
+    """
+
+    def __init__(self, width=6.0, height=6.0, background=None, aspect=1.0, pad=0.1):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.aspect = aspect
+        self.pad = pad
+        self.layers = []
+        self.title = None
+
+    def add_paths(self, geometries, style):
+        """Outlines (and fills, if the style has one) of polygons and lines."""
+        geometries = np.asarray(geometries, dtype=object)
+        self.layers.append(Layer("paths", geometry_paths(geometries), style, geometries=geometries))
+        return self
+
+    def add_circles(self, x, y, radius, style, colors=None):
+        """Dots at x/y with radius in points (scalar or per dot); ``colors`` gives a fill color per dot."""
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), x.shape)
+        self.layers.append(Layer("circles", (x, y, radius), style, colors))
+        return self
+
+    def set_title(self, text, color="black", size=16):
+        self.title = (text, color, size)
+        return self
+
+    # Layout
+
+    def _bounds(self):
+        boxes = []
+        for layer in self.layers:
+            if layer.kind == "paths" and layer.data:
+                coords = np.concatenate([path for path, _ in layer.data])
+                boxes.append((*coords.min(axis=0), *coords.max(axis=0)))
+            elif layer.kind == "circles" and len(layer.data[0]):
+                x, y, _ = layer.data
+                boxes.append((x.min(), y.min(), x.max(), y.max()))
+        if not boxes:
+            return 0.0, 0.0, 1.0, 1.0
+        boxes = np.array(boxes)
+        return boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()
+
+    def layout(self, units_per_inch, title=True):
+        """Function mapping data x/y arrays to output units, and the output size in those units.
+
+        Without ``title`` no space is left above the drawing for it.
+        """
+        minx, miny, maxx, maxy = self._bounds()
+        dx, dy = max(maxx - minx, 1e-12), max((maxy - miny) * self.aspect, 1e-12)
+        scale = min(self.width / dx, self.height / dy) * units_per_inch
+        pad = self.pad * units_per_inch
+        title_height = self.title[2] * 1.8 / 72 * units_per_inch if self.title and title else 0.0
+        width = dx * scale + 2 * pad
+        height = dy * scale + 2 * pad + title_height
+        top = pad + title_height
+
+        def transform(x, y):
+            return pad + (np.asarray(x) - minx) * scale, top + (maxy - np.asarray(y)) * self.aspect * scale
+
+        return transform, width, height
+
+    # SVG
+
+    def to_svg(self, path=None, precision=2):
+        """Writes (or returns, without a path) the SVG document, in points."""
+        transform, width, height = self.layout(72)
+        out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.{precision}f}pt" '
+               f'height="{height:.{precision}f}pt" viewBox="0 0 {width:.{precision}f} {height:.{precision}f}">']
+        if self.background is not None:
+            out.append(f'<rect width="100%" height="100%" fill="{to_hex(self.background)}"/>')
+        if self.title:
+            text, color, size = self.title
+            out.append(f'<text x="{width / 2:.{precision}f}" y="{size * 1.2:.{precision}f}" font-size="{size}" '
+                       f'font-family="DejaVu Sans, sans-serif" text-anchor="middle" fill="{to_hex(color)}">'
+                       f'{escape(text)}</text>')
+
+        for layer in self.layers:
+            style = layer.style
+            attrs = _svg_style(style)
+            if layer.kind == "paths":
+                d = []
+                for coords, closed in layer.data:
+                    px, py = transform(coords[:, 0], coords[:, 1])
+                    # Python floats format a lot faster than numpy scalars
+                    points = "L".join(f"{a:.{precision}f},{b:.{precision}f}" for a, b in zip(px.tolist(), py.tolist()))
+                    d.append("M" + points + ("Z" if closed else ""))
+                if d:
+                    out.append(f'<path{attrs} d="{"".join(d)}"/>')
+            else:
+                x, y, radius = layer.data
+                px, py = transform(x, y)
+                px, py, r = px.tolist(), py.tolist(), radius.tolist()
+                for color, index in color_groups(layer.colors, len(px)):
+                    out.append(f"<g{_svg_style(style, color)}>")
+                    out.extend(f'<circle cx="{px[i]:.{precision}f}" cy="{py[i]:.{precision}f}" '
+                               f'r="{r[i]:.{precision}f}"/>' for i in index)
+                    out.append("</g>")
+        out.append("</svg>")
+        document = "\n".join(out)
+        if path is None:
+            return document
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(document)
+        return path
+
+    # PNG
+
+    def _png_colors(self, background):
+        """Every color the PNG is drawn with (already blended against the background)."""
+        colors = {_rgb255(background)}
+        if self.title:
+            colors.add(_rgb255(to_rgb(self.title[1])))
+        for layer in self.layers:
+            style = layer.style
+            colors.update(_blend(c, style.alpha, background) for c in (style.stroke, style.fill) if c is not None)
+            if layer.kind == "circles":
+                colors.update(_blend(color, style.alpha, background)
+                              for color, _ in color_groups(layer.colors, 0) if color is not None)
+        return colors
+
+    def to_png(self, path, dpi=100):
+        """Draws the layers with Pillow at dpi; transparency is blended against the background color.
+
+        Drawings with up to 256 colors (all cutouts) are written as palette PNGs, a third of the pixels of RGB
+        to compress, which is most of the time at 300 dpi; the title is then drawn without anti-aliasing.
+        """
+        from PIL import Image, ImageDraw, ImageFont
+
+        transform, width, height = self.layout(dpi)
+        background = to_rgb(self.background) if self.background is not None else (1.0, 1.0, 1.0)
+        mode = "P" if len(self._png_colors(background)) <= 256 else "RGB"
+        image = Image.new(mode, (max(1, round(width)), max(1, round(height))), _rgb255(background))
+        draw = ImageDraw.Draw(image)
+        px_per_pt = dpi / 72
+
+        if self.title:
+            text, color, size = self.title
+            font = ImageFont.load_default(size=size * px_per_pt)
+            draw.text((width / 2, size * 1.2 * px_per_pt), text, fill=_rgb255(to_rgb(color)), font=font, anchor="ms")
+
+        for layer in self.layers:
+            style = layer.style
+            stroke = _blend(style.stroke, style.alpha, background)
+            fill = _blend(style.fill, style.alpha, background)
+            line_width = max(1, round(style.stroke_width * px_per_pt))
+            if layer.kind == "paths":
+                for coords, closed in layer.data:
+                    px, py = transform(coords[:, 0], coords[:, 1])
+                    points = np.column_stack((px, py))
+                    if closed and fill is not None:
+                        draw.polygon([tuple(p) for p in points], fill=fill)
+                    if stroke is None:
+                        continue
+                    if style.dash:
+                        on, off = style.dash[0] * px_per_pt, style.dash[1] * px_per_pt
+                        for piece in dash_pieces(points, on, off):
+                            draw.line([tuple(p) for p in piece], fill=stroke, width=line_width)
+                    else:
+                        draw.line([tuple(p) for p in points], fill=stroke, width=line_width, joint="curve")
+            else:
+                x, y, radius = layer.data
+                px, py = transform(x, y)
+                r = radius * px_per_pt
+                for color, index in color_groups(layer.colors, len(px)):
+                    dot_fill = _blend(color, style.alpha, background) if color is not None else fill
+                    for i in index:
+                        box = (px[i] - r[i], py[i] - r[i], px[i] + r[i], py[i] + r[i])
+                        draw.ellipse(box, fill=dot_fill, outline=stroke,
+                                     width=line_width if stroke is not None else 0)
+        image.save(path, dpi=(dpi, dpi))
+        return path
+
+
+def _svg_style(style, fill=None):
+    fill = fill if fill is not None else style.fill
+    attrs = [f' fill="{to_hex(fill)}"' if fill is not None else ' fill="none"']
+    if style.stroke is not None:
+        attrs.append(f' stroke="{to_hex(style.stroke)}" stroke-width="{style.stroke_width:g}"'
+                     ' stroke-linejoin="round"')
+        if style.dash:
+            attrs.append(f' stroke-dasharray="{style.dash[0]:g},{style.dash[1]:g}"')
+    if style.alpha != 1:
+        attrs.append(f' opacity="{style.alpha:g}"')
+    return "".join(attrs)
+
+
+def color_groups(colors, n):
+    """(color, indices) per distinct color; a single group with color None if there are no per-dot colors."""
+    if colors is None:
+        return [(None, range(n))]
+    colors = list(colors)
+    groups = {}
+    for i, color in enumerate(colors):
+        groups.setdefault(to_hex(color), []).append(i)
+    return list(groups.items())
+
+
+def _rgb255(rgb):
+    return tuple(round(c * 255) for c in rgb)
+
+
+def _blend(color, alpha, background):
+    if color is None:
+        return None
+    rgb = np.array(to_rgb(color))
+    return _rgb255(rgb * alpha + np.array(background) * (1 - alpha))
+
+
+def dash_pieces(points, on, off):
+    """Splits a polyline (in pixels) into the visible pieces of an on/off dash pattern."""
+    distance = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))))
+    total = distance[-1]
+    pieces = []
+    for start in np.arange(0.0, total, on + off):
+        end = min(start + on, total)
+        inside = (distance > start) & (distance < end)
+        xs = np.concatenate(([np.interp(start, distance, points[:, 0])], points[inside, 0],
+                             [np.interp(end, distance, points[:, 0])]))
+        ys = np.concatenate(([np.interp(start, distance, points[:, 1])], points[inside, 1],
+                             [np.interp(end, distance, points[:, 1])]))
+        pieces.append(np.column_stack((xs, ys)))
+    return pieces
+
+
+def label_colors(labels, cmap="tab10"):
+    """Colors per label like GeoDataFrame.plot(column=..., cmap=...) for a numeric column (labels scaled to the
+    colormap's range), noise (-1) included."""
+    labels = np.asarray(labels, dtype=float)
+    low, high = labels.min(), labels.max()
+    scaled = (labels - low) / (high - low) if high > low else np.zeros_like(labels)
+    from matplotlib import colormaps
+    return colormaps[cmap](scaled)[:, :3]
+
+
+def dot_radius(markersize):
+    """Radius in points of a matplotlib marker of the given markersize (scatter's s, in points squared)."""
+    return np.sqrt(np.asarray(markersize, dtype=float)) / 2
+
+
+def cutout_borders(us_states_path):
+    """The state boundaries of the cutout (EPSG:4326, without EXCLUDED_STATES) and the western states among them."""
+    import geopandas as gpd
+    gdf_states = gpd.read_file(us_states_path).to_crs("EPSG:4326")
+    gdf_states = gdf_states[~gdf_states["name"].isin(EXCLUDED_STATES)]
+    return gdf_states, gdf_states[gdf_states["name"].isin(WESTERN_STATES)]
+
+
+def add_cutout_layers(renderer, dots, states, west):
+    """The herd cutout: all state borders dashed white, the western states red and the dots (hole_size) white."""
+    renderer.add_paths(states.geometry, dashed("white", 1.0, alpha=0.8))
+    renderer.add_paths(west.geometry, Style("red", 0.8))
+    renderer.add_circles(dots.geometry.x, dots.geometry.y, dot_radius(dots["hole_size"] ** 1.5),
+                         Style("white", 0.5, fill="white"))
+    return renderer
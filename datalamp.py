@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# One command line for all DataLamp scripts
+#   python datalamp.py --data-dir ~/thesis clusterStates --workers 4   # one script, its own options after its name
+#   python datalamp.py run --dry-run                                   # the cached pipeline (pipeline.py)
+#   python datalamp.py --set growth_step=40 run clusterStates_dots
+#   python datalamp.py imports                                         # import time of every subcommand
+# The folders, the format and the --set values are handed on as DATALAMP_* environment variables (settings.py), so
+# they also reach the stage processes of the pipeline
+# Only the standard library is imported before a subcommand is chosen; a subcommand imports what its script imports
+# and nothing else, so --help and a cached pipeline run start without pandas, GeoPandas or matplotlib
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommands that run one script, in pipeline order (the stages of pipeline.py)
+SCRIPTS = {
+    "cleanPopulation": ("cleanPopulation.py", "clean the BLM population statistics"),
+    "gdb_reader": ("gdb_reader.py", "read the herd area polygons and their centroids"),
+    "mergeHerdData": ("mergeHerdData.py", "match the herd population table to the herd areas"),
+    "assignHerdStates": ("assignHerdStates.py", "assign the herds to states by geometry and check the state keys"),
+    "mergeDatasets": ("mergeDatasets.py", "spread the state populations over the herd areas"),
+    "stateBoundaries": ("stateBoundaries.py", "split the US states and export their outlines"),
+    "clusterStates": ("clusterStates.py", "sample and cluster points inside every state"),
+    "clusterHerds": ("clusterHerds.py", "cluster the herd areas of every state"),
+    "clusterStates_dots": ("clusterStates_dots.py", "merge the herd dots and render the cutout"),
+    "uvTexture": ("uvTexture.py", "render the cutout as a tiled high-resolution texture"),
+}
+
+# Environment variables set by the global options (settings.py reads them when it is imported)
+ENVIRONMENT = {
+    "data_dir": "DATALAMP_DATA_DIR",
+    "project_dir": "DATALAMP_PROJECT_DIR",
+    "cache_dir": "DATALAMP_CACHE_DIR",
+    "run_log": "DATALAMP_RUN_LOG",
+    "format": "DATALAMP_INTERMEDIATE_FORMAT",
+}
+
+
+def setting_value(text):
+    """Value of --set NAME=VALUE: JSON (numbers, null, lists, quoted strings), anything else as a plain string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def apply_options(args):
+    """Puts the global options into the environment, before settings.py is imported by a subcommand."""
+    for option, variable in ENVIRONMENT.items():
+        value = getattr(args, option)
+        if value is not None:
+            os.environ[variable] = os.path.abspath(os.path.expanduser(value)) if option != "format" else value
+    if args.set:
+        overrides = json.loads(os.environ.get("DATALAMP_SETTINGS") or "{}")
+        for assignment in args.set:
+            name, separator, value = assignment.partition("=")
+            if not separator:
+                raise SystemExit(f"--set needs NAME=VALUE, got {assignment!r}")
+            overrides[name.strip()] = setting_value(value)
+        os.environ["DATALAMP_SETTINGS"] = json.dumps(overrides)
+
+
+def run_script(script, script_args):
+    """Runs a script in this process as its __main__ (its own argument parsing sees only script_args)."""
+    import runpy
+    path = os.path.join(repo_dir, script)
+    sys.argv = [path, *script_args]
+    runpy.run_path(path, run_name="__main__")
+
+
+def run_pipeline(pipeline_args):
+    import pipeline
+    sys.argv = [os.path.join(repo_dir, "pipeline.py"), *pipeline_args]
+    pipeline.main()
+
+
+def script_imports(script):
+    """Modules a script imports at module level (imports inside functions and classes are deferred anyway)."""
+    import ast
+    with open(os.path.join(repo_dir, script), encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=script)
+    modules = []
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop(0)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+        else:
+            nodes.extend(child for child in ast.iter_child_nodes(node) if isinstance(child, ast.stmt))
+    return list(dict.fromkeys(modules))
+
+
+def import_times(code):
+    """Cumulative import time in seconds of every top-level import of ``python -X importtime -c code``."""
+    import subprocess
+    env = dict(os.environ, MPLBACKEND="Agg")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=repo_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2]
+        if not name.startswith("  "):  # nested imports are indented by two more spaces per level
+            times[name.strip()] = int(fields[1]) / 1e6
+    return times
+
+
+def report_imports(names):
+    """Prints the import time of every subcommand, and the start-up time of ``datalamp.py --help``."""
+    import subprocess
+    startup = []
+    for _ in range(3):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(repo_dir, "datalamp.py"), "--help"], check=True,
+                       capture_output=True)
+        startup.append(time.perf_counter() - start)
+    print(f"datalamp.py --help: {min(startup):.3f} s (best of 3, interpreter start-up included)\n")
+
+    interpreter = set(import_times("pass"))
+    print(f"{'Subcommand':<20} {'Imports [s]':>11}  Heaviest imports")
+    for name in names:
+        modules = script_imports(SCRIPTS[name][0] if name in SCRIPTS else "pipeline.py")
+        times = {module: seconds for module, seconds in import_times("\n".join(f"import {m}" for m in modules)).items()
+                 if module not in interpreter}
+        heaviest = sorted(times.items(), key=lambda item: -item[1])[:3]
+        print(f"{name:<20} {sum(times.values()):>11.3f}  {', '.join(f'{m} {s:.2f}' for m, s in heaviest)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="datalamp", description="Run the DataLamp scripts and pipeline.")
+    parser.add_argument("--data-dir", help="folder of the source data (default: settings.py)")
+    parser.add_argument("--project-dir", help="folder of the outputs (default: DataLamp in the data folder)")
+    parser.add_argument("--cache-dir", help="folder of the caches (default: .datalamp_cache in the project folder)")
+    parser.add_argument("--run-log", help="JSON lines file of the step timings")
+    parser.add_argument("--format", choices=["geojson", "parquet", "feather"], help="format of the intermediate files")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE",
+                        help="override a setting of settings.py, VALUE is read as JSON if it can be (repeatable)")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+    for name, (script, description) in SCRIPTS.items():
+        command = commands.add_parser(name, help=f"{description} ({script})", add_help=False,
+                                      description=f"Runs {script}; the other arguments are passed on to it.")
+        command.add_argument("script_args", nargs=argparse.REMAINDER)
+    run = commands.add_parser("run", help="run the cached pipeline (pipeline.py)", add_help=False,
+                              description="Runs pipeline.py; the other arguments are passed on to it.")
+    run.add_argument("script_args", nargs=argparse.REMAINDER)
+    imports = commands.add_parser("imports", help="measure the import time of the subcommands")
+    imports.add_argument("names", nargs="*", metavar="SUBCOMMAND",
+                         help=f"subcommands to measure, of {', '.join([*SCRIPTS, 'run'])} (default: all)")
+    # Arguments of the script that start with an option (e.g. --workers 4, --help) are not taken by REMAINDER
+    args, extra = parser.parse_known_args()
+    if args.command == "imports" and extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    # Checked here, argparse's choices rejects an empty nargs="*" list on some Python versions
+    unknown = [name for name in getattr(args, "names", None) or [] if name not in SCRIPTS and name != "run"]
+    if unknown:
+        parser.error(f"unknown subcommand(s) for imports: {', '.join(unknown)}")
+
+    apply_options(args)
+    if args.command == "imports":
+        report_imports(args.names or [*SCRIPTS, "run"])
+    elif args.command == "run":
+        run_pipeline([*extra, *args.script_args])
+    else:
+        run_script(SCRIPTS[args.command][0], [*extra, *args.script_args])
+
+
+if __name__ == "__main__":
+    main()
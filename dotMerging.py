@@ -0,0 +1,343 @@
+import time
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point
+from scipy.spatial import cKDTree, distance_matrix, minkowski_distance
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# GeoPandas is only used to build the final GeoDataFrame of the merged dots
+# Numpy is used for the array form of the dots (coordinates and radii)
+# SciPy provides the KD-tree for the radius queries, the sparse adjacency matrix and the connected components
+# distance_matrix is only used by the original BFS version, which is kept as a reference for benchmarks
+
+# Small safety margin for the KD-tree bound, so no pair is lost to rounding before the exact check
+KDTREE_BOUND_MARGIN = 1e-9
+
+
+# The original implementation from clusterStates_dots.py, kept unchanged so the KD-tree version can be checked against it
+# It builds the full distance matrix and loops over every pair, so it is only usable for small inputs
+def get_overlap_clusters_bfs(geo_points, threshold):
+    coords = np.vstack((geo_points.geometry.x, geo_points.geometry.y)).T
+    dist = distance_matrix(coords, coords)
+    n = len(geo_points)
+    adjacency = [[] for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            r1, r2 = geo_points.iloc[i]["radius"], geo_points.iloc[j]["radius"]
+            if dist[i, j] < (r1 + r2) * threshold:
+                adjacency[i].append(j)
+                adjacency[j].append(i)
+
+    visited = set()
+    dot_clusters = []
+    for i in range(n):
+        if i not in visited:
+            queue = [i]
+            dot_cluster = []
+            while queue:
+                curr = queue.pop()
+                if curr not in visited:
+                    visited.add(curr)
+                    dot_cluster.append(curr)
+                    queue.extend(adjacency[curr])
+            dot_clusters.append(dot_cluster)
+    return dot_clusters
+
+
+
+# The original merge-and-grow loop from clusterStates_dots.py, which rebuilds the GeoDataFrame after every merge pass
+# Kept as a reference so DotMerger can be checked against it; it uses the KD-tree overlap detection to stay usable on larger inputs
+def merge_and_grow_reference(gdf, merge_threshold=1.10, growth_step=30, max_outer_iterations=30):
+    gdf = gdf.copy()
+    for outer in range(max_outer_iterations):
+        while True:
+            clusters = get_overlap_clusters(gdf, merge_threshold)
+
+            if len(clusters) == len(gdf):  # overlaps
+                break
+
+            merged_points, merged_counts, merged_radii = [], [], []
+            for cluster in clusters:
+                pts = gdf.iloc[cluster]
+                total = pts["count"].sum()
+                weights = pts["count"].values
+                if total == 0:
+                    x = pts.geometry.x.mean()
+                    y = pts.geometry.y.mean()
+                else:
+                    x = np.average(pts.geometry.x, weights=weights)
+                    y = np.average(pts.geometry.y, weights=weights)
+
+                merged_points.append(Point(x, y))
+                merged_counts.append(total)
+                merged_radii.append(np.sqrt(total) * 200)
+
+            gdf = gpd.GeoDataFrame(
+                {"geometry": merged_points, "count": merged_counts, "radius": merged_radii},
+                crs="EPSG:3857"
+            )
+
+        # After merging, grow
+        gdf["radius"] += growth_step
+
+        # Recheck overlaps after growth
+        post_growth_clusters = get_overlap_clusters(gdf, merge_threshold)
+        if len(post_growth_clusters) == len(gdf):
+            break
+    return gdf
+
+def find_overlap_pairs(coords, radii, threshold, tree=None, dirty=None):
+    """Returns the index pairs (i < j) of dots whose distance is below (r1 + r2) * threshold.
+
+    If a boolean ``dirty`` mask is given, only pairs with at least one dirty dot are checked.
+    """
+    coords = np.asarray(coords, dtype=float)
+    radii = np.asarray(radii)
+    if len(coords) < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    if tree is None:
+        tree = cKDTree(coords)
+    query_idx = np.arange(len(coords)) if dirty is None else np.flatnonzero(dirty)
+    if len(query_idx) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    # No partner of dot i can be further away than (r_i + largest radius) * threshold
+    bounds = (radii[query_idx] + radii.max()) * threshold * (1 + KDTREE_BOUND_MARGIN)
+    neighbours = tree.query_ball_point(coords[query_idx], r=bounds)
+    counts = np.fromiter((len(n) for n in neighbours), dtype=np.intp, count=len(neighbours))
+    i_idx = np.repeat(query_idx, counts)
+    j_idx = np.fromiter((j for n in neighbours for j in n), dtype=np.intp, count=counts.sum())
+
+    # Each pair is kept once: from its smaller index, or from the dirty dot if only one of them is dirty
+    if dirty is None:
+        keep = j_idx > i_idx
+    else:
+        keep = (j_idx != i_idx) & (~dirty[j_idx] | (j_idx > i_idx))
+    i_idx, j_idx = i_idx[keep], j_idx[keep]
+    i_idx, j_idx = np.minimum(i_idx, j_idx), np.maximum(i_idx, j_idx)
+
+    # Same distance formula and comparison as distance_matrix in the BFS version, so the results are identical
+    dist = minkowski_distance(coords[i_idx], coords[j_idx])
+    overlapping = dist < (radii[i_idx] + radii[j_idx]) * threshold
+    return i_idx[overlapping], j_idx[overlapping]
+
+
+def clusters_from_pairs(n, i_idx, j_idx):
+    """Groups n dots into connected clusters, in the same order as the BFS version."""
+    if len(i_idx) == 0:
+        return [[i] for i in range(n)]
+
+    # Symmetric adjacency in CSR form; the sorted column indices match the adjacency lists of the BFS version
+    adjacency = coo_matrix(
+        (np.ones(2 * len(i_idx), dtype=np.int8), (np.concatenate((i_idx, j_idx)), np.concatenate((j_idx, i_idx)))),
+        shape=(n, n)
+    ).tocsr()
+    adjacency.sum_duplicates()
+    adjacency.sort_indices()
+    _, labels = connected_components(adjacency, directed=False)
+
+    # Clusters are ordered by their smallest index, like the outer loop of the BFS version
+    _, first_index, sizes = np.unique(labels, return_index=True, return_counts=True)
+    indptr, indices = adjacency.indptr, adjacency.indices
+
+    dot_clusters = []
+    visited = np.zeros(n, dtype=bool)
+    for start, size in sorted(zip(first_index.tolist(), sizes.tolist())):
+        if size == 1:
+            dot_clusters.append([start])
+            continue
+
+        # Same stack-based traversal as the BFS version so the order inside a cluster is identical too
+        queue = [start]
+        dot_cluster = []
+        while queue:
+            curr = queue.pop()
+            if not visited[curr]:
+                visited[curr] = True
+                dot_cluster.append(curr)
+                queue.extend(indices[indptr[curr]:indptr[curr + 1]].tolist())
+        dot_clusters.append(dot_cluster)
+    return dot_clusters
+
+
+def overlap_clusters(coords, radii, threshold, tree=None):
+    """Groups overlapping dots into clusters, in the same order as the BFS version."""
+    i_idx, j_idx = find_overlap_pairs(coords, radii, threshold, tree=tree)
+    return clusters_from_pairs(len(coords), i_idx, j_idx)
+
+
+# Drop-in replacement for the BFS version, takes the same GeoDataFrame with a "radius" column
+def get_overlap_clusters(geo_points, threshold):
+    coords = np.column_stack((geo_points.geometry.x.values, geo_points.geometry.y.values))
+    return overlap_clusters(coords, geo_points["radius"].values, threshold)
+
+
+# Merges overlapping dots and grows them, like the main loop of clusterStates_dots.py, but keeps the dots as NumPy arrays
+# Only dots that changed since the last check ("dirty" dots) are queried against the KD-tree, and the GeoDataFrame is built once at the end
+class DotMerger:
+    """Array-based merge-and-grow engine that reproduces the original GeoDataFrame loop bit for bit."""
+
+    __slots__ = ("x", "y", "count", "radius", "labels", "threshold", "growth_step",
+                 "outer_iterations", "merge_passes", "converged", "timings",
+                 "_tree", "_dirty", "_clusters")
+
+    def __init__(self, x, y, count, radius, threshold=1.10, growth_step=30):
+        self.x = np.asarray(x, dtype=float).copy()
+        self.y = np.asarray(y, dtype=float).copy()
+        self.count = np.asarray(count).copy()
+        self.radius = np.broadcast_to(np.asarray(radius), self.x.shape).copy()
+        # For every input dot, the index of the merged dot it currently belongs to
+        self.labels = np.arange(len(self.x))
+        self.threshold = threshold
+        self.growth_step = growth_step
+        self.outer_iterations = 0
+        self.merge_passes = 0
+        self.converged = False
+        self.timings = {"overlap": 0.0, "merge": 0.0, "index": 0.0, "growth": 0.0}
+        self._tree = None
+        self._dirty = np.ones(len(self.x), dtype=bool)
+        self._clusters = None
+
+    @classmethod
+    def from_geodataframe(cls, gdf, threshold=1.10, growth_step=30):
+        return cls(gdf.geometry.x.values, gdf.geometry.y.values, gdf["count"].values, gdf["radius"].values,
+                   threshold=threshold, growth_step=growth_step)
+
+    def __len__(self):
+        return len(self.x)
+
+    def overlap_clusters(self):
+        """Returns the current overlap clusters, only re-checking the dirty dots."""
+        if self._clusters is not None:
+            return self._clusters
+
+        start = time.perf_counter()
+        if self._tree is None:
+            self._tree = cKDTree(np.column_stack((self.x, self.y)))
+            self.timings["index"] += time.perf_counter() - start
+            start = time.perf_counter()
+
+        # Pairs of clean dots are known not to overlap, so only pairs with a dirty dot are checked
+        coords = self._tree.data
+        i_idx, j_idx = find_overlap_pairs(coords, self.radius, self.threshold, tree=self._tree, dirty=self._dirty)
+        self._clusters = clusters_from_pairs(len(self), i_idx, j_idx)
+        if len(self._clusters) == len(self):
+            self._dirty[:] = False
+        self.timings["overlap"] += time.perf_counter() - start
+        return self._clusters
+
+    def merge(self, clusters):
+        """Replaces every cluster by one dot at the count-weighted centroid with radius sqrt(total) * 200."""
+        start = time.perf_counter()
+        sizes = np.fromiter((len(c) for c in clusters), dtype=np.intp, count=len(clusters))
+        single = sizes == 1
+        members = np.fromiter((c[0] for c in clusters), dtype=np.intp, count=len(clusters))
+
+        # Single dots are recomputed too, exactly like np.average over one point: x * w / w
+        counts = self.count[members].copy()
+        weights = counts.copy()
+        x = np.multiply(self.x[members], weights)
+        y = np.multiply(self.y[members], weights)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x = np.where(counts == 0, self.x[members], x / weights)
+            y = np.where(counts == 0, self.y[members], y / weights)
+
+        for k in np.flatnonzero(~single):
+            cluster = clusters[k]
+            weights = self.count[cluster]
+            total = weights.sum()
+            if total == 0:
+                x[k] = self.x[cluster].mean()
+                y[k] = self.y[cluster].mean()
+            else:
+                x[k] = np.average(self.x[cluster], weights=weights)
+                y[k] = np.average(self.y[cluster], weights=weights)
+            counts[k] = total
+
+        radius = np.sqrt(counts) * 200
+
+        # A single dot stays clean only if it did not move and did not get bigger
+        dirty = ~single.copy()
+        dirty[single] = ((x[single] != self.x[members[single]]) | (y[single] != self.y[members[single]])
+                         | (radius[single] > self.radius[members[single]]))
+
+        new_index = np.empty(len(self), dtype=np.intp)
+        new_index[np.concatenate(clusters)] = np.repeat(np.arange(len(clusters)), sizes)
+        self.labels = new_index[self.labels]
+
+        self.x, self.y, self.count, self.radius = x, y, counts, radius
+        self._dirty = dirty
+        self._tree = None
+        self._clusters = None
+        self.merge_passes += 1
+        self.timings["merge"] += time.perf_counter() - start
+
+    def grow(self):
+        start = time.perf_counter()
+        self.radius = self.radius + self.growth_step
+        self._dirty[:] = True
+        self._clusters = None
+        self.timings["growth"] += time.perf_counter() - start
+
+    def merge_overlaps(self):
+        """Merges until no dots overlap; returns True if anything was merged."""
+        merged = False
+        while True:
+            clusters = self.overlap_clusters()
+            if len(clusters) == len(self):
+                return merged
+            merged = True
+            self.merge(clusters)
+
+    def run(self, max_outer_iterations=30, verbose=True, callback=None):
+        """Merges and grows until no overlaps remain after growth or max_outer_iterations is reached.
+
+        Continues from ``outer_iterations`` (a merger rebuilt from a snapshot resumes where it stopped);
+        ``callback(merger)`` is called after every growth iteration.
+        """
+        for outer in range(self.outer_iterations, max_outer_iterations):
+            self.merge_overlaps()
+
+            # After merging, grow
+            self.grow()
+            self.outer_iterations = outer + 1
+
+            # Recheck overlaps after growth (the result is reused by the next merge pass)
+            self.converged = len(self.overlap_clusters()) == len(self)
+            if callback is not None:
+                callback(self)
+            if self.converged:
+                if verbose:
+                    print(f"Fully complete after {outer + 1} growth iterations — no overlaps remain.")
+                break
+            elif verbose:
+                print(f"Growth iteration {outer + 1} complete — still {len(self)} dots")
+        return self
+
+    def report(self):
+        """Prints the number of iterations and the time spent in each phase."""
+        print(f"⏱️ {self.outer_iterations} growth iterations, {self.merge_passes} merge passes, {len(self)} dots left")
+        for phase, seconds in self.timings.items():
+            print(f"   - {phase}: {seconds:.3f} s")
+
+    def to_geodataframe(self, crs="EPSG:3857", source=None):
+        """Builds the GeoDataFrame of the merged dots.
+
+        Like the original loop, the columns of ``source`` are only kept if no merge pass ever ran; a source without
+        geometry (the herd table of a PointStore) gets the points and the counts of the dots first.
+        """
+        if source is not None and self.merge_passes == 0:
+            if isinstance(source, gpd.GeoDataFrame):
+                gdf = source.copy()
+            else:
+                gdf = gpd.GeoDataFrame(source, geometry=gpd.points_from_xy(self.x, self.y), crs=crs)
+                gdf["count"] = self.count
+            gdf["radius"] = self.radius
+            return gdf
+        return gpd.GeoDataFrame(
+            {"geometry": gpd.points_from_xy(self.x, self.y), "count": self.count, "radius": self.radius},
+            crs=crs
+        )
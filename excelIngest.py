@@ -0,0 +1,139 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+import settings
+
+# Excel ingestion for cleanPopulation.py and mergeHerdData.py
+# A workbook is streamed row by row from openpyxl's read-only mode, only the needed columns are kept, and the parsed
+# table is cached on disk (keyed on the workbook's size and mtime like herdAreas.py), so openpyxl runs once per file
+# The cells are converted and typed like pd.read_excel does it, the result is the same DataFrame
+
+try:
+    from openpyxl.cell.cell import ERROR_CODES
+except ImportError:  # openpyxl is only needed when a workbook is not cached yet
+    ERROR_CODES = ()
+
+
+def workbook_cache_path(path, sheet_name=0, skiprows=None, usecols=None):
+    stat = os.stat(path)
+    key = repr((os.path.abspath(path), sheet_name, skiprows, usecols, stat.st_size, stat.st_mtime_ns))
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(settings.cache_dir, "excel", f"{os.path.splitext(os.path.basename(path))[0]}_{digest[:16]}.pkl")
+
+
+def _convert_value(value):
+    """Cell value as pandas' openpyxl reader returns it (integral floats become ints, errors NaN, empty "")."""
+    if value is None:
+        return ""
+    if type(value) is float:
+        return int(value) if value.is_integer() else value
+    if type(value) is str and value in ERROR_CODES:
+        return np.nan
+    return value
+
+
+def max_unnamed_index(columns):
+    """Highest i of the "Unnamed: i" names in columns (-1 if there are none)."""
+    indices = [int(c[len("Unnamed: "):]) for c in columns
+               if isinstance(c, str) and c.startswith("Unnamed: ") and c[len("Unnamed: "):].isdigit()]
+    return max(indices, default=-1)
+
+
+def stream_excel(path, sheet_name=0, skiprows=None, usecols=None):
+    """pd.read_excel(path, sheet_name, skiprows=skiprows, usecols=usecols) for a single sheet, without holding every
+    cell of the workbook in memory; ``skiprows`` is a number of rows and ``usecols`` a list of column names."""
+    from openpyxl import load_workbook
+
+    book = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = book.worksheets[sheet_name] if isinstance(sheet_name, int) else book[sheet_name]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+
+        # Rows before the header
+        for _ in range(skiprows or 0):
+            if next(rows, None) is None:
+                return pd.DataFrame()
+
+        header = [_convert_value(v) for v in next(rows, ())]
+        while header and header[-1] == "":
+            header.pop()
+        # Columns right of the header only have "Unnamed: i" names, they are kept when all columns are read
+        keep = None
+        if usecols is not None:
+            names = list(TextParser([header], header=0).read().columns)
+            names += [f"Unnamed: {i}" for i in range(len(names), max_unnamed_index(usecols) + 1)]
+            keep = [i for i, name in enumerate(names) if name in usecols]
+
+        # Only the kept columns are stored, trailing empty rows are dropped like pandas does
+        data = []
+        last_row_with_data = -1
+        for row in rows:
+            if any(v is not None for v in row):
+                last_row_with_data = len(data)
+            if keep is None:
+                values = [_convert_value(v) for v in row]
+                while values and values[-1] == "":
+                    values.pop()
+                data.append(values)
+            else:
+                data.append([_convert_value(row[i]) if i < len(row) else "" for i in keep])
+        del data[last_row_with_data + 1:]
+    finally:
+        book.close()
+
+    if keep is None:
+        width = max([len(header)] + [len(values) for values in data])
+        header += [""] * (width - len(header))
+        data = [values + [""] * (width - len(values)) for values in data]
+        names = list(TextParser([header], header=0).read().columns)
+    else:
+        names = [names[i] for i in keep]
+    if not data:
+        return pd.DataFrame(columns=names)
+    return TextParser(data, names=names, header=None).read()
+
+
+def read_excel_cached(path, sheet_name=0, skiprows=None, usecols=None, refresh=False):
+    """Streams a sheet once (see stream_excel) and returns the cached table while the workbook is unchanged."""
+    usecols = list(usecols) if usecols is not None else None
+    cache_path = workbook_cache_path(path, sheet_name, skiprows, usecols)
+    if not refresh and os.path.exists(cache_path):
+        return pd.read_pickle(cache_path)
+
+    df = stream_excel(path, sheet_name, skiprows, usecols)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    df.to_pickle(cache_path)
+    return df
+
+
+def read_excel(path, skiprows=None, usecols=None, mode=None):
+    """Reads the first sheet of a workbook with the configured ingestion mode (settings.excel_ingestion):
+    "cached" (streamed once, then from the cache), "stream" (streamed every time) or "pandas" (pd.read_excel)."""
+    mode = mode or settings.excel_ingestion
+    if mode == "cached":
+        return read_excel_cached(path, skiprows=skiprows, usecols=usecols)
+    if mode == "stream":
+        return stream_excel(path, skiprows=skiprows, usecols=usecols)
+    if mode == "pandas":
+        df = pd.read_excel(path, skiprows=skiprows)
+        return df[[c for c in df.columns if c in usecols]] if usecols is not None else df
+    raise ValueError(f"Unknown Excel ingestion mode {mode!r}, use cached, stream or pandas")
+
+
+def parse_count_columns(df, columns):
+    """Parses population counts like "33,338" or 1322.0 to int64, all columns in one vectorized pass.
+
+    Same result as ``df[c].astype(str).str.replace(",", "").astype(float).astype(int)`` per column.
+    """
+    columns = list(columns)
+    text = df[columns].to_numpy(dtype=str)
+    values = np.char.replace(text, ",", "").astype(np.float64)
+    if not np.isfinite(values).all():
+        raise ValueError(f"Cannot convert non-finite values (NA or inf) to integer in {columns}")
+    df[columns] = values.astype(np.int64)
+    return df
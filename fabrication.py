@@ -0,0 +1,205 @@
+import math
+import os
+
+import numpy as np
+import shapely
+
+import settings
+from cutoutRender import color_groups, geometry_paths, to_hex
+
+# Cutter-ready exports of a CutoutRenderer drawing (the state SVG/DXFs, the per-state cluster SVGs and the cutout)
+#   FabricationExport(renderer).to_svg(path) / .to_dxf(path)  -> report dict (file size and element counts)
+# Everything is laid out in millimetres at the renderer's size, outlines are simplified to cut_tolerance_mm and
+# snapped to cut_grid_mm, dots become circle primitives and holes too small to cut are merged or dropped
+# The SVG writes integer coordinates in grid units (relative path steps), the DXF is plain R12 (POLYLINE and CIRCLE
+# entities in mm), which every CAD/cutter program opens; no GDAL driver is involved
+# R12 has no header variable for the drawing units ($INSUNITS is R2000+), so the DXF states them in a comment and
+# has to be imported as millimetres
+
+MM_PER_INCH = 25.4
+MM_PER_POINT = 25.4 / 72
+
+
+class FabricationExport:
+    """The layers of a CutoutRenderer in millimetres, prepared for the cutter.
+
+    Outlines are simplified to ``tolerance_mm`` (topology-preserving, per geometry) and snapped to ``grid_mm``.
+    Dots become circles; holes below ``min_hole_mm`` in diameter are merged with the small holes within one
+    ``min_hole_mm`` grid cell into one hole of the same total area ("merge", dropped if still too small) or dropped
+    ("drop"), and at most ``max_holes`` holes per layer are kept, largest first. The title, background, fills and
+    transparency are not exported: every layer is a set of outlines in its stroke (or fill) color.
+    Parameters not given are taken from settings.py.
+    """
+
+    def __init__(self, renderer, tolerance_mm=None, grid_mm=None, min_hole_mm=None, small_holes=None,
+                 max_holes=None):
+        self.tolerance_mm = settings.cut_tolerance_mm if tolerance_mm is None else tolerance_mm
+        self.grid_mm = settings.cut_grid_mm if grid_mm is None else grid_mm
+        self.min_hole_mm = settings.min_hole_diameter_mm if min_hole_mm is None else min_hole_mm
+        self.small_holes = small_holes or settings.small_holes
+        self.max_holes = settings.max_holes if max_holes is None else max_holes
+        if self.small_holes not in ("merge", "drop"):
+            raise ValueError(f"small_holes must be 'merge' or 'drop', not {self.small_holes!r}")
+
+        self.decimals = max(0, math.ceil(-math.log10(self.grid_mm)))
+        self.stats = {"paths": 0, "vertices_in": 0, "vertices": 0, "holes_in": 0, "holes": 0,
+                      "holes_merged": 0, "holes_dropped": 0}
+        self.layers = []
+        transform, self.width, self.height = renderer.layout(MM_PER_INCH, title=False)
+        for layer in renderer.layers:
+            if layer.kind == "paths":
+                self.layers.append(("paths", self._outlines(layer, transform), layer.style, None))
+            else:
+                self.layers.append(("circles", self._holes(layer, transform), layer.style, layer.colors))
+
+    def _outlines(self, layer, transform):
+        def to_mm(coords):
+            return np.column_stack(transform(coords[:, 0], coords[:, 1]))
+
+        geometries = shapely.transform(layer.geometries, to_mm)
+        geometries = shapely.simplify(geometries, self.tolerance_mm, preserve_topology=True)
+        paths = geometry_paths(shapely.set_precision(geometries, self.grid_mm))
+        self.stats["paths"] += len(paths)
+        self.stats["vertices_in"] += sum(len(coords) for coords, _ in layer.data)
+        self.stats["vertices"] += sum(len(coords) for coords, _ in paths)
+        return paths
+
+    def _holes(self, layer, transform):
+        """x, y, radius in mm and the index of the source dot whose color each hole gets."""
+        x, y, radius = layer.data
+        x, y = transform(x, y)
+        r = radius * MM_PER_POINT
+        source = np.arange(len(x))
+        self.stats["holes_in"] += len(x)
+
+        small = 2 * r < self.min_hole_mm
+        keep = ~small
+        x_keep, y_keep, r_keep, source_keep = x[keep], y[keep], r[keep], source[keep]
+        if self.small_holes == "merge" and small.any():
+            from clustering import cluster  # only the grid clustering, imported when there are holes to merge
+            xs, ys, area = x[small], y[small], r[small] ** 2
+            groups = cluster(np.column_stack((xs, ys)), "grid", cell_size=self.min_hole_mm)
+            total = np.bincount(groups, area)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                gx, gy = np.bincount(groups, area * xs) / total, np.bincount(groups, area * ys) / total
+            gr = np.sqrt(total)
+            # The color of a merged hole is the one of its largest dot
+            order = np.lexsort((-area, groups))
+            largest = order[np.r_[True, groups[order][1:] != groups[order][:-1]]]
+            cuttable = 2 * gr >= self.min_hole_mm
+            x_keep, y_keep = np.concatenate((x_keep, gx[cuttable])), np.concatenate((y_keep, gy[cuttable]))
+            r_keep = np.concatenate((r_keep, gr[cuttable]))
+            source_keep = np.concatenate((source_keep, source[small][largest[cuttable]]))
+            merged = np.isin(groups, np.flatnonzero(cuttable)).sum()
+            self.stats["holes_merged"] += int(merged)
+            self.stats["holes_dropped"] += int(small.sum() - merged)
+        else:
+            self.stats["holes_dropped"] += int(small.sum())
+
+        if self.max_holes is not None and len(r_keep) > self.max_holes:
+            largest = np.sort(np.argsort(-r_keep, kind="stable")[:self.max_holes])
+            self.stats["holes_dropped"] += len(r_keep) - len(largest)
+            x_keep, y_keep = x_keep[largest], y_keep[largest]
+            r_keep, source_keep = r_keep[largest], source_keep[largest]
+        self.stats["holes"] += len(r_keep)
+        return x_keep, y_keep, r_keep, source_keep
+
+    def _units(self, values):
+        return np.rint(np.asarray(values, dtype=float) / self.grid_mm).astype(np.int64)
+
+    def _report(self, path):
+        return {"file": os.path.basename(path), "bytes": os.path.getsize(path), **self.stats}
+
+    # SVG
+
+    def to_svg(self, path):
+        """Writes the SVG (width/height in mm, coordinates in grid units) and returns the report."""
+        width, height = self._units([self.width, self.height])
+        out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width:.{self.decimals}f}mm" '
+               f'height="{self.height:.{self.decimals}f}mm" viewBox="0 0 {width} {height}">']
+        for kind, data, style, colors in self.layers:
+            if kind == "paths":
+                if data:
+                    d = "".join(_svg_path(self._units(coords), closed) for coords, closed in data)
+                    out.append(f'<path{self._svg_stroke(style)} d="{d}"/>')
+                continue
+            x, y, r, source = data
+            x, y, r = self._units(x), self._units(y), self._units(r)
+            dot_colors = None if colors is None else np.asarray(colors)[source]
+            for color, index in color_groups(dot_colors, len(x)):
+                out.append(f"<g{self._svg_stroke(style, color)}>")
+                out.extend(f'<circle cx="{x[i]}" cy="{y[i]}" r="{r[i]}"/>' for i in index)
+                out.append("</g>")
+        out.append("</svg>")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(out))
+        return self._report(path)
+
+    def _svg_stroke(self, style, color=None):
+        color = next((c for c in (color, style.stroke, style.fill) if c is not None), "black")
+        width = max(1, int(self._units(style.stroke_width * MM_PER_POINT)))
+        attrs = f' fill="none" stroke="{to_hex(color)}" stroke-width="{width}"'
+        if style.dash:
+            on, off = self._units(np.array(style.dash) * MM_PER_POINT)
+            attrs += f' stroke-dasharray="{on},{off}"'
+        return attrs
+
+    # DXF
+
+    def to_dxf(self, path):
+        """Writes an R12 DXF in mm (y up, one layer per renderer layer) and returns the report.
+
+        1 drawing unit is 1 mm; R12 cannot declare that in its header, so it is only written as a comment.
+        """
+        fmt = f"{{:.{self.decimals}f}}".format
+        out = ["999", f"DataLamp cutter export, units: millimetres, {fmt(self.width)} x {fmt(self.height)} mm",
+               "0", "SECTION", "2", "HEADER", "9", "$ACADVER", "1", "AC1009",
+               "0", "ENDSEC", "0", "SECTION", "2", "ENTITIES"]
+        for number, (kind, data, _, _) in enumerate(self.layers):
+            name = f"{kind.upper()}_{number}"
+            if kind == "paths":
+                for coords, closed in data:
+                    if closed and len(coords) > 1 and (coords[0] == coords[-1]).all():
+                        coords = coords[:-1]
+                    out += ["0", "POLYLINE", "8", name, "66", "1", "70", "1" if closed else "0",
+                            "10", "0.0", "20", "0.0", "30", "0.0"]
+                    for px, py in zip(coords[:, 0].tolist(), (self.height - coords[:, 1]).tolist()):
+                        out += ["0", "VERTEX", "8", name, "10", fmt(px), "20", fmt(py), "30", "0.0"]
+                    out += ["0", "SEQEND", "8", name]
+            else:
+                x, y, r, _ = data
+                for cx, cy, radius in zip(x.tolist(), (self.height - y).tolist(), r.tolist()):
+                    out += ["0", "CIRCLE", "8", name, "10", fmt(cx), "20", fmt(cy), "30", "0.0", "40", fmt(radius)]
+        out += ["0", "ENDSEC", "0", "EOF"]
+        with open(path, "w", encoding="ascii") as f:
+            f.write("\n".join(out) + "\n")
+        return self._report(path)
+
+
+def _svg_path(points, closed):
+    """Path data of one ring/line in integer units: absolute start, then relative steps (repeated points skipped)."""
+    if closed and len(points) > 1 and (points[0] == points[-1]).all():
+        points = points[:-1]
+    steps = np.diff(points, axis=0)
+    steps = steps[(steps != 0).any(axis=1)]
+    d = f"M{points[0, 0]} {points[0, 1]}"
+    if len(steps):
+        d += "l" + " ".join(map(str, steps.ravel().tolist()))
+    return d + ("z" if closed else "")
+
+
+def export_svg(renderer, path):
+    """Writes the renderer's SVG as settings.vector_export says; the fabrication report, or None for "plain"."""
+    if settings.vector_export == "fabrication":
+        return FabricationExport(renderer).to_svg(path)
+    if settings.vector_export != "plain":
+        raise ValueError(f"Unknown vector_export {settings.vector_export!r}, use 'plain' or 'fabrication'")
+    renderer.to_svg(path)
+    return None
+
+
+def describe(report):
+    """One line for the log: file size and element counts of an export report."""
+    return (f"{report['bytes'] / 1024:.1f} KB, {report['paths']} paths ({report['vertices_in']} → "
+            f"{report['vertices']} vertices), {report['holes']} holes ({report['holes_merged']} merged, "
+            f"{report['holes_dropped']} dropped)")
@@ -1,39 +1,37 @@
-import geopandas as gpd
-import pandas as pd
-import fiona
-import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
-import hdbscan
+import settings
+from geoio import write_intermediate
+from herdAreas import load_herd_areas
+from instrumentation import parse_profile_flag, step
+
+# Command line: only --profile (instrumentation.py)
+parse_profile_flag("Read the herd area polygons and their centroids.")
 
 # ✅ STEP 1: Ensure Correct File Path
-herd_area_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\BLM Wild Horse and Burro Herd Area Polygons\data\v101\rangedata_blm_20170519.gdb"
+herd_area_data_path = settings.herd_area_gdb_path
 
 # ✅ STEP 2: Load Correct Layer Name
-layer_name = "BLM_National_HA_20170519"  # <<<< FIXED LAYER NAME
+layer_name = settings.herd_area_layer  # <<<< FIXED LAYER NAME
 
 # ✅ STEP 3: Load Data from the Correct Layer
-df_herd_areas = gpd.read_file(herd_area_data_path, layer=layer_name, driver="FileGDB")
-
-# ✅ STEP 4: Check Available Columns
+# ✅ STEP 4: Convert to a Projected CRS, Compute Centroids for Clustering and Convert Back to WGS84
+# (herdAreas.py does this once and caches the centroid table for mergeHerdData.py)
+with step("load herd areas") as s:
+    df_herd_areas = load_herd_areas(herd_area_data_path, layer_name)
+    df_herd_areas = df_herd_areas.rename(columns={"longitude": "Longitude", "latitude": "Latitude"})
+    s.rows_out = len(df_herd_areas)
+
+# ✅ STEP 5: Check Available Columns
 print("📊 Available Columns:", df_herd_areas.columns)
 
-# ✅ STEP 5: Convert to a Projected CRS for Accurate Centroids
-df_herd_areas = df_herd_areas.to_crs(epsg=3857)
-
-# ✅ STEP 6: Compute Centroids for Clustering
-df_herd_areas["Longitude"] = df_herd_areas.geometry.centroid.x
-df_herd_areas["Latitude"] = df_herd_areas.geometry.centroid.y
-
-# ✅ STEP 7: Convert Back to Geographic CRS (WGS84)
-df_herd_areas = df_herd_areas.to_crs(epsg=4326)
-
-# ✅ STEP 8: Save the Preprocessed Data
-output_geojson_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\processed_herd_areas.geojson"
-df_herd_areas.to_file(output_geojson_path, driver="GeoJSON")
+# ✅ STEP 6: Save the Preprocessed Data
+with step("write processed herd areas", rows_in=len(df_herd_areas)):
+    output_geojson_path = write_intermediate(df_herd_areas, settings.processed_herd_areas_path)
 
 print(f"✅ Preprocessed herd area data saved to {output_geojson_path}")
 
-# ✅ STEP 9: Plot Herd Area Centroids
+# ✅ STEP 7: Plot Herd Area Centroids (pyplot is only imported for this plot)
+import matplotlib.pyplot as plt
+
 plt.figure(figsize=(10, 6))
 plt.scatter(df_herd_areas["Longitude"], df_herd_areas["Latitude"], c="blue", marker="o", alpha=0.5)
 plt.xlabel("Longitude")
@@ -0,0 +1,79 @@
+import os
+
+import settings
+
+# Reading and writing of the files that are handed from one pipeline stage to the next
+# With settings.intermediate_format = "geojson" everything stays GeoJSON/CSV as before; with "parquet" or "feather"
+# the intermediates are written as GeoParquet/Feather (binary, columnar, much faster to load)
+# Final exports that Blender and the vector tools need (GeoJSON/SVG/DXF) are written by the scripts themselves
+# pandas and GeoPandas are only imported to read or write, the path helpers are used by pipeline.py and datalamp.py,
+# which should start without them
+
+# Files of Merged_Herd_Population that mergeDatasets.py can write (settings.merged_population_formats):
+# "intermediate" in settings.intermediate_format (GeoJSON, Parquet or Feather), "csv" with the polygons as WKT
+MERGED_POPULATION_FORMATS = ("intermediate", "csv")
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+TEXT_FORMATS = ("geojson", "csv")
+
+
+def resolve_format(fmt=None):
+    fmt = (fmt or settings.intermediate_format).lower()
+    if fmt not in COLUMNAR_FORMATS and fmt not in TEXT_FORMATS:
+        raise ValueError(f"Unknown intermediate format {fmt!r}, use geojson, parquet or feather")
+    return fmt
+
+
+def intermediate_path(path, fmt=None):
+    """Path of an intermediate file in the given format (.geojson/.csv are swapped for .parquet/.feather)."""
+    fmt = resolve_format(fmt)
+    if fmt in TEXT_FORMATS:
+        return path
+    return os.path.splitext(path)[0] + COLUMNAR_FORMATS[fmt]
+
+
+def merged_population_paths(formats=None):
+    """Files of Merged_Herd_Population for the requested formats (settings.merged_population_formats by default)."""
+    formats = settings.merged_population_formats if formats is None else formats
+    unknown = set(formats) - set(MERGED_POPULATION_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown output format(s) {sorted(unknown)}, use {', '.join(MERGED_POPULATION_FORMATS)}")
+    paths = {"intermediate": intermediate_path(settings.merged_herd_population_geojson_path),
+             "csv": settings.merged_herd_population_csv_path}
+    return {fmt: paths[fmt] for fmt in MERGED_POPULATION_FORMATS if fmt in formats}
+
+
+def write_intermediate(df, path, fmt=None):
+    """Writes a (Geo)DataFrame in the intermediate format and returns the path it was written to."""
+    import geopandas as gpd
+    fmt = resolve_format(fmt)
+    out_path = intermediate_path(path, fmt)
+    if fmt == "parquet":
+        df.to_parquet(out_path, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(out_path)
+    elif isinstance(df, gpd.GeoDataFrame) and path.lower().endswith(".geojson"):
+        df.to_file(out_path, driver="GeoJSON")
+    else:
+        df.to_csv(out_path, index=False)
+    return out_path
+
+
+def read_intermediate(path, fmt=None, columns=None):
+    """Reads an intermediate file, falling back to the GeoJSON/CSV file if there is no columnar version
+    (e.g. source files that are not written by the pipeline)."""
+    import geopandas as gpd
+    import pandas as pd
+    fmt = resolve_format(fmt)
+    columnar_path = intermediate_path(path, fmt)
+    if fmt in COLUMNAR_FORMATS and os.path.exists(columnar_path):
+        reader = {"parquet": (gpd.read_parquet, pd.read_parquet), "feather": (gpd.read_feather, pd.read_feather)}[fmt]
+        try:
+            return reader[0](columnar_path, columns=columns)
+        except ValueError:  # no geometry metadata, a plain table
+            return reader[1](columnar_path, columns=columns)
+
+    if path.lower().endswith(".csv"):
+        return pd.read_csv(path, usecols=columns)
+    df = gpd.read_file(path)
+    return df[columns] if columns is not None else df
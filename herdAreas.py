@@ -0,0 +1,84 @@
+import hashlib
+import os
+import time
+
+import geopandas as gpd
+import pandas as pd
+
+import settings
+from centroids import CENTROID_METHOD, add_centroid_columns
+
+# Shared loader for the BLM herd-area layer of rangedata_blm_20170519.gdb, used by gdb_reader.py and mergeHerdData.py
+# The layer is read once (with the column and bbox filters passed down to the reader), centroids are given in
+# EPSG:3857 like before, and the centroid table is cached on disk keyed on the GDB's size and modification time and
+# on the centroid method (centroids.CENTROID_METHOD)
+
+CENTROID_COLUMNS = ["ADMIN_ST", "HA_NAME", "HA_NO"]
+CENTROID_CRS = "EPSG:3857"
+
+
+def gdb_signature(gdb_path):
+    """Total size and newest mtime of the files in a FileGDB folder (or of a single file)."""
+    if os.path.isdir(gdb_path):
+        stats = [os.stat(os.path.join(root, name)) for root, _, names in os.walk(gdb_path) for name in names]
+    else:
+        stats = [os.stat(gdb_path)]
+    return sum(s.st_size for s in stats), max((s.st_mtime_ns for s in stats), default=0)
+
+
+def centroid_cache_path(gdb_path, layer, bbox=None):
+    size, mtime = gdb_signature(gdb_path)
+    key = hashlib.sha256(repr((os.path.abspath(gdb_path), layer, bbox, size, mtime, CENTROID_METHOD,
+                               CENTROID_CRS)).encode("utf-8")).hexdigest()
+    return os.path.join(settings.cache_dir, "herd_centroids", f"{layer}_{key[:16]}.pkl")
+
+
+def load_herd_areas(gdb_path=None, layer=None, columns=None, bbox=None, to_wgs84=True):
+    """Reads the herd-area polygons and adds their centroids (in EPSG:3857 metres) as longitude/latitude columns.
+
+    The polygons are returned in EPSG:4326 (or in the layer's CRS with ``to_wgs84=False``).
+    ``columns`` and ``bbox`` (in the layer's CRS) are passed to the reader.
+    """
+    gdb_path = gdb_path or settings.herd_area_gdb_path
+    layer = layer or settings.herd_area_layer
+    bbox = bbox if bbox is not None else settings.herd_area_bbox
+
+    gdf = gpd.read_file(gdb_path, layer=layer, columns=columns, bbox=bbox)
+
+    # Centroids in EPSG:3857 metres, only the centroid points are transformed (centroids.py)
+    add_centroid_columns(gdf, CENTROID_CRS, "longitude", "latitude")
+
+    # WGS 84 (EPSG:4326) for correct mapping
+    if to_wgs84 and gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(epsg=4326)
+
+    # Store the centroid table, so the next script does not have to read the GDB again
+    store_herd_centroids(gdf, gdb_path, layer, bbox)
+    return gdf
+
+
+def store_herd_centroids(gdf, gdb_path, layer, bbox=None):
+    if not all(column in gdf.columns for column in CENTROID_COLUMNS):
+        return
+    cache_path = centroid_cache_path(gdb_path, layer, bbox)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    pd.DataFrame(gdf[CENTROID_COLUMNS + ["longitude", "latitude"]]).to_pickle(cache_path)
+
+
+def load_herd_centroids(gdb_path=None, layer=None, bbox=None, refresh=False):
+    """Returns the table ADMIN_ST, HA_NAME, HA_NO, longitude, latitude, from the cache if the GDB is unchanged."""
+    gdb_path = gdb_path or settings.herd_area_gdb_path
+    layer = layer or settings.herd_area_layer
+    bbox = bbox if bbox is not None else settings.herd_area_bbox
+
+    start = time.perf_counter()
+    cache_path = centroid_cache_path(gdb_path, layer, bbox)
+    if not refresh and os.path.exists(cache_path):
+        df = pd.read_pickle(cache_path)
+        print(f"✅ Loaded {len(df)} herd centroids from cache in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return df
+
+    gdf = load_herd_areas(gdb_path, layer, columns=CENTROID_COLUMNS, bbox=bbox, to_wgs84=False)
+    df = pd.DataFrame(gdf[CENTROID_COLUMNS + ["longitude", "latitude"]])
+    print(f"✅ Read {len(df)} herd centroids from {os.path.basename(gdb_path)} in {time.perf_counter() - start:.2f} s")
+    return df
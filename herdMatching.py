@@ -0,0 +1,89 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Fuzzy matching of herd names from Herd_Population.xlsx against the HA_NAME values of the BLM herd areas
+# Candidates are blocked by state first, every distinct name is scored only once, and with rapidfuzz installed
+# a whole block is scored in one vectorized cdist call; without it, fuzzywuzzy's extractOne is used as before
+
+try:
+    from rapidfuzz import fuzz, process as rf_process, utils as rf_utils
+except ImportError:  # rapidfuzz is optional, fall back to fuzzywuzzy
+    rf_process = None
+
+
+# Function to clean herd names by removing text in parentheses (memoized, herd names repeat a lot)
+@lru_cache(maxsize=None)
+def clean_herd_name(name):
+    return re.sub(r"\s*\(.*?\)", "", str(name)).strip()
+
+
+# Function to find the best fuzzy match for herd names (the original, one name against all choices)
+def find_best_match(name, choices, threshold=80):
+    from fuzzywuzzy import process
+    match, score = process.extractOne(name, choices)
+    return match if score >= threshold else None
+
+
+class HerdNameMatcher:
+    """Matches herd names against the herd-area names of the same state.
+
+    Scores follow fuzzywuzzy's extractOne (WRatio on lower-cased, alphanumeric names, rounded to an integer),
+    so ``threshold`` keeps its meaning: a match needs a score of at least 80 by default. The matches are those of
+    extractOne, benchmarks/bench_matching.py asserts it on synthetic names and (--real) on Herd_Population.xlsx.
+    """
+
+    def __init__(self, choice_names, choice_states=None, threshold=80):
+        self.threshold = threshold
+        names = pd.Series(choice_names, dtype=object).reset_index(drop=True)
+        self.all_choices = list(pd.unique(names))
+
+        # Distinct choices per state, in order of first appearance like Series.unique()
+        self.blocks = {}
+        if choice_states is not None:
+            states = pd.Series(choice_states, dtype=object).reset_index(drop=True)
+            for state, state_names in names.groupby(states, sort=False):
+                self.blocks[state] = list(pd.unique(state_names))
+        self._processed = {}
+
+    def _processed_choices(self, choices):
+        """Pre-processes each list of choices once."""
+        key = id(choices)
+        if key not in self._processed:
+            self._processed[key] = [rf_utils.default_process(c) for c in choices]
+        return self._processed[key]
+
+    def _match_block(self, names, choices):
+        """Best match (or None) for each distinct name against one list of choices."""
+        if not choices:
+            return [None] * len(names)
+        if rf_process is None:
+            return [find_best_match(name, choices, self.threshold) for name in names]
+
+        scores = rf_process.cdist(
+            [rf_utils.default_process(n) for n in names], self._processed_choices(choices),
+            scorer=fuzz.WRatio, dtype=np.float32, workers=-1
+        )
+        # fuzzywuzzy rounds its scores, and extractOne keeps the first of equally scored choices
+        scores = np.rint(scores)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(names)), best]
+        return [choices[b] if s >= self.threshold else None for b, s in zip(best, best_scores)]
+
+    def match(self, names, states=None):
+        """Returns the best match per name; names whose state has no herd areas are matched against all of them."""
+        names = pd.Series(names, dtype=object).reset_index(drop=True)
+        if states is None or not self.blocks:
+            states = pd.Series([None] * len(names), dtype=object)
+        else:
+            states = pd.Series(states, dtype=object).reset_index(drop=True)
+
+        matches = pd.Series([None] * len(names), dtype=object)
+        for state, group in names.groupby(states.where(states.isin(self.blocks.keys())), dropna=False, sort=False):
+            choices = self.blocks[state] if state in self.blocks else self.all_choices
+            distinct = list(pd.unique(group))
+            best = dict(zip(distinct, self._match_block(distinct, choices)))
+            matches[group.index] = group.map(best).values
+        return matches.values
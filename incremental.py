@@ -0,0 +1,190 @@
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import settings
+
+# Incremental re-runs of mergeHerdData.py and clusterStates_dots.py (settings.incremental)
+# BLM updates the herd estimates every year, but usually only some herds change: each script keeps a snapshot of its
+# last run under cache_dir/incremental, compares the new herd table with it by herd code and only redoes the work for
+# the herds that changed. With "verify" the full rebuild is done as well and both results must be identical
+# A snapshot is only used if its key (the other inputs, parameters and code it depends on) is unchanged, otherwise
+# everything is rebuilt and the snapshot replaced
+# mergeDatasets.py has no incremental mode: its state sums cost less than finding the states whose herds changed
+
+MODES = ("off", "on", "verify")
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def mode():
+    value = settings.incremental.lower()
+    if value not in MODES:
+        raise ValueError(f"Unknown incremental mode {settings.incremental!r}, use {', '.join(MODES)}")
+    return value
+
+
+def snapshot_key(*parts, modules=()):
+    """Hash of the parts (repr) and of the source of the given modules, a snapshot is only reused for the same key."""
+    digest = hashlib.sha256(repr(parts).encode("utf-8"))
+    for module in modules:
+        with open(os.path.join(repo_dir, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def snapshot_path(name):
+    return os.path.join(settings.cache_dir, "incremental", f"{name}.pkl")
+
+
+def load_snapshot(name, key):
+    """The data saved by the last run of a script, None if there is none or it was saved under another key."""
+    path = snapshot_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        snapshot = pickle.load(f)
+    return snapshot["data"] if snapshot["key"] == key else None
+
+
+def save_snapshot(name, key, data):
+    path = snapshot_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump({"key": key, "data": data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def herd_keys(codes):
+    """Stripped herd codes, numbered if a code appears more than once, so every row has its own key."""
+    codes = pd.Series(codes, dtype=object).astype(str).str.strip().reset_index(drop=True)
+    return pd.MultiIndex.from_arrays([codes, codes.groupby(codes).cumcount()])
+
+
+def _differs(old, new):
+    """Row-wise "not equal" of two columns, two missing values count as equal."""
+    old, new = np.asarray(old, dtype=object), np.asarray(new, dtype=object)
+    return (old != new) & ~(pd.isna(old) & pd.isna(new))
+
+
+class HerdChanges:
+    """Rows of a new herd table compared with the previous one by herd code.
+
+    ``previous`` holds, for every new row, the row of the same herd in the old table (-1 for new herds);
+    ``added``, ``renamed`` and ``changed`` are rows of the new table, ``removed`` are rows of the old one.
+    """
+
+    __slots__ = ("previous", "added", "removed", "renamed", "changed", "unchanged", "codes", "old_codes")
+
+    def counts(self):
+        return {name: len(getattr(self, name)) for name in ("added", "removed", "renamed", "changed", "unchanged")}
+
+    def summary(self):
+        return ", ".join(f"{n} {name}" for name, n in self.counts().items())
+
+    def report(self, title, limit=8):
+        print(f"🔁 {title}: {self.summary()}")
+        for name in ("added", "removed", "renamed", "changed"):
+            rows = getattr(self, name)
+            if len(rows):
+                codes = (self.old_codes if name == "removed" else self.codes)[rows[:limit]]
+                more = f" (+{len(rows) - limit} more)" if len(rows) > limit else ""
+                print(f"   - {name}: {', '.join(codes)}{more}")
+
+
+def diff_herds(old, new, key, identity=(), values=()):
+    """Compares two herd tables by the herd code column ``key``.
+
+    A herd is renamed if one of the ``identity`` columns differs, changed if only ``values`` columns differ.
+    """
+    old_keys, new_keys = herd_keys(old[key]), herd_keys(new[key])
+    previous = pd.Series(np.arange(len(old)), index=old_keys).reindex(new_keys).fillna(-1).to_numpy(dtype=np.intp)
+    common = np.flatnonzero(previous >= 0)
+
+    def differs(columns):
+        mask = np.zeros(len(common), dtype=bool)
+        for column in columns:
+            mask |= _differs(old[column].to_numpy()[previous[common]], new[column].to_numpy()[common])
+        return mask
+
+    renamed = differs(identity)
+    changed = differs(values) & ~renamed
+
+    changes = HerdChanges()
+    changes.previous = previous
+    changes.added = np.flatnonzero(previous < 0)
+    changes.removed = np.setdiff1d(np.arange(len(old)), previous[common])
+    changes.renamed = common[renamed]
+    changes.changed = common[changed]
+    changes.unchanged = common[~renamed & ~changed]
+    changes.codes = new_keys.get_level_values(0).to_numpy()
+    changes.old_codes = old_keys.get_level_values(0).to_numpy()
+    return changes
+
+
+def check_identical(what, identical):
+    """Raises if the incremental result was not identical to the full rebuild ("verify" mode)."""
+    if not identical:
+        raise RuntimeError(f"Incremental run: {what} differs from the full rebuild")
+    print(f"✅ Incremental run: {what} identical to the full rebuild")
+
+
+# mergeHerdData.py: herd names are matched again only for new and renamed herds
+HERD_IDENTITY = ["State Code", "Herd Name"]
+HERD_VALUES = ["Horses", "Burros", "Total Population"]
+
+
+def match_herds(matcher, herds, key):
+    """Best Match Herd Name for every row of the herd population table.
+
+    Herds that are neither new nor renamed (same herd code, state code and herd name) keep their match from the last
+    run, the matcher only scores the others. Returns the matches, the HerdChanges (None without a snapshot of the
+    last run) and the number of herds that were matched.
+    """
+    names, states = herds["Herd Name Cleaned"], herds["State Code"]
+    previous = load_snapshot("mergeHerdData", key)
+    changes = None
+    if previous is None:
+        matches = np.asarray(matcher.match(names, states), dtype=object)
+        redo = np.arange(len(herds))
+    else:
+        changes = diff_herds(previous, herds, "Herd Code", HERD_IDENTITY, HERD_VALUES)
+        matches = np.empty(len(herds), dtype=object)
+        redo = np.union1d(changes.added, changes.renamed)
+        keep = np.setdiff1d(np.arange(len(herds)), redo)
+        matches[keep] = previous["Best Match Herd Name"].to_numpy()[changes.previous[keep]]
+        if len(redo):
+            matches[redo] = matcher.match(names.iloc[redo], states.iloc[redo])
+
+    snapshot = pd.DataFrame(herds[["Herd Code", *HERD_IDENTITY, *HERD_VALUES]]).reset_index(drop=True)
+    snapshot["Best Match Herd Name"] = matches
+    save_snapshot("mergeHerdData", key, snapshot)
+    return matches, changes, len(redo)
+
+
+# clusterStates_dots.py: only the neighbourhoods with changed herds are merged again (mergeNeighbourhoods.py)
+DOT_VALUES = ["latitude", "longitude", "Total Population"]
+
+
+def merge_dots(herds, x, y, count, radius, threshold=1.10, growth_step=30, max_outer_iterations=30):
+    """The DotMerger after run(max_outer_iterations) over all herds, with the unchanged neighbourhoods of the last run.
+
+    Returns the merger, the HerdChanges (None without a snapshot) and the NeighbourhoodMerge.
+    """
+    # Imported here, the other scripts of this module do not need SciPy, shapely and the dot merging
+    from mergeNeighbourhoods import NeighbourhoodMerge
+
+    key = snapshot_key(float(threshold), float(growth_step), max_outer_iterations,
+                       modules=["dotMerging.py", "mergeNeighbourhoods.py"])
+    previous = load_snapshot("clusterStates_dots", key)
+    neighbourhoods = NeighbourhoodMerge(x, y, count, radius, threshold=threshold, growth_step=growth_step,
+                                        max_outer_iterations=max_outer_iterations,
+                                        min_dots=settings.incremental_min_dots)
+    merger = neighbourhoods.run(None if previous is None else previous["dots"])
+
+    table = pd.DataFrame(herds[["Herd Code", *DOT_VALUES]]).reset_index(drop=True)
+    changes = None if previous is None else diff_herds(previous["herds"], table, "Herd Code", values=DOT_VALUES)
+    save_snapshot("clusterStates_dots", key, {"herds": table, "dots": neighbourhoods.snapshot()})
+    return merger, changes, neighbourhoods
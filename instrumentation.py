@@ -0,0 +1,142 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import settings
+
+# Lightweight timing for the pipeline scripts
+# Every step records wall time, CPU time, peak RSS and rows in/out, prints one line and appends a JSON line to the
+# run log (settings.run_log_path); with --profile (every script has it: the ones with options call enable_profiling(),
+# the others parse_profile_flag()) or DATALAMP_PROFILE=1 each step also runs under cProfile and its stats are dumped
+# next to the run log
+# The peak RSS is the peak of the whole process so far (ru_maxrss), not of the step: a step only shows up in it if it
+# raised the peak, by peak_rss_growth_mb
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# One id per run, inherited by worker processes (clusterStates.py --workers) and by the stages of pipeline.py
+run_id = os.environ.setdefault("DATALAMP_RUN_ID", uuid.uuid4().hex[:12])
+script_name = os.path.splitext(os.path.basename(sys.argv[0] or "interactive"))[0]
+
+
+# Steps can be nested (e.g. the states inside "cluster all states"), only the outermost step of a process runs a
+# profiler; the id of the process that runs it is kept, so worker processes forked inside a profiled step (which
+# inherit this variable) still profile their own steps
+_profiling_pid = None
+
+
+def profiling_enabled():
+    return os.environ.get("DATALAMP_PROFILE", "") not in ("", "0")
+
+
+def enable_profiling():
+    """Runs the following steps under cProfile, also in worker processes started afterwards (the --profile flag)."""
+    os.environ["DATALAMP_PROFILE"] = "1"
+
+
+def parse_profile_flag(description):
+    """Command line of the scripts that have no other options: only --profile, which calls enable_profiling()."""
+    import argparse
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--profile", action="store_true", help="run every step under cProfile (see instrumentation.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling()
+    return args
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None if it cannot be measured)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+class StepRecord:
+    """Measurements of one step; the code inside the step can set rows_in, rows_out and extra fields."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.extra = {}
+
+    def as_dict(self, measurements):
+        return {"run_id": run_id, "script": script_name, "step": self.name, **measurements,
+                "rows_in": self.rows_in, "rows_out": self.rows_out, **self.extra}
+
+
+def write_record(record):
+    log_path = settings.run_log_path
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+@contextmanager
+def step(name, rows_in=None):
+    """Times a block of code: ``with step("load herds") as s: ...; s.rows_out = len(df)``."""
+    global _profiling_pid
+    record = StepRecord(name, rows_in)
+    profiler = cProfile.Profile() if profiling_enabled() and _profiling_pid != os.getpid() else None
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    peak_start = peak_rss_mb() or 0
+    status = "ok"
+    if profiler is not None:
+        _profiling_pid = os.getpid()
+        profiler.enable()
+    try:
+        yield record
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiling_pid = None
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        peak = peak_rss_mb() or 0
+        measured = {"started_at": started_at, "status": status, "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+                    "peak_rss_mb": round(peak, 1), "peak_rss_growth_mb": round(peak - peak_start, 1)}
+        if profiler is not None:
+            measured["profile"] = dump_profile(profiler, name)
+
+        rows = "" if record.rows_out is None else f", {record.rows_in if record.rows_in is not None else '?'} → {record.rows_out} rows"
+        print(f"⏱️ {name}: {wall:.2f} s wall, {cpu:.2f} s CPU, process peak RSS {peak:.0f} MB "
+              f"(+{peak - peak_start:.0f} MB in this step){rows}")
+        write_record(record.as_dict(measured))
+
+
+def timed(name=None):
+    """Decorator version of step(); the step is named after the function unless a name is given."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with step(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def dump_profile(profiler, step_name):
+    profile_dir = os.path.join(os.path.dirname(settings.run_log_path) or ".", "profiles")
+    os.makedirs(profile_dir, exist_ok=True)
+    safe_name = "".join(c if c.isalnum() else "_" for c in step_name)
+    path = os.path.join(profile_dir, f"{script_name}_{safe_name}_{run_id}.prof")
+    profiler.dump_stats(path)
+    return path
@@ -1,73 +1,51 @@
-import pandas as pd
-import geopandas as gpd
+import settings
+from geoio import read_intermediate
+from instrumentation import parse_profile_flag, step
+from redistribution import check_shares, join_population, redistribute_population, write_outputs
 
-# ✅ Step 1: Load the cleaned population data
-population_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Final_Cleaned_Population_Data.csv"
-df_population = pd.read_csv(population_data_path)
-
-# ✅ Step 2: Load the herd area dataset
-herd_area_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\filtered_herds.geojson"
-df_herd_areas = gpd.read_file(herd_area_data_path)
-
-# ✅ Step 3: Convert state names to uppercase for consistency
-df_population["State"] = df_population["State"].str.upper()
-df_herd_areas["State"] = df_herd_areas["State"].str.upper()
-
-# ✅ Step 4: Merge datasets
-df_merged = df_herd_areas.merge(df_population, on="State", how="left")
-
-# ✅ Step 5: Fix numeric data types
-import pandas as pd
-import geopandas as gpd
+# Command line: only --profile (instrumentation.py)
+parse_profile_flag("Spread the state populations over the herd areas.")
 
 # ✅ Step 1: Load the cleaned population data
-population_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Final_Cleaned_Population_Data.csv"
-df_population = pd.read_csv(population_data_path)
+population_data_path = settings.cleaned_population_csv_path
+with step("read population data") as s:
+    df_population = read_intermediate(population_data_path)
+    s.rows_out = len(df_population)
 
 # ✅ Step 2: Load the herd area dataset
-herd_area_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\filtered_herds.geojson"
-df_herd_areas = gpd.read_file(herd_area_data_path)
-
-# ✅ Step 3: Convert state names to uppercase for consistency
-df_population["State"] = df_population["State"].str.upper()
-df_herd_areas["State"] = df_herd_areas["State"].str.upper()
-
-# ✅ Step 4: Merge datasets
-df_merged = df_herd_areas.merge(df_population, on="State", how="left")
-
-# ✅ Step 5: Fix numeric data types
-df_merged["Horses"] = pd.to_numeric(df_merged["Horses"], errors="coerce").fillna(0)
-df_merged["Burros"] = pd.to_numeric(df_merged["Burros"], errors="coerce").fillna(0)
-
-# ✅ Step 6: Compute Total Animals per state
-state_totals = df_merged.groupby("State")[["Horses", "Burros"]].sum().reset_index()
-state_totals["Total Animals"] = state_totals["Horses"] + state_totals["Burros"]
-
-# ✅ Step 7: Merge the total animals back into herd-level data
-df_merged = df_merged.merge(state_totals[["State", "Total Animals"]], on="State", how="left")
-
-# ✅ Step 8: Get correct state population from `df_population`
-df_population_dict = df_population.set_index("State")["Total Population"].to_dict()
-
-# ✅ Step 9: Fix population distribution (Pull correct value from dictionary)
-df_merged["Total Population"] = (
-    (df_merged["Horses"] + df_merged["Burros"]) / df_merged["Total Animals"]
-) * df_merged["State"].map(df_population_dict)
-
-# ✅ Step 10: Ensure valid geometries before saving
-df_merged = df_merged[df_merged["geometry"].notnull() & ~df_merged["geometry"].is_empty]
-
-# ✅ Step 11: Save the corrected dataset
-merged_geojson_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\Merged_Herd_Population.geojson"
-merged_csv_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\Merged_Herd_Population.csv"
-
-df_merged.to_file(merged_geojson_path, driver="GeoJSON")
-df_merged.to_csv(merged_csv_path, index=False)
-
-# ✅ Step 12: Print confirmation and preview
+herd_area_data_path = settings.filtered_herds_path
+with step("read filtered herds") as s:
+    df_herd_areas = read_intermediate(herd_area_data_path)
+    s.rows_out = len(df_herd_areas)
+
+with step("merge and redistribute population", rows_in=len(df_herd_areas)) as s:
+    # ✅ Step 3: Join the state population onto the herds (upper-cased state names as the key, see redistribution.py)
+    # ✅ Step 4: Fix numeric data types of Horses and Burros
+    df_merged = join_population(df_herd_areas, df_population)
+
+    # ✅ Step 5: Compute Total Animals per state (always in full: the sums cost less than finding the changed states)
+    # ✅ Step 6: Split every state's population over its herds in proportion to Horses + Burros
+    df_merged = redistribute_population(df_merged, df_population)
+
+    # ✅ Step 7: Check that the herds of every state add up to its population
+    shares = check_shares(df_merged, df_population)
+    undistributed = shares.index[shares["Redistributed"] == 0].tolist()
+    if undistributed:
+        print(f"⚠️ No herds with animals for {', '.join(undistributed)}, their population is not distributed")
+
+    # ✅ Step 8: Ensure valid geometries before saving
+    df_merged = df_merged[df_merged["geometry"].notnull() & ~df_merged["geometry"].is_empty]
+    s.rows_out = len(df_merged)
+
+# ✅ Step 9: Save the corrected dataset, only in the formats asked for (settings.merged_population_formats)
+with step("write merged herd population", rows_in=len(df_merged)) as s:
+    output_paths = write_outputs(df_merged)
+    s.extra["formats"] = ",".join(output_paths)
+
+# ✅ Step 10: Print confirmation and preview
 print(f"✅ Corrected merge saved to:")
-print(f"   - GeoJSON: {merged_geojson_path}")
-print(f"   - CSV: {merged_csv_path}")
+for fmt, path in output_paths.items():
+    print(f"   - {settings.intermediate_format if fmt == 'intermediate' else fmt}: {path}")
 
 # 🚨 **Check Herd-Level Population Distribution**
 print("\n🐎 Sample Herd Data (Should Show Different Population Numbers Per Herd):")
@@ -1,72 +1,92 @@
-import pandas as pd
-import geopandas as gpd
-from fuzzywuzzy import process
-
-# Define file paths
-herd_population_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Herd_Population.xlsx"
-gdb_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\BLM Wild Horse and Burro Herd Area Polygons\data\v101\rangedata_blm_20170519.gdb"
-layer_name = "BLM_National_HA_20170519"  # Ensure this is the correct layer name
+import os
 
-# Load herd population data
-df_herd_population = pd.read_excel(herd_population_path)
+import pandas as pd
 
-# Load herd location data from the GDB
-gdf_herd_locations = gpd.read_file(gdb_path, layer=layer_name)
+import incremental
+import settings
+from excelIngest import read_excel
+from geoio import write_intermediate
+from herdAreas import centroid_cache_path, load_herd_centroids
+from herdMatching import HerdNameMatcher, clean_herd_name
+from instrumentation import parse_profile_flag, step
 
-# Convert to a projected coordinate system before calculating centroids
-projected_crs = "EPSG:3857"  # Web Mercator projection (meters-based)
-gdf_herd_locations = gdf_herd_locations.to_crs(projected_crs)
+# Command line: only --profile (instrumentation.py)
+parse_profile_flag("Match the herd population table to the herd areas.")
 
-# Now safely calculate centroids
-gdf_herd_locations["longitude"] = gdf_herd_locations.geometry.centroid.x
-gdf_herd_locations["latitude"] = gdf_herd_locations.geometry.centroid.y
+# Define file paths
+herd_population_path = settings.herd_population_excel_path
+gdb_path = settings.herd_area_gdb_path
+layer_name = settings.herd_area_layer  # Ensure this is the correct layer name
 
-# Convert back to WGS 84 (EPSG:4326) for correct mapping
-gdf_herd_locations = gdf_herd_locations.to_crs(epsg=4326)
+# Load herd population data
+with step("read herd population Excel") as s:
+    df_herd_population = read_excel(herd_population_path, usecols=[
+        "State", "State Code", "Herd Name", "Herd Code", "Horses", "Burros", "Total Population"
+    ])
+    s.rows_out = len(df_herd_population)
 
+# Load herd location data from the GDB (centroids are computed in EPSG:3857 and cached by herdAreas.py)
 # Select relevant columns from location data
-df_herd_locations = gdf_herd_locations[["ADMIN_ST", "HA_NAME", "HA_NO", "longitude", "latitude"]].copy()
-
-# Function to clean herd names by removing text in parentheses
-def clean_herd_name(name):
-    import re
-    return re.sub(r"\s*\(.*?\)", "", str(name)).strip()
-
-# Apply cleaning to herd names in both datasets
-df_herd_population["Herd Name Cleaned"] = df_herd_population["Herd Name"].apply(clean_herd_name)
-df_herd_locations.loc[:, "HA_NAME Cleaned"] = df_herd_locations["HA_NAME"].apply(clean_herd_name)
-
-# Function to find the best fuzzy match for herd names
-def find_best_match(name, choices, threshold=80):
-    match, score = process.extractOne(name, choices)
-    return match if score >= threshold else None
-
-# Apply fuzzy matching to align herd names
-df_herd_population["Best Match Herd Name"] = df_herd_population["Herd Name Cleaned"].apply(
-    lambda name: find_best_match(name, df_herd_locations["HA_NAME Cleaned"].unique())
-)
-
-# Standardize herd codes
-df_herd_population["Herd Code Cleaned"] = df_herd_population["Herd Code"].astype(str).str.strip()
-df_herd_locations.loc[:, "HA_NO Cleaned"] = df_herd_locations["HA_NO"].astype(str).str.strip()
-
-# Merge using both Herd Code and fuzzy-matched Herd Name
-merged_df = df_herd_population.merge(
-    df_herd_locations,
-    left_on=["Best Match Herd Name", "Herd Code Cleaned"],
-    right_on=["HA_NAME Cleaned", "HA_NO Cleaned"],
-    how="inner"
-)
-
-# Keep only necessary columns
-merged_df = merged_df[[
-    "State", "State Code", "Herd Name", "Herd Code",
-    "Horses", "Burros", "Total Population", "latitude", "longitude"
-]]
+with step("load herd centroids") as s:
+    df_herd_locations = load_herd_centroids(gdb_path, layer_name)
+    s.rows_out = len(df_herd_locations)
+
+with step("match herd names", rows_in=len(df_herd_population)) as s:
+    # Apply cleaning to herd names in both datasets
+    df_herd_population["Herd Name Cleaned"] = df_herd_population["Herd Name"].apply(clean_herd_name)
+    df_herd_locations.loc[:, "HA_NAME Cleaned"] = df_herd_locations["HA_NAME"].apply(clean_herd_name)
+
+    # Apply fuzzy matching to align herd names
+    # Candidates are restricted to the herd areas of the same state and each distinct name is scored once (herdMatching.py)
+    matcher = HerdNameMatcher(
+        df_herd_locations["HA_NAME Cleaned"], df_herd_locations["ADMIN_ST"], threshold=80
+    )
+    if incremental.mode() == "off":
+        df_herd_population["Best Match Herd Name"] = matcher.match(
+            df_herd_population["Herd Name Cleaned"], df_herd_population["State Code"]
+        )
+    else:
+        # Only new and renamed herds (by herd code) are matched, the others keep their match from the last run,
+        # as long as the herd areas (the GDB's centroid cache) and the matching code are the same (incremental.py)
+        centroid_cache = centroid_cache_path(gdb_path, layer_name, settings.herd_area_bbox)
+        key = incremental.snapshot_key(os.path.basename(centroid_cache), matcher.threshold, modules=["herdMatching.py"])
+        matches, changes, matched = incremental.match_herds(matcher, df_herd_population, key)
+        df_herd_population["Best Match Herd Name"] = matches
+        if changes is None:
+            print(f"🔁 No previous run to compare with, matched all {matched} herds")
+        else:
+            changes.report("Herd population changes")
+            print(f"🔁 Matched {matched} new or renamed herds, kept the match of {len(matches) - matched}")
+            s.extra.update(changes.counts())
+        s.extra["matched"] = matched
+
+        if incremental.mode() == "verify":
+            full = matcher.match(df_herd_population["Herd Name Cleaned"], df_herd_population["State Code"])
+            incremental.check_identical("herd name matching", pd.Series(matches).equals(pd.Series(full)))
+
+with step("merge population and locations", rows_in=len(df_herd_population)) as s:
+    # Standardize herd codes
+    df_herd_population["Herd Code Cleaned"] = df_herd_population["Herd Code"].astype(str).str.strip()
+    df_herd_locations.loc[:, "HA_NO Cleaned"] = df_herd_locations["HA_NO"].astype(str).str.strip()
+
+    # Merge using both Herd Code and fuzzy-matched Herd Name
+    merged_df = df_herd_population.merge(
+        df_herd_locations,
+        left_on=["Best Match Herd Name", "Herd Code Cleaned"],
+        right_on=["HA_NAME Cleaned", "HA_NO Cleaned"],
+        how="inner"
+    )
+
+    # Keep only necessary columns
+    merged_df = merged_df[[
+        "State", "State Code", "Herd Name", "Herd Code",
+        "Horses", "Burros", "Total Population", "latitude", "longitude"
+    ]]
+    s.rows_out = len(merged_df)
 
 # Save merged data to a CSV file
-output_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Merged_Herd_Population_Location.csv"
-merged_df.to_csv(output_path, index=False)
+with step("write merged herd locations", rows_in=len(merged_df)):
+    output_path = write_intermediate(merged_df, settings.merged_herd_location_csv_path)
 
 # Print confirmation message
 print(f"Merged dataset saved as {output_path}")
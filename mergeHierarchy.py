@@ -0,0 +1,154 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+
+import settings
+from dotMerging import DotMerger
+
+# Precomputed merge hierarchy of the cutout dots (clusterStates_dots.py)
+#   hierarchy = MergeHierarchy.load_or_build(x, y, count, radius, threshold=1.10, growth_step=30, max_outer_iterations=30)
+#   merger = hierarchy.cut(12)   # the DotMerger state after 12 growth iterations, as if run(12) had been called
+# Every growth iteration of one DotMerger run is kept as a level: the merged dots (x, y, count, radius) and, for every
+# dot of the level before, the dot it was merged into, so the levels form a tree from the herds up to the final dots
+# A different max_outer_iterations is only a different level of the same run, so it is a cut through the tree instead
+# of a new simulation. merge_threshold and growth_step change the run itself (merged dots restart at
+# sqrt(count) * 200), so every combination of them has its own hierarchy, built once and saved as .npz under
+# cache_dir/merge_hierarchy; later renders load it, and a cut deeper than what was built resumes the run from the
+# last level
+# The cache key includes the source of dotMerging.py and of this module, so a change to the merge (or to the file
+# layout) builds new hierarchies instead of cutting the levels of the old code
+
+# Modules whose code decides the levels of a hierarchy
+SOURCE_MODULES = ["dotMerging.py", "mergeHierarchy.py"]
+
+
+@lru_cache(maxsize=None)
+def source_hash():
+    """SHA-256 of the source of SOURCE_MODULES."""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for module in SOURCE_MODULES:
+        with open(os.path.join(repo_dir, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def hierarchy_path(x, y, count, radius, threshold, growth_step, folder=None):
+    """Cache file of a hierarchy, named after a hash of the merge code, the input dots and the two run parameters."""
+    digest = hashlib.sha256(repr((float(threshold), float(growth_step), source_hash())).encode("utf-8"))
+    for values in (x, y, count, radius):
+        values = np.ascontiguousarray(values)
+        digest.update(values.dtype.str.encode("ascii"))
+        digest.update(values.tobytes())
+    folder = folder or os.path.join(settings.cache_dir, "merge_hierarchy")
+    return os.path.join(folder, f"{digest.hexdigest()[:32]}.npz")
+
+
+class MergeHierarchy:
+    """The levels of one DotMerger run (level 0 = the input dots, level k = after k growth iterations)."""
+
+    __slots__ = ("threshold", "growth_step", "x", "y", "count", "radius", "parents", "merge_passes", "converged",
+                 "_labels")
+
+    def __init__(self, x, y, count, radius, threshold=1.10, growth_step=30):
+        merger = DotMerger(x, y, count, radius, threshold=threshold, growth_step=growth_step)
+        self.threshold = threshold
+        self.growth_step = growth_step
+        self.x, self.y, self.count, self.radius = [merger.x], [merger.y], [merger.count], [merger.radius]
+        self.parents = []
+        self.merge_passes = [0]
+        self.converged = False
+        self._labels = merger.labels
+
+    @property
+    def levels(self):
+        """Number of growth iterations recorded."""
+        return len(self.parents)
+
+    def _record(self, merger):
+        """DotMerger.run callback: adds the state after a growth iteration as the next level."""
+        parent = np.empty(len(self.x[-1]), dtype=np.intp)
+        parent[self._labels] = merger.labels
+        self.parents.append(parent)
+        self.x.append(merger.x)
+        self.y.append(merger.y)
+        self.count.append(merger.count)
+        self.radius.append(merger.radius)
+        self.merge_passes.append(merger.merge_passes)
+        self.converged = merger.converged
+        self._labels = merger.labels
+
+    def extend(self, max_outer_iterations):
+        """Runs the merger on from the last level until max_outer_iterations (or convergence)."""
+        if self.converged or self.levels >= max_outer_iterations:
+            return self
+        self._merger(self.levels).run(max_outer_iterations, verbose=False, callback=self._record)
+        return self
+
+    def _merger(self, level):
+        merger = DotMerger(self.x[level], self.y[level], self.count[level], self.radius[level],
+                           threshold=self.threshold, growth_step=self.growth_step)
+        labels = np.arange(len(self.x[0]))
+        for parent in self.parents[:level]:
+            labels = parent[labels]
+        merger.labels = labels
+        merger.outer_iterations = level
+        merger.merge_passes = self.merge_passes[level]
+        merger.converged = self.converged and level == self.levels
+        return merger
+
+    def cut(self, max_outer_iterations):
+        """The DotMerger after run(max_outer_iterations): the same dots, labels, iteration and merge pass counts."""
+        if max_outer_iterations > self.levels and not self.converged:
+            self.extend(max_outer_iterations)
+        return self._merger(min(max_outer_iterations, self.levels))
+
+    def save(self, path):
+        """Writes every level to an .npz file (one array per level, a level keeps the dtypes of its run)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {}
+        for level in range(self.levels + 1):
+            for name in ("x", "y", "count", "radius"):
+                arrays[f"{name}_{level}"] = getattr(self, name)[level]
+            if level:
+                arrays[f"parent_{level}"] = self.parents[level - 1]
+        np.savez(path, threshold=self.threshold, growth_step=self.growth_step, merge_passes=np.array(self.merge_passes),
+                 converged=self.converged, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        hierarchy = cls.__new__(cls)
+        with np.load(path) as data:
+            hierarchy.merge_passes = data["merge_passes"].tolist()
+            levels = range(len(hierarchy.merge_passes))
+            for name in ("x", "y", "count", "radius"):
+                setattr(hierarchy, name, [data[f"{name}_{level}"] for level in levels])
+            hierarchy.parents = [data[f"parent_{level}"] for level in levels[1:]]
+            hierarchy.threshold = data["threshold"].item()
+            hierarchy.growth_step = data["growth_step"].item()
+            hierarchy.converged = bool(data["converged"])
+        hierarchy._labels = np.arange(len(hierarchy.x[0]))
+        for parent in hierarchy.parents:
+            hierarchy._labels = parent[hierarchy._labels]
+        return hierarchy
+
+    @classmethod
+    def load_or_build(cls, x, y, count, radius, threshold=1.10, growth_step=30, max_outer_iterations=30,
+                      folder=None):
+        """The cached hierarchy of these dots and parameters, built (or extended) to max_outer_iterations if needed.
+
+        Returns the hierarchy and whether it was "loaded", "extended" or "built".
+        """
+        path = hierarchy_path(x, y, count, radius, threshold, growth_step, folder)
+        if os.path.exists(path):
+            hierarchy = cls.load(path)
+            if hierarchy.converged or hierarchy.levels >= max_outer_iterations:
+                return hierarchy, "loaded"
+            hierarchy.extend(max_outer_iterations).save(path)
+            return hierarchy, "extended"
+        hierarchy = cls(x, y, count, radius, threshold=threshold, growth_step=growth_step)
+        hierarchy.extend(max_outer_iterations).save(path)
+        return hierarchy, "built"
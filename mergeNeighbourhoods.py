@@ -0,0 +1,272 @@
+import hashlib
+
+import numpy as np
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from dotMerging import DotMerger, KDTREE_BOUND_MARGIN
+
+# Splits the dots of clusterStates_dots.py into neighbourhoods that can never touch each other, so after a change of
+# the herd data only the neighbourhoods with changed herds have to be merged again (incremental.py)
+#   merge = NeighbourhoodMerge(x, y, count, radius, threshold=1.10, growth_step=30, max_outer_iterations=30)
+#   merger = merge.run(previous)   # the DotMerger after run(30) over all dots; previous = the last run's snapshot()
+# A merged dot sits at the count-weighted centroid of its herds, so it never leaves the convex hull of its
+# neighbourhood, and no dot gets larger than the largest start radius or sqrt(total count of the neighbourhood) * 200,
+# plus growth_step per growth iteration (its reach). Neighbourhoods whose hulls are further apart than the sum of their
+# reach (times merge_threshold) never overlap
+# They are still not independent: every merge pass recomputes all dots (single dots go back to sqrt(count) * 200)
+# and the run only stops when no dots overlap anywhere. So the neighbourhoods are merged in lockstep, every one of them
+# going through the same merge passes and growth iterations as the whole map, which gives DotMerger.run bit for bit
+# (the dots of all neighbourhoods are put in the order of their first herd, like DotMerger orders them)
+# A neighbourhood whose dots did not change is taken from the last run as long as the sequence of overlap checks of the
+# whole map ("does any dot overlap?") is the same as then, because then it went through the same passes; if the
+# changed neighbourhoods change that sequence, all neighbourhoods are merged again
+# Below min_dots dots (settings.incremental_min_dots) the dots are merged in full without neighbourhoods: a plain
+# DotMerger run takes about a millisecond there, less than finding the neighbourhoods
+
+# Added to the distance between neighbourhoods for the rounding of the weighted centroids (in metres)
+CENTROID_MARGIN = 1.0
+
+
+def reach(count, radius, growth_step, max_outer_iterations):
+    """Largest radius any dot of a group of dots can get within max_outer_iterations (inf if unbounded)."""
+    count = np.asarray(count, dtype=float)
+    if not np.all(count >= 0):
+        return np.inf
+    return max(np.max(radius, initial=0), np.sqrt(count.sum()) * 200) + max(growth_step, 0) * max_outer_iterations
+
+
+def neighbourhoods(x, y, count, radius, threshold=1.10, growth_step=30, max_outer_iterations=30):
+    """Labels (0..k-1, in the order of the first dot) of groups of dots that never overlap a dot of another group.
+
+    Two groups are joined while their convex hulls are closer than the sum of their reach (times the threshold),
+    the reach of the joined group is computed from its total count again.
+    """
+    n = len(x)
+    count = np.asarray(count, dtype=float)
+    radius = np.broadcast_to(np.asarray(radius), (n,))
+    if not np.isfinite(reach(count, radius, growth_step, max_outer_iterations)):
+        return np.zeros(n, dtype=np.intp)
+
+    # Start from single dots and join the groups that are too close until no two groups are; the hull of a joined
+    # group is the hull of the hulls it was joined from
+    labels = np.arange(n)
+    hulls = shapely.points(np.column_stack((x, y)))
+    totals, largest = count, radius
+    margin = 1 + KDTREE_BOUND_MARGIN
+    while True:
+        reaches = np.maximum(largest, np.sqrt(totals) * 200) + max(growth_step, 0) * max_outer_iterations
+
+        # Candidates within the largest possible distance, then the exact condition for every pair
+        bounds = (reaches + reaches.max()) * threshold * margin + CENTROID_MARGIN
+        i_idx, j_idx = shapely.STRtree(hulls).query(hulls, predicate="dwithin", distance=bounds)
+        close = (shapely.distance(hulls[i_idx], hulls[j_idx])
+                 < (reaches[i_idx] + reaches[j_idx]) * threshold * margin + CENTROID_MARGIN)
+        i_idx, j_idx = i_idx[close], j_idx[close]
+        adjacency = coo_matrix((np.ones(len(i_idx), dtype=np.int8), (i_idx, j_idx)), shape=(len(hulls),) * 2)
+        k, joined = connected_components(adjacency, directed=False)
+        labels = joined[labels]
+        if k == len(hulls):
+            break
+
+        order = np.argsort(joined, kind="stable")
+        starts = np.searchsorted(joined[order], np.arange(k))
+        hulls = shapely.convex_hull(shapely.geometrycollections(hulls[order], indices=joined[order]))
+        totals = np.bincount(joined, weights=totals, minlength=k)
+        largest = np.maximum.reduceat(largest[order], starts)
+
+    # Numbered in the order of their first dot
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.intp)
+    rank[np.argsort(first)] = np.arange(len(first))
+    return rank[inverse]
+
+
+def dots_hash(x, y, count, radius):
+    digest = hashlib.sha256()
+    for values in (x, y, count, radius):
+        values = np.ascontiguousarray(values)
+        digest.update(values.dtype.str.encode("ascii"))
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def same_dots(a, b):
+    """True if two DotMergers hold the same dots (values and dtypes), labels and iteration counts."""
+    for name in ("x", "y", "count", "radius", "labels"):
+        if getattr(a, name).dtype != getattr(b, name).dtype or not np.array_equal(getattr(a, name), getattr(b, name)):
+            return False
+    return all(getattr(a, name) == getattr(b, name) for name in ("outer_iterations", "merge_passes", "converged"))
+
+
+class _ChecksDiffer(Exception):
+    """The overlap checks of the whole map left the sequence of the last run."""
+
+
+class NeighbourhoodMerge:
+    """DotMerger.run over independent neighbourhoods in lockstep, unchanged neighbourhoods reused from the last run."""
+
+    def __init__(self, x, y, count, radius, threshold=1.10, growth_step=30, max_outer_iterations=30, min_dots=0):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.count = np.asarray(count)
+        self.radius = np.broadcast_to(np.asarray(radius), self.x.shape)
+        self.threshold = threshold
+        self.growth_step = growth_step
+        self.max_outer_iterations = max_outer_iterations
+
+        # Few dots are merged in full, as one neighbourhood that is never reused
+        self.full = len(self.x) < min_dots
+        if self.full:
+            self.labels = np.zeros(len(self.x), dtype=np.intp)
+        else:
+            self.labels = neighbourhoods(self.x, self.y, self.count, self.radius, threshold, growth_step,
+                                         max_outer_iterations)
+        order = np.argsort(self.labels, kind="stable")
+        self.members = np.split(order, np.cumsum(np.bincount(self.labels))[:-1]) if len(order) else []
+        self.hashes = [] if self.full else [dots_hash(self.x[m], self.y[m], self.count[m], self.radius[m])
+                                             for m in self.members]
+        self.reused = 0
+        self.status = ""
+        self._results = {}
+        self._checks = []
+
+    def __len__(self):
+        return len(self.members)
+
+    def _lockstep(self, live, cached, expected):
+        """Merges the dots of the ``live`` neighbourhoods, the ``cached`` ones only take part with their recorded
+        overlap checks; raises _ChecksDiffer if the checks of the whole map leave ``expected``.
+
+        The live neighbourhoods are merged together in one DotMerger (a cluster never spans two of them), every dot
+        keeps track of its neighbourhood. Returns the merger, its herds, the neighbourhood of every merged dot, the
+        overlap checks of every live neighbourhood and those of the whole map.
+        """
+        herds = np.sort(np.concatenate([self.members[g] for g in live])) if live else np.empty(0, dtype=np.intp)
+        merger = DotMerger(self.x[herds], self.y[herds], self.count[herds], self.radius[herds],
+                           threshold=self.threshold, growth_step=self.growth_step)
+        dot_group = self.labels[herds]
+        cached_checks = [result["checks"] for result in cached.values()]
+        checks, any_checks = [], []
+
+        def overlapping():
+            t = len(checks)
+            flags = np.zeros(len(self), dtype=bool)
+            if len(merger):
+                flags[dot_group[[c[0] for c in merger.overlap_clusters() if len(c) > 1]]] = True
+            found = bool(flags.any()) or any(bool(c[t]) for c in cached_checks if t < len(c))
+            if expected is not None and (t >= len(expected) or found != expected[t]):
+                raise _ChecksDiffer()
+            checks.append(flags[live])
+            any_checks.append(found)
+            return found
+
+        # The loop of DotMerger.run; a merge pass also runs when only a cached neighbourhood has overlaps, because the
+        # pass of the whole map recomputes every dot
+        found = overlapping() if self.max_outer_iterations > 0 else False
+        for _ in range(self.max_outer_iterations):
+            while found:
+                if len(merger):
+                    clusters = merger.overlap_clusters()
+                    dot_group = dot_group[[c[0] for c in clusters]]
+                    merger.merge(clusters)
+                found = overlapping()
+            merger.grow()
+            found = overlapping()
+            if not found:
+                break
+        if expected is not None and len(checks) != len(expected):
+            raise _ChecksDiffer()
+
+        return merger, herds, dot_group, np.array(checks, dtype=bool).reshape(len(checks), len(live)), any_checks
+
+    def run(self, previous=None):
+        """The DotMerger after run(max_outer_iterations) over all dots.
+
+        ``previous`` is the snapshot() of an earlier run with the same parameters; its neighbourhoods with unchanged
+        dots are reused if the overlap checks of the whole map stay the same.
+        """
+        if self.full:
+            self.status = "merged in full, too few dots for neighbourhoods"
+            merger = DotMerger(self.x, self.y, self.count, self.radius, self.threshold, self.growth_step)
+            return merger.run(self.max_outer_iterations, verbose=False)
+
+        groups = range(len(self))
+        cached = {}
+        if previous is not None:
+            cached = {g: previous["neighbourhoods"][self.hashes[g]] for g in groups
+                      if self.hashes[g] in previous["neighbourhoods"]}
+        self.status = "no previous run" if previous is None else "no unchanged neighbourhoods"
+        if cached:
+            live = [g for g in groups if g not in cached]
+            try:
+                merger, herds, dot_group, checks, self._checks = self._lockstep(live, cached, previous["checks"])
+                self.reused = len(cached)
+                self.status = f"{self.reused} of {len(self)} neighbourhoods unchanged"
+            except _ChecksDiffer:
+                cached = {}
+                self.status = "overlap checks differ from the last run"
+        if not cached:
+            live = list(groups)
+            merger, herds, dot_group, checks, self._checks = self._lockstep(live, {}, None)
+
+        # The merged dots and labels of every live neighbourhood (its dots keep their order)
+        self._results = dict(cached)
+        herd_position = np.empty(len(self.x), dtype=np.intp)
+        herd_position[herds] = np.arange(len(herds))
+        for i, g in enumerate(live):
+            dots = np.flatnonzero(dot_group == g)
+            local = np.empty(len(dot_group), dtype=np.intp)
+            local[dots] = np.arange(len(dots))
+            self._results[g] = {"checks": checks[:, i], "x": merger.x[dots], "y": merger.y[dots],
+                                "count": merger.count[dots], "radius": merger.radius[dots],
+                                "labels": local[merger.labels[herd_position[self.members[g]]]]}
+        return self._assemble(merger)
+
+    def _assemble(self, live_merger):
+        """One DotMerger with the dots of all neighbourhoods, in the order of their first herd."""
+        results = [self._results[g] for g in range(len(self))]
+        if not results:
+            return DotMerger(self.x, self.y, self.count, self.radius, self.threshold, self.growth_step)
+
+        first_herd, offsets = [], [0]
+        for members, result in zip(self.members, results):
+            first = np.full(len(result["x"]), len(members))
+            np.minimum.at(first, result["labels"], np.arange(len(members)))
+            first_herd.append(members[first])
+            offsets.append(offsets[-1] + len(first))
+        order = np.argsort(np.concatenate(first_herd))
+        position = np.empty(len(order), dtype=np.intp)
+        position[order] = np.arange(len(order))
+
+        x, y, count, radius = (np.concatenate([r[name] for r in results])[order]
+                               for name in ("x", "y", "count", "radius"))
+        merger = DotMerger(x, y, count, radius, threshold=self.threshold, growth_step=self.growth_step)
+        merger.labels = np.empty(len(self.x), dtype=np.intp)
+        for members, result, offset in zip(self.members, results, offsets):
+            merger.labels[members] = position[offset + result["labels"]]
+        merger.outer_iterations, merger.merge_passes, merger.converged = self._replay()
+        merger.timings = dict(live_merger.timings)
+        return merger
+
+    def _replay(self):
+        """Growth iterations, merge passes and convergence of the run, from the overlap checks of the whole map."""
+        checks = iter(self._checks)
+        outer_iterations, merge_passes, converged = 0, 0, False
+        found = next(checks) if self.max_outer_iterations > 0 else False
+        for outer in range(self.max_outer_iterations):
+            while found:
+                merge_passes += 1
+                found = next(checks)
+            outer_iterations = outer + 1
+            found = next(checks)
+            if not found:
+                converged = True
+                break
+        return outer_iterations, merge_passes, converged
+
+    def snapshot(self):
+        """The overlap checks of the whole map and the merged dots of every neighbourhood, for the next run
+        (none after a merge in full)."""
+        return {"checks": self._checks, "neighbourhoods": {h: self._results[g] for g, h in enumerate(self.hashes)}}
@@ -0,0 +1,301 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import instrumentation
+import settings
+from geoio import intermediate_path, merged_population_paths
+
+# Runs the DataLamp scripts as a chain of cached stages
+# Every stage declares its script, its input and output files and the settings it depends on; the helper modules
+# that are part of a stage's code are found by following the script's imports (local_modules()); a stage is skipped
+# when the hash of all of these matches a previous run and its outputs are still there (or can be restored from the
+# cache)
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def imported_modules(path):
+    """Names of all modules a Python file imports, also inside functions (deferred imports change the outputs too)."""
+    import ast
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+
+def local_modules(script):
+    """The repository modules a script imports, directly or through other repository modules, in a stable order."""
+    found = []
+    pending = [script]
+    while pending:
+        for name in imported_modules(os.path.join(repo_dir, pending.pop(0))):
+            file_name = name.split(".")[0] + ".py"
+            if file_name != script and file_name not in found and os.path.exists(os.path.join(repo_dir, file_name)):
+                found.append(file_name)
+                pending.append(file_name)
+    return sorted(found)
+
+
+class Stage:
+    """One pipeline step: a script with declared inputs, outputs and parameters."""
+
+    def __init__(self, name, script, inputs, outputs, params=()):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = list(params)
+        self.modules = local_modules(script)
+
+    def code_files(self):
+        return [os.path.join(repo_dir, f) for f in [self.script, *self.modules]]
+
+    def param_values(self):
+        # The intermediate format decides which files are written, so it is part of every stage's parameters
+        values = {name: getattr(settings, name) for name in self.params}
+        values["intermediate_format"] = settings.intermediate_format
+        return values
+
+
+# Settings of the vector exports (fabrication.py), used by every stage that writes SVG/DXF files
+FABRICATION_PARAMS = ["vector_export", "cut_tolerance_mm", "cut_grid_mm", "min_hole_diameter_mm", "small_holes",
+                      "max_holes"]
+
+# The stages in the order they have to run
+STAGES = [
+    Stage("cleanPopulation", "cleanPopulation.py",
+          inputs=[settings.population_excel_path],
+          outputs=[intermediate_path(settings.cleaned_population_csv_path), settings.cleaned_population_excel_path]),
+    Stage("gdb_reader", "gdb_reader.py",
+          inputs=[settings.herd_area_gdb_path],
+          outputs=[intermediate_path(settings.processed_herd_areas_path)],
+          params=["herd_area_layer", "herd_area_bbox"]),
+    Stage("mergeHerdData", "mergeHerdData.py",
+          inputs=[settings.herd_population_excel_path, settings.herd_area_gdb_path],
+          outputs=[intermediate_path(settings.merged_herd_location_csv_path)],
+          params=["herd_area_layer", "herd_area_bbox"]),
+    Stage("assignHerdStates", "assignHerdStates.py",
+          inputs=[intermediate_path(settings.merged_herd_location_csv_path), settings.us_states_path],
+          outputs=[intermediate_path(settings.herd_states_path)],
+          params=["state_snap_distance"]),
+    Stage("mergeDatasets", "mergeDatasets.py",
+          inputs=[intermediate_path(settings.cleaned_population_csv_path), settings.filtered_herds_path],
+          outputs=list(merged_population_paths().values()),
+          params=["merged_population_formats"]),
+    Stage("stateBoundaries", "stateBoundaries.py",
+          inputs=[settings.us_states_path, intermediate_path(settings.cleaned_population_csv_path)],
+          outputs=[settings.states_separated_dir],
+          params=FABRICATION_PARAMS),
+    Stage("clusterStates", "clusterStates.py",
+          inputs=[settings.states_separated_dir, intermediate_path(settings.cleaned_population_csv_path),
+                  *([intermediate_path(settings.merged_herd_population_geojson_path)]
+                    if settings.point_density == "herds" else [])],
+          outputs=[settings.clustered_states_dir],
+          params=["random_seed", "hdbscan_min_cluster_size", "hdbscan_min_samples", "kmeans_fallback_clusters",
+                  "point_density", "points_per_animal", "max_points_per_state", "hdbscan_sample_size",
+                  *FABRICATION_PARAMS]),
+    Stage("clusterHerds", "clusterHerds.py",
+          inputs=[intermediate_path(settings.processed_herd_areas_path),
+                  intermediate_path(settings.cleaned_population_csv_path)],
+          outputs=[settings.clustered_herds_path],
+          params=["herd_clusters_per_state"]),
+    Stage("clusterStates_dots", "clusterStates_dots.py",
+          inputs=[intermediate_path(settings.merged_herd_location_csv_path), settings.us_states_path],
+          outputs=[settings.cutout_png_path, settings.cutout_svg_path, intermediate_path(settings.cutout_dots_path)],
+          params=["initial_radius", "growth_step", "merge_threshold", "max_outer_iterations", "state_snap_distance",
+                  *FABRICATION_PARAMS]),
+    Stage("uvTexture", "uvTexture.py",
+          inputs=[intermediate_path(settings.cutout_dots_path), settings.us_states_path],
+          outputs=[settings.texture_paths[fmt] for fmt in settings.texture_formats],
+          params=["texture_width", "texture_tile_size", "texture_formats"]),
+]
+
+
+def list_files(path):
+    """All files of a path (the path itself, or every file below a directory) in a stable order."""
+    if os.path.isdir(path):
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+        return files
+    return [path]
+
+
+class StageCache:
+    """Content-addressed cache of stage outputs with a JSON manifest."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.manifest = {"files": {}, "stages": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+
+    def file_hash(self, path):
+        """SHA-256 of a file's bytes, re-hashed only when its size or mtime changed."""
+        stat = os.stat(path)
+        known = self.manifest["files"].get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.manifest["files"][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path_hash(self, path):
+        """Hash of a file or of all files below a directory; None if the path does not exist."""
+        if not os.path.exists(path):
+            return None
+        digest = hashlib.sha256()
+        for file_path in list_files(path):
+            digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+            digest.update(self.file_hash(file_path).encode("ascii"))
+        return digest.hexdigest()
+
+    def stage_key(self, stage):
+        """Hash of everything a stage's outputs depend on: code, input bytes and parameters."""
+        digest = hashlib.sha256(stage.name.encode("utf-8"))
+        for path in stage.code_files() + stage.inputs:
+            path_hash = self.path_hash(path)
+            if path_hash is None:
+                raise FileNotFoundError(f"Input of stage {stage.name} not found: {path}")
+            digest.update(path_hash.encode("ascii"))
+        digest.update(json.dumps(stage.param_values(), sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def object_dir(self, stage, key):
+        return os.path.join(self.cache_dir, "objects", stage.name, key)
+
+    def lookup(self, stage, key):
+        """Returns "hit" if the outputs are current, "restored" if they were copied back from the cache, else None."""
+        entry = self.manifest["stages"].get(stage.name, {}).get(key)
+        if entry is None:
+            return None
+        if all(self.path_hash(path) == entry[path] for path in stage.outputs):
+            return "hit"
+
+        # Outputs were changed or deleted since, but this combination of inputs was computed before
+        object_dir = self.object_dir(stage, key)
+        if not os.path.isdir(object_dir):
+            return None
+        for i, path in enumerate(stage.outputs):
+            cached = os.path.join(object_dir, str(i))
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.isdir(cached):
+                shutil.copytree(cached, path)
+            else:
+                shutil.copy2(cached, path)
+        return "restored"
+
+    def store(self, stage, key):
+        """Copies the outputs of a finished stage into the cache and records their hashes."""
+        object_dir = self.object_dir(stage, key)
+        if os.path.isdir(object_dir):
+            shutil.rmtree(object_dir)
+        os.makedirs(object_dir)
+        outputs = {}
+        for i, path in enumerate(stage.outputs):
+            outputs[path] = self.path_hash(path)
+            if outputs[path] is None:
+                raise FileNotFoundError(f"Stage {stage.name} did not write {path}")
+            if os.path.isdir(path):
+                shutil.copytree(path, os.path.join(object_dir, str(i)))
+            else:
+                shutil.copy2(path, os.path.join(object_dir, str(i)))
+        self.manifest["stages"].setdefault(stage.name, {})[key] = outputs
+        self.save()
+
+
+def run_stage(stage, profile=False):
+    """Runs a stage's script in its own process (non-interactive matplotlib backend, so plt.show() does not block).
+
+    All stages of one pipeline run log their steps under the same run id (instrumentation.py).
+    """
+    env = dict(os.environ, MPLBACKEND="Agg", DATALAMP_RUN_ID=instrumentation.run_id)
+    if profile:
+        env["DATALAMP_PROFILE"] = "1"
+    subprocess.run([sys.executable, os.path.join(repo_dir, stage.script)], cwd=repo_dir, env=env, check=True)
+
+
+def main():
+    stage_names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Run the DataLamp pipeline, skipping stages whose outputs are cached.")
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help=f"stages to run (default: all, in pipeline order): {', '.join(stage_names)}")
+    parser.add_argument("--force", action="append", default=[], choices=stage_names, metavar="STAGE",
+                        help="re-run this stage even if it is cached (can be repeated)")
+    parser.add_argument("--force-all", action="store_true", help="re-run every selected stage")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages would run")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the stages under cProfile (cached stages are not run, combine with --force)")
+    args = parser.parse_args()
+    unknown = set(args.stages) - set(stage_names)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    selected = [stage for stage in STAGES if not args.stages or stage.name in args.stages]
+    cache = StageCache(settings.cache_dir)
+    report = []
+
+    for stage in selected:
+        start = time.perf_counter()
+        try:
+            key = cache.stage_key(stage)
+        except FileNotFoundError as e:
+            print(f"⚠️ {e}")
+            report.append((stage.name, "missing input", 0.0))
+            continue
+
+        forced = args.force_all or stage.name in args.force
+        status = None if forced else cache.lookup(stage, key)
+        if status is None:
+            if args.dry_run:
+                report.append((stage.name, "would run" + (" (forced)" if forced else ""), 0.0))
+                continue
+            print(f"▶️ Running {stage.name}...")
+            try:
+                run_stage(stage, profile=args.profile)
+            except subprocess.CalledProcessError as e:
+                print(f"⚠️ Stage {stage.name} failed with exit code {e.returncode}")
+                report.append((stage.name, "failed", time.perf_counter() - start))
+                break
+            cache.store(stage, key)
+            status = "miss (forced)" if forced else "miss"
+        report.append((stage.name, status, time.perf_counter() - start))
+
+    cache.save()
+
+    # Cache report
+    print(f"\n{'Stage':<20} {'Cache':<16} {'Time [s]':>9}")
+    for name, status, seconds in report:
+        print(f"{name:<20} {status:<16} {seconds:>9.2f}")
+    hits = sum(status in ("hit", "restored") for _, status, _ in report)
+    misses = sum(status.split(" (")[0] in ("miss", "would run") for _, status, _ in report)
+    print(f"✅ {hits} cache hits, {misses} misses, {len(report) - hits - misses} not run (missing input or failed)")
+    print(f"📝 Step timings of run {instrumentation.run_id} are in {settings.run_log_path}")
+
+
+if __name__ == "__main__":
+    main()
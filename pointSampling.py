@@ -0,0 +1,132 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import Point
+
+import settings
+from pointStore import PointStore
+
+# Shapely 2 is used for the vectorized point-in-polygon test (contains_xy on a prepared geometry)
+# Numpy draws the candidate points in blocks from a seeded np.random.Generator
+# The points are kept in a PointStore (pointStore.py), shapely points are only made for a GeoDataFrame
+# How many points a state gets and where they go is settings.point_density:
+# - "capped": population / 5 points, at least 50 and at most 500, uniform in the state (the original density)
+# - "proportional": population * points_per_animal points (at least 50, at most max_points_per_state), uniform
+# - "herds": as many points as "proportional", split over the herd areas of the state in proportion to their
+#   population (Merged_Herd_Population), so the density follows the herds; uniform in the state without herd areas
+# Sampling is linear in the number of points, 100k points take about as long per point as 1k
+
+POINT_DENSITIES = ("capped", "proportional", "herds")
+
+# Extra candidates drawn per block on top of the expected number, so one block is usually enough
+OVERSAMPLING = 1.2
+MIN_BATCH_SIZE = 256
+
+
+def sample_points_in_polygon(geometry, num_points, rng=None):
+    """Returns a (num_points, 2) array of uniformly distributed points inside geometry.
+
+    Candidates are drawn in blocks inside the bounding box and tested all at once,
+    then topped up until num_points points are inside.
+    """
+    rng = np.random.default_rng(rng)
+    minx, miny, maxx, maxy = geometry.bounds
+    shapely.prepare(geometry)
+
+    # The share of the bounding box covered by the shape is the expected acceptance rate
+    bbox_area = (maxx - minx) * (maxy - miny)
+    acceptance = geometry.area / bbox_area if bbox_area > 0 else 1.0
+    acceptance = min(1.0, max(acceptance, 0.01))
+
+    accepted = []
+    remaining = num_points
+    while remaining > 0:
+        batch_size = max(MIN_BATCH_SIZE, int(remaining / acceptance * OVERSAMPLING))
+        xs = rng.uniform(minx, maxx, batch_size)
+        ys = rng.uniform(miny, maxy, batch_size)
+        inside = shapely.contains_xy(geometry, xs, ys)
+        block = np.column_stack((xs[inside], ys[inside]))[:remaining]
+        accepted.append(block)
+        remaining -= len(block)
+
+    return np.concatenate(accepted) if accepted else np.empty((0, 2))
+
+
+def state_point_count(state_population, density=None):
+    """Number of points for a state population with the given density (settings.point_density by default)."""
+    density = density or settings.point_density
+    if density not in POINT_DENSITIES:
+        raise ValueError(f"Unknown point density {density!r}, use {', '.join(POINT_DENSITIES)}")
+    if density == "capped":
+        # Adjust clustering density dynamically with upper and lower limits
+        return min(500, max(50, int(state_population / 5)))  # Limits the density
+    return min(settings.max_points_per_state, max(50, int(state_population * settings.points_per_animal)))
+
+
+def allocate_points(num_points, weights):
+    """Splits num_points over the weights by largest remainder, the counts add up to num_points."""
+    weights = np.asarray(weights, dtype=float)
+    shares = num_points * weights / weights.sum()
+    counts = np.floor(shares).astype(np.int64)
+    remainder = num_points - counts.sum()
+    counts[np.argsort(-(shares - counts), kind="stable")[:remainder]] += 1
+    return counts
+
+
+def sample_points_in_herds(herd_geometries, herd_populations, num_points, rng=None):
+    """Returns a (num_points, 2) array of points spread over the herd areas in proportion to their population,
+    uniform within every herd area (herds in input order)."""
+    rng = np.random.default_rng(rng)
+    counts = allocate_points(num_points, herd_populations)
+    blocks = [sample_points_in_polygon(geometry, count, rng)
+              for geometry, count in zip(herd_geometries, counts) if count > 0]
+    return np.concatenate(blocks) if blocks else np.empty((0, 2))
+
+
+def sample_point_store(state_geometry, state_population, crs, rng=None, path=None, herds=None, density=None):
+    """Cluster points inside the state boundary as a PointStore (pointStore.py), None without population.
+
+    ``herds`` (geometry and "Total Population" of the state's herd areas, in crs) are used with density "herds".
+    """
+    if pd.isna(state_population) or state_population <= 0:
+        return None
+
+    density = density or settings.point_density
+    num_points = state_point_count(state_population, density)
+
+    populated = herds[herds["Total Population"] > 0] if density == "herds" and herds is not None else None
+    if populated is not None and len(populated):
+        coords = sample_points_in_herds(populated.geometry, populated["Total Population"], num_points, rng)
+    else:
+        coords = sample_points_in_polygon(state_geometry, num_points, rng)
+    return PointStore.from_xy(coords[:, 0], coords[:, 1], crs=crs, path=path)
+
+
+# Function to generate cluster points inside state shape
+def generate_cluster_points(state_geometry, state_population, crs, rng=None):
+    """Generates spaced cluster points inside state boundary, scaled by population size."""
+    points = sample_point_store(state_geometry, state_population, crs, rng)
+    if points is None:
+        return None
+
+    # Create GeoDataFrame
+    return points.to_geodataframe()
+
+
+# The original one-point-at-a-time rejection sampler, kept as a reference for benchmarks
+def generate_cluster_points_reference(state_geometry, state_population, crs):
+    if pd.isna(state_population) or state_population <= 0:
+        return None
+
+    num_points = min(500, max(50, int(state_population / 5)))
+
+    points = []
+    minx, miny, maxx, maxy = state_geometry.bounds
+
+    while len(points) < num_points:
+        random_point = Point(np.random.uniform(minx, maxx), np.random.uniform(miny, maxy))
+        if state_geometry.contains(random_point):  # Ensure point is inside state shape
+            points.append(random_point)
+
+    return gpd.GeoDataFrame(geometry=points, crs=crs)
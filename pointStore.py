@@ -0,0 +1,107 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+
+import settings
+
+# Compact storage for large point sets (the sampled points of clusterStates.py, the herd dots of clusterStates_dots.py)
+#   points = PointStore.from_xy(x, y, count=1, radius=30, crs="EPSG:3857", path=store_path("herds"))
+#   labels = cluster(points.coords(), "hdbscan"); points["cluster"] = labels
+#   gdf = points.to_geodataframe(columns={"cluster": "Cluster_ID"})   # shapely points only here, at export
+# One structured NumPy array holds x, y, count, radius and cluster (40 bytes per point) instead of one shapely Point
+# (and a GeoSeries entry) per point; the fields are views, so clustering, jitter and merging work on the arrays
+# With settings.point_store = "memmap" the array is an np.memmap in cache_dir/points, so the pages can be dropped from
+# memory by the OS; the file only lives as long as the script needs the points, discard() deletes it
+
+POINT_DTYPE = np.dtype([("x", "f8"), ("y", "f8"), ("count", "f8"), ("radius", "f8"), ("cluster", "i8")])
+
+STORE_MODES = ("memory", "memmap")
+
+
+def store_path(name):
+    """File of the named point store if settings.point_store is "memmap", None to keep the points in memory."""
+    if settings.point_store not in STORE_MODES:
+        raise ValueError(f"Unknown point store {settings.point_store!r}, use one of {', '.join(STORE_MODES)}")
+    if settings.point_store == "memory":
+        return None
+    folder = os.path.join(settings.cache_dir, "points")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{name}.points")
+
+
+class PointStore:
+    """Points as one structured array (POINT_DTYPE), in memory or memory-mapped from ``path``."""
+
+    __slots__ = ("points", "crs", "path")
+
+    def __init__(self, points, crs=None, path=None):
+        self.points = points
+        self.crs = crs
+        self.path = path
+
+    @classmethod
+    def allocate(cls, n, crs=None, path=None):
+        """n points at (0, 0) with count 1, radius 0 and no cluster (-1)."""
+        if path is None:
+            points = np.zeros(n, dtype=POINT_DTYPE)
+        elif n == 0:
+            points = np.zeros(0, dtype=POINT_DTYPE)  # np.memmap cannot map an empty file
+            open(path, "wb").close()
+        else:
+            points = np.memmap(path, dtype=POINT_DTYPE, mode="w+", shape=(n,))
+        points["count"] = 1
+        points["cluster"] = -1
+        return cls(points, crs, path)
+
+    @classmethod
+    def from_xy(cls, x, y, count=1.0, radius=0.0, crs=None, path=None):
+        """Points from coordinate arrays; count and radius are arrays or one value for all points."""
+        x = np.asarray(x, dtype=float)
+        store = cls.allocate(len(x), crs, path)
+        store.points["x"] = x
+        store.points["y"] = np.asarray(y, dtype=float)
+        store.points["count"] = np.asarray(count, dtype=float)
+        store.points["radius"] = np.asarray(radius, dtype=float)
+        return store
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, field):
+        return self.points[field]
+
+    def __setitem__(self, field, values):
+        self.points[field] = values
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes
+
+    def coords(self):
+        """(n, 2) array of x and y, the one copy the clustering algorithms need."""
+        return np.column_stack((self.points["x"], self.points["y"]))
+
+    def move(self, dx, dy):
+        """Shifts the points in place (e.g. by a jitter)."""
+        self.points["x"] += dx
+        self.points["y"] += dy
+
+    def discard(self):
+        """Drops the points and deletes the file of a memory-mapped store, once they are exported."""
+        self.points = np.zeros(0, dtype=POINT_DTYPE)
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:  # still mapped by a view on Windows, the next run overwrites it
+                pass
+            self.path = None
+
+    def to_geodataframe(self, columns=None):
+        """GeoDataFrame of the points: the geometry, then the fields in ``columns`` (a list or {field: column})."""
+        columns = {} if columns is None else columns
+        if not isinstance(columns, dict):
+            columns = {field: field for field in columns}
+        data = {"geometry": gpd.points_from_xy(self.points["x"], self.points["y"])}
+        data.update({name: np.array(self.points[field]) for field, name in columns.items()})
+        return gpd.GeoDataFrame(data, crs=self.crs)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+import settings
+from geoio import merged_population_paths, write_intermediate
+
+# Spreads the state populations of Final_Cleaned_Population_Data.csv over the herd areas (mergeDatasets.py)
+#   df = join_population(herd_areas, population)      # the population columns of every herd's state
+#   df = redistribute_population(df, population)      # Total Animals per state, Total Population per herd
+#   shares = check_shares(df, population)             # raises if the herds of a state do not add up to its population
+# Every herd gets the share (Horses + Burros) / Total Animals of its state's Total Population. The state works as a
+# categorical key: the population rows are looked up once per herd and the state sums come from groupby().transform,
+# instead of merging the whole herd table (with its polygons) twice and mapping a dict. The columns, their order and
+# the values are the same as with the merge / groupby().sum() / merge / map version
+# This makes the script 1.3-1.5x faster (benchmarks/bench_redistribution.py), but not leaner: its peak memory is
+# set by reading the herd-area GeoJSON (GDAL holds the parsed file next to the polygons), the same before and after,
+# and the joins add a few MB on top of it
+
+ANIMAL_COLUMNS = ["Horses", "Burros"]
+
+
+def population_states(population, key="State"):
+    """The upper-cased states of the population table, one row per state."""
+    states = population[key].str.upper()
+    if states.isna().any() or states.duplicated().any():
+        repeated = sorted(set(states[states.duplicated()].dropna()))
+        raise ValueError(f"The population table needs exactly one row per state (missing or repeated: {repeated})")
+    return pd.Index(states)
+
+
+def join_population(herds, population, key="State"):
+    """Left join of the population table onto the herds on the upper-cased state (the herds' state is upper-cased).
+
+    Adds the population columns the herds do not have yet, empty for herds of states without a population row;
+    Horses and Burros are made numeric (missing counts as 0).
+    """
+    df = herds.copy(deep=False).reset_index(drop=True)
+    df[key] = df[key].str.upper()
+    columns = [c for c in population.columns if c != key and c not in df.columns]
+    joined = population[columns].set_axis(population_states(population, key)).reindex(df[key].to_numpy())
+    for column in columns:
+        df[column] = joined[column].array
+    for column in ANIMAL_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0)
+    return df
+
+
+def redistribute_population(df, population, key="State"):
+    """Adds Total Animals (per state) and the herd's share of the state's Total Population to a joined table.
+
+    The state sums are one groupby().transform per animal column over the categorical state.
+    """
+    states = pd.Categorical(df[key])
+    horses, burros = (df[c].groupby(states, observed=True).transform("sum") for c in ANIMAL_COLUMNS)
+    df["Total Animals"] = horses + burros
+
+    state_population = population["Total Population"].set_axis(population_states(population, key))
+    df["Total Population"] = (
+        (df["Horses"] + df["Burros"]) / df["Total Animals"]
+    ) * state_population.reindex(df[key].to_numpy()).to_numpy()
+    return df
+
+
+def check_shares(df, population, key="State", rtol=1e-9):
+    """Population and redistributed total of every state of the population table.
+
+    Raises ValueError if the herds of a state with animals do not add up to its population; states without herds
+    or without animals keep their population undistributed (Redistributed is 0).
+    """
+    shares = pd.DataFrame({
+        "Population": population["Total Population"].set_axis(population_states(population, key)).astype(float),
+        "Redistributed": df.groupby(key)["Total Population"].sum(),
+        "Animals": df.groupby(key)["Total Animals"].first(),
+    }).reindex(population_states(population, key))
+    shares["Redistributed"] = shares["Redistributed"].fillna(0)
+    distributed = shares["Animals"] > 0
+    wrong = distributed & ~np.isclose(shares["Redistributed"], shares["Population"], rtol=rtol)
+    if wrong.any():
+        raise ValueError(f"Herd shares do not add up to the state population for {', '.join(shares.index[wrong])}")
+    return shares.drop(columns="Animals")
+
+
+def write_outputs(df, formats=None):
+    """Writes the table in the requested formats only (settings.merged_population_formats by default), returns
+    {format: path}; the paths are geoio.merged_population_paths."""
+    paths = merged_population_paths(formats)
+    for fmt, path in paths.items():
+        if fmt == "intermediate":
+            write_intermediate(df, settings.merged_herd_population_geojson_path)
+        else:
+            df.to_csv(path, index=False)
+    return paths
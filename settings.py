@@ -0,0 +1,126 @@
+import json
+import os
+
+# Shared paths and parameters for all pipeline scripts
+# The pipeline runner (pipeline.py) reads the same values to know each stage's inputs, outputs and parameters,
+# so changing a parameter here only re-runs the stages that use it
+
+
+def _env_list(variable, default):
+    """Comma-separated values of an environment variable, e.g. "intermediate, csv" (spaces and empty items dropped)."""
+    return [value.strip() for value in os.environ.get(variable, default).split(",") if value.strip()]
+
+
+# Base folders, can be overridden with environment variables; any other setting with a JSON object in DATALAMP_SETTINGS
+# (see the end of this file, datalamp.py --set NAME=VALUE)
+data_dir = os.environ.get("DATALAMP_DATA_DIR", r"D:\Users\Happi\Documents\BCC\Bachelor Thesis")
+project_dir = os.environ.get("DATALAMP_PROJECT_DIR", os.path.join(data_dir, "DataLamp"))
+
+# Source data
+population_excel_path = os.path.join(data_dir, "BLM Herd Area and Herd Management Area Statistics.xlsx")
+herd_population_excel_path = os.path.join(data_dir, "Herd_Population.xlsx")
+herd_area_gdb_path = os.path.join(
+    data_dir, "BLM Wild Horse and Burro Herd Area Polygons", "data", "v101", "rangedata_blm_20170519.gdb"
+)
+herd_area_layer = "BLM_National_HA_20170519"
+herd_area_bbox = None  # (minx, miny, maxx, maxy) in the layer's CRS to read only part of the herd areas
+us_states_path = os.path.join(data_dir, "US States", "us-state-boundaries.geojson")
+filtered_herds_path = os.path.join(project_dir, "filtered_herds.geojson")
+
+# Intermediate and final outputs
+cleaned_population_csv_path = os.path.join(data_dir, "Final_Cleaned_Population_Data.csv")
+cleaned_population_excel_path = os.path.join(data_dir, "Final_Cleaned_Population_Data.xlsx")
+processed_herd_areas_path = os.path.join(project_dir, "processed_herd_areas.geojson")
+merged_herd_location_csv_path = os.path.join(data_dir, "Merged_Herd_Population_Location.csv")
+merged_herd_population_geojson_path = os.path.join(project_dir, "Merged_Herd_Population.geojson")
+merged_herd_population_csv_path = os.path.join(project_dir, "Merged_Herd_Population.csv")
+herd_states_path = os.path.join(project_dir, "herd_states.csv")
+states_separated_dir = os.path.join(project_dir, "States_Separated")
+clustered_states_dir = os.path.join(project_dir, "Clustered_States")
+clustered_herds_path = os.path.join(project_dir, "clustered_herds_by_state.geojson")
+cutout_png_path = os.path.join(project_dir, "herd_distribution_cutout_FINAL.png")
+cutout_svg_path = os.path.join(project_dir, "herd_distribution_cutout_FINAL.svg")
+cutout_dots_path = os.path.join(project_dir, "cutout_dots.geojson")
+texture_paths = {
+    "png": os.path.join(project_dir, "herd_distribution_texture.png"),
+    "tiff": os.path.join(project_dir, "herd_distribution_texture.tif"),
+}
+
+# Format of the files handed between stages: "geojson" (GeoJSON/CSV), "parquet" (GeoParquet) or "feather"
+intermediate_format = os.environ.get("DATALAMP_INTERMEDIATE_FORMAT", "geojson")
+
+# Files of Merged_Herd_Population written by mergeDatasets.py (redistribution.py), comma-separated: "intermediate"
+# (in intermediate_format) and "csv" (the whole table with the polygons as WKT, only if asked for)
+merged_population_formats = _env_list("DATALAMP_MERGED_POPULATION_FORMATS", "intermediate")
+
+# How the Excel sources are read: "cached" (streamed once, then read from cache_dir), "stream" or "pandas"
+excel_ingestion = os.environ.get("DATALAMP_EXCEL_INGESTION", "cached")
+
+# Stage cache of the pipeline runner
+cache_dir = os.environ.get("DATALAMP_CACHE_DIR", os.path.join(project_dir, ".datalamp_cache"))
+
+# Incremental re-runs of mergeHerdData.py and clusterStates_dots.py (incremental.py): "off" rebuilds
+# everything, "on" compares the herd tables with the last run and only redoes the changed herds, "verify" also does
+# the full rebuild and checks that both give the same result
+incremental = os.environ.get("DATALAMP_INCREMENTAL", "off")
+# Below this many herd dots clusterStates_dots.py merges them in full even in incremental mode: finding the
+# neighbourhoods costs more than merging a few hundred dots (benchmarks/bench_incremental.py)
+incremental_min_dots = 300
+
+# Sampled points and herd dots of clusterStates.py and clusterStates_dots.py (pointStore.py): "memory" keeps them in
+# one structured NumPy array, "memmap" maps that array from a file in cache_dir/points
+point_store = os.environ.get("DATALAMP_POINT_STORE", "memory")
+
+# Timing log of all steps (instrumentation.py), one JSON object per line; cProfile stats go to profiles/ next to it
+run_log_path = os.environ.get("DATALAMP_RUN_LOG", os.path.join(project_dir, "datalamp_runs.jsonl"))
+
+# assignHerdStates.py and clusterStates_dots.py: herd centroids and dots outside every state polygon are given the
+# nearest state up to this distance (EPSG:3857 metres, stateAssign.py)
+state_snap_distance = 5000
+
+# clusterStates.py
+random_seed = 42
+hdbscan_min_cluster_size = 5
+hdbscan_min_samples = 3
+kmeans_fallback_clusters = 20
+# Points per state (pointSampling.py): "capped" (50-500), "proportional" to the population or spread over the "herds"
+point_density = os.environ.get("DATALAMP_POINT_DENSITY", "capped")
+points_per_animal = 2
+max_points_per_state = 200_000
+# Above this many points HDBSCAN clusters a random sample of them and the others take the label of their nearest
+# sampled point (clustering.py, "hdbscan_sample"); with "capped" every state is below it
+hdbscan_sample_size = 5000
+
+# clusterHerds.py
+herd_clusters_per_state = 10
+
+# clusterStates_dots.py
+initial_radius = 30  # keep small to preserve detail
+growth_step = 30
+merge_threshold = 1.10
+max_outer_iterations = 30
+
+# uvTexture.py: the cutout as a texture of texture_width pixels (the height follows the aspect of the states), rendered
+# in tiles of texture_tile_size pixels and streamed to the files of texture_formats, comma-separated: "png" and "tiff"
+# (textureTiles.py)
+texture_width = int(os.environ.get("DATALAMP_TEXTURE_WIDTH", "16384"))
+texture_tile_size = 256
+texture_formats = _env_list("DATALAMP_TEXTURE_FORMATS", "png")
+
+# Vector exports for the cutter (fabrication.py): "plain" writes the SVGs as drawn, "fabrication" simplified to
+# cut_tolerance_mm, snapped to cut_grid_mm and with holes below min_hole_diameter_mm merged ("merge") or dropped
+# ("drop"), at most max_holes holes (largest first, None = all); the state DXFs are always written this way
+vector_export = os.environ.get("DATALAMP_VECTOR_EXPORT", "plain")
+cut_tolerance_mm = 0.1
+cut_grid_mm = 0.01
+min_hole_diameter_mm = 0.5
+small_holes = "merge"
+max_holes = None
+
+# Overrides of single settings, e.g. DATALAMP_SETTINGS='{"growth_step": 40, "herd_area_layer": "BLM_National_HA"}'
+# Paths are derived from the folders above before this, so folders are moved with the DATALAMP_*_DIR variables
+_overrides = json.loads(os.environ.get("DATALAMP_SETTINGS") or "{}")
+_unknown = [name for name in _overrides if name.startswith("_") or name in ("json", "os") or name not in globals()]
+if _unknown:
+    raise ValueError(f"Unknown setting(s) in DATALAMP_SETTINGS: {', '.join(_unknown)}")
+globals().update(_overrides)
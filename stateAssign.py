@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+# Geometric state assignment of herd centroids and merged dots (assignHerdStates.py, clusterStates_dots.py)
+#   index = StateIndex(gdf_states)                       # state polygons, projected to EPSG:3857 like the herds
+#   states = index.assign(x, y, max_distance=5000)       # state code of every point, None outside all states
+#   reached = index.reach(x, y, radius)                  # number of states every dot overlaps
+# One STRtree over the state polygons and one bulk query for all points, instead of testing every point against every
+# state: the tree only hands the point-in-polygon test the one or two states whose box holds the point
+# The test is then one vectorized call with the prepared polygons first: STRtree.query(..., predicate=...) prepares
+# the points instead, which walks every vertex of the state for every point (20 s instead of 0.1 s for 50k points
+# against 20k-vertex states, benchmarks/bench_assign.py)
+# A point on a shared border intersects both states and gets the one its table names (prefer), else the first in
+# state order; a point outside every state gets the nearest state within max_distance (coastlines simplified more
+# than the herd areas), or none
+# The string keys of the tables (State, State Code, ADMIN_ST) are compared with the assignment by disagreements()
+
+# State codes of the state names, for boundary layers without a "stusab" column
+STATE_ABBREVIATIONS = {
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR", "California": "CA",
+    "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE", "Florida": "FL", "Georgia": "GA",
+    "Hawaii": "HI", "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA",
+    "Kansas": "KS", "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
+    "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN", "Mississippi": "MS", "Missouri": "MO",
+    "Montana": "MT", "Nebraska": "NE", "Nevada": "NV", "New Hampshire": "NH", "New Jersey": "NJ",
+    "New Mexico": "NM", "New York": "NY", "North Carolina": "NC", "North Dakota": "ND",
+    "Ohio": "OH", "Oklahoma": "OK", "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI",
+    "South Carolina": "SC", "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX", "Utah": "UT",
+    "Vermont": "VT", "Virginia": "VA", "Washington": "WA", "West Virginia": "WV",
+    "Wisconsin": "WI", "Wyoming": "WY"
+}
+
+# Outcomes of comparing a string key with the geometric state, in report order
+STATUSES = ["agrees", "other state", "outside", "unknown key"]
+
+
+def state_codes(states, name_column="name"):
+    """Two-letter code of every state of a boundary layer: its "stusab" column, or the codes of its names."""
+    if "stusab" in states.columns:
+        return states["stusab"].str.upper()
+    return states[name_column].map(STATE_ABBREVIATIONS)
+
+
+class StateIndex:
+    """STRtree over state polygons for bulk point-in-state queries, in the projected CRS of the points."""
+
+    def __init__(self, states, crs="EPSG:3857", name_column="name"):
+        if crs is not None and states.crs is not None:
+            states = states.to_crs(crs)
+        self.crs = states.crs
+        self.codes = state_codes(states, name_column).to_numpy(dtype=object)
+        self.names = states[name_column].to_numpy(dtype=object)
+        self.geometries = states.geometry.to_numpy()
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+        # Full names and codes (upper case) of the states, for string keys of either kind
+        self.keys = {}
+        for name, code in zip(self.names, self.codes):
+            if isinstance(code, str):
+                self.keys[str(name).upper()] = code
+                self.keys[code] = code
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def candidates(self, geometries):
+        """(geometry, state) position pairs whose bounding boxes intersect, from the tree."""
+        return self.tree.query(geometries)
+
+    def locate(self, x, y, max_distance=0.0, prefer=None):
+        """Position of the state of every point (-1 outside all states) and the number of states it lies in.
+
+        A point in several states (on a border) gets the state of its code in ``prefer`` if that is one of them
+        (e.g. the state key of the table), otherwise the first in state order.
+        """
+        points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        point_idx, state_idx = self.candidates(points)
+        inside = shapely.intersects(self.geometries[state_idx], points[point_idx])
+        point_idx, state_idx = point_idx[inside], state_idx[inside]
+        rank = state_idx.copy()
+        if prefer is not None:
+            preferred = np.asarray(prefer, dtype=object)[point_idx] == self.codes[state_idx]
+            rank[~preferred] += len(self)
+        position = np.full(len(points), -1, dtype=np.int64)
+        order = np.lexsort((rank, point_idx))
+        first = np.unique(point_idx[order], return_index=True)[1]
+        position[point_idx[order][first]] = state_idx[order][first]
+        matches = np.bincount(point_idx, minlength=len(points))
+
+        outside = np.flatnonzero(position < 0)
+        if max_distance and len(outside):
+            near_idx, near_state = self.tree.query_nearest(points[outside], max_distance=max_distance,
+                                                           all_matches=False)
+            position[outside[near_idx]] = near_state
+        return position, matches
+
+    def assign(self, x, y, max_distance=0.0, prefer=None):
+        """State code of every point, None outside all states (and farther than max_distance from them)."""
+        position, _ = self.locate(x, y, max_distance, prefer)
+        return np.where(position >= 0, self.codes[position], None)
+
+    def reach(self, x, y, radius):
+        """Number of states every dot (centre x, y and radius) overlaps, > 1 for dots across a state border."""
+        x, y, radius = (np.asarray(values, dtype=float) for values in (x, y, radius))
+        point_idx, state_idx = self.candidates(shapely.box(x - radius, y - radius, x + radius, y + radius))
+        reached = shapely.dwithin(self.geometries[state_idx], shapely.points(x[point_idx], y[point_idx]),
+                                  radius[point_idx])
+        return np.bincount(point_idx[reached], minlength=len(x))
+
+    def key_codes(self, keys):
+        """State codes of string keys (full names or codes, any case), NaN for keys that are not a state here."""
+        return pd.Series(keys, dtype=object).str.strip().str.upper().map(self.keys)
+
+
+def disagreements(index, keys, assigned):
+    """Status of every row: its string key against its geometric state code (STATUSES).
+
+    "other state" and "outside" are the rows whose key names a state of the index the point is not in
+    (or near); "unknown key" are keys that are no state of the index (missing, misspelt or excluded states).
+    """
+    key_codes = index.key_codes(keys).to_numpy(dtype=object)
+    assigned = np.asarray(assigned, dtype=object)
+    status = np.where(pd.isna(key_codes), "unknown key",
+                      np.where(pd.isna(assigned), "outside",
+                               np.where(key_codes == assigned, "agrees", "other state")))
+    return pd.Categorical(status, categories=STATUSES)
@@ -1,84 +1,199 @@
 import geopandas as gpd
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
+import argparse
+import hashlib
+import json
+import time
+import shapely
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import settings
+from cutoutRender import CutoutRenderer, Style, aspect_for
+from fabrication import FabricationExport, describe, export_svg
+from geoio import intermediate_path, read_intermediate, write_intermediate
+from instrumentation import enable_profiling, step
+from stateAssign import state_codes
 
 # Paths to datasets
-geojson_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\US States\us-state-boundaries.geojson"
-population_data_path = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\Final_Cleaned_Population_Data.csv"
-output_folder = r"D:\Users\Happi\Documents\BCC\Bachelor Thesis\DataLamp\States_Separated"
-
-# Ensure the output directory exists
-os.makedirs(output_folder, exist_ok=True)
-
-# State name to abbreviation mapping
-state_abbreviations = {
-    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR", "California": "CA",
-    "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE", "Florida": "FL", "Georgia": "GA",
-    "Hawaii": "HI", "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA",
-    "Kansas": "KS", "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
-    "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN", "Mississippi": "MS", "Missouri": "MO",
-    "Montana": "MT", "Nebraska": "NE", "Nevada": "NV", "New Hampshire": "NH", "New Jersey": "NJ",
-    "New Mexico": "NM", "New York": "NY", "North Carolina": "NC", "North Dakota": "ND",
-    "Ohio": "OH", "Oklahoma": "OK", "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI",
-    "South Carolina": "SC", "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX", "Utah": "UT",
-    "Vermont": "VT", "Virginia": "VA", "Washington": "WA", "West Virginia": "WV",
-    "Wisconsin": "WI", "Wyoming": "WY"
-}
-
-# Load US state boundaries
-df_states = gpd.read_file(geojson_path)
-print(f"✅ Loaded {len(df_states)} states from GeoJSON.")
-
-# Load population data
-df_population = pd.read_csv(population_data_path)
-print(f"✅ Loaded population data for {len(df_population)} states.")
-
-# Convert full state names to abbreviations
-df_states["State_Abbrev"] = df_states["name"].map(state_abbreviations)
-
-# Keep only the 10 states that have wild horse & burro populations
-relevant_states = df_population["State"].unique()
-df_states = df_states[df_states["State_Abbrev"].isin(relevant_states)]
-print(f"✅ Filtered to {len(df_states)} relevant states.")
-
-# Rename to match population dataset
-df_states = df_states.rename(columns={"State_Abbrev": "State"})
-df_merged = df_states.merge(df_population, on="State", how="left")
-print(f"✅ Merged dataset now has {len(df_merged)} states.")
-
-# Ensure all geometries are valid before exporting
-df_merged = df_merged[df_merged["geometry"].notnull() & ~df_merged["geometry"].is_empty]
-
-# Save each state separately
-if len(df_merged) == 0:
-    print("⚠️ No valid states to save. Check dataset filtering.")
-else:
-    for _, row in df_merged.iterrows():
-        state_name = row["State"]
-        state_gdf = gpd.GeoDataFrame([row], crs=df_merged.crs)
-
-        # Define file paths
-        geojson_path = os.path.join(output_folder, f"{state_name}.geojson")
-        dxf_path = os.path.join(output_folder, f"{state_name}.dxf")
-        svg_path = os.path.join(output_folder, f"{state_name}.svg")
-
-        # Save each state separately
-        state_gdf.to_file(geojson_path, driver="GeoJSON")
-
-        # **Fix DXF Export: Convert geometries before saving**
-        try:
-            state_gdf[["geometry"]].to_file(dxf_path, driver="DXF")
-            print(f"✅ Saved DXF: {dxf_path}")
-        except Exception as e:
-            print(f"⚠️ Could not save DXF for {state_name}: {e}")
-
-        # **Fix SVG Export Using Matplotlib Instead**
-        fig, ax = plt.subplots(figsize=(5, 5))
-        state_gdf.boundary.plot(ax=ax, edgecolor="black")
-        ax.set_axis_off()  # Remove background axes
-        plt.savefig(svg_path, format="svg", bbox_inches="tight")  # Save as SVG
-        plt.close(fig)  # Close figure to free memory
-        print(f"✅ Saved SVG: {svg_path}")
-
-print(f"✅ All relevant states saved separately in: {output_folder}")
+geojson_path = settings.us_states_path
+population_data_path = settings.cleaned_population_csv_path
+output_folder = settings.states_separated_dir
+
+# Content hashes of the exported states, a state is only written again when its hash changed
+manifest_path = os.path.join(output_folder, "export_manifest.json")
+
+# Code and settings every exported file depends on, part of each state's hash
+export_modules = ["stateBoundaries.py", "stateAssign.py", "cutoutRender.py", "fabrication.py", "clustering.py",
+                  "geoio.py"]
+export_settings = ["intermediate_format", "vector_export", "cut_tolerance_mm", "cut_grid_mm", "min_hole_diameter_mm",
+                   "small_holes", "max_holes"]
+
+# Outline style of the state SVGs (matplotlib's default line width), shared by all states
+state_outline = Style("black", 1.5)
+
+# Files written for one state
+def state_outputs(state_name):
+    geojson_path = os.path.join(output_folder, f"{state_name}.geojson")
+    paths = [geojson_path, os.path.join(output_folder, f"{state_name}.dxf"),
+             os.path.join(output_folder, f"{state_name}.svg")]
+    if settings.intermediate_format != "geojson":
+        paths.append(intermediate_path(geojson_path))
+    return paths
+
+
+def export_fingerprint():
+    """Hash of the export code and settings, shared by all states."""
+    digest = hashlib.sha256()
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in export_modules:
+        with open(os.path.join(repo_dir, module), "rb") as f:
+            digest.update(f.read())
+    digest.update(json.dumps({name: getattr(settings, name) for name in export_settings}, sort_keys=True,
+                             default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def state_hash(state_gdf, fingerprint):
+    """Hash of a state's geometry (WKB), its population columns and the export fingerprint."""
+    digest = hashlib.sha256(fingerprint.encode("ascii"))
+    for wkb in shapely.to_wkb(state_gdf.geometry.values, hex=False):
+        digest.update(wkb)
+    digest.update(state_gdf.drop(columns=state_gdf.geometry.name).to_json(orient="records").encode("utf-8"))
+    digest.update(str(state_gdf.crs).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_manifest():
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest):
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+# Writes the GeoJSON, DXF and SVG of one state, returns (state, DXF report, seconds)
+def export_state(state_name, state_gdf):
+    start = time.perf_counter()
+    geojson_path, dxf_path, svg_path = state_outputs(state_name)[:3]
+
+    # Save each state separately (GeoJSON is always written as export, plus the columnar file for clusterStates.py)
+    state_gdf.to_file(geojson_path, driver="GeoJSON")
+    if settings.intermediate_format != "geojson":
+        write_intermediate(state_gdf, geojson_path)
+
+    # Outline drawn straight from the geometry (cutoutRender.py), no matplotlib figure per state
+    renderer = CutoutRenderer(5, 5, aspect=aspect_for(state_gdf)).add_paths(state_gdf.geometry, state_outline)
+
+    # **DXF Export** in mm at the size of the SVG, simplified for the cutter (fabrication.py)
+    report = FabricationExport(renderer).to_dxf(dxf_path)
+
+    # **SVG Export** (plain, or for the cutter with settings.vector_export = "fabrication")
+    export_svg(renderer, svg_path)
+    return state_name, report, time.perf_counter() - start
+
+
+def export_states(state_gdfs, workers=1):
+    """Exports the states of a {state: GeoDataFrame} dict, in worker processes if workers > 1.
+
+    Returns the names of the states that were written; a failed state is reported and left out.
+    """
+    def done(state_name, report, seconds):
+        print(f"✅ Saved {state_name}: GeoJSON, DXF ({describe(report)}), SVG in {seconds:.2f} s")
+        exported.append(state_name)
+
+    exported = []
+    if workers > 1 and len(state_gdfs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(state_gdfs))) as executor:
+            futures = {executor.submit(export_state, state_name, state_gdf): state_name
+                       for state_name, state_gdf in state_gdfs.items()}
+            for future in as_completed(futures):
+                try:
+                    done(*future.result())
+                except Exception as e:
+                    print(f"⚠️ Export failed for {futures[future]}: {e}")
+    else:
+        for state_name, state_gdf in state_gdfs.items():
+            try:
+                done(*export_state(state_name, state_gdf))
+            except Exception as e:
+                print(f"⚠️ Export failed for {state_name}: {e}")
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the US state boundaries into one file set per state.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (states are independent, 1 = serial)")
+    parser.add_argument("--force", action="store_true",
+                        help="export every state, also those unchanged since the last export")
+    parser.add_argument("--profile", action="store_true",
+                        help="run every step under cProfile (see instrumentation.py)")
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling()
+
+    # Ensure the output directory exists
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Load US state boundaries
+    with step("read state boundaries") as s:
+        df_states = gpd.read_file(geojson_path)
+        s.rows_out = len(df_states)
+    print(f"✅ Loaded {len(df_states)} states from GeoJSON.")
+
+    # Load population data
+    with step("read population data") as s:
+        df_population = read_intermediate(population_data_path)
+        s.rows_out = len(df_population)
+    print(f"✅ Loaded population data for {len(df_population)} states.")
+
+    # State codes of the boundaries ("stusab", or the full state names mapped to codes, stateAssign.py)
+    df_states["State_Abbrev"] = state_codes(df_states)
+
+    # Keep only the 10 states that have wild horse & burro populations
+    relevant_states = df_population["State"].unique()
+    df_states = df_states[df_states["State_Abbrev"].isin(relevant_states)]
+    print(f"✅ Filtered to {len(df_states)} relevant states.")
+
+    # Rename to match population dataset
+    df_states = df_states.rename(columns={"State_Abbrev": "State"})
+    df_merged = df_states.merge(df_population, on="State", how="left")
+    print(f"✅ Merged dataset now has {len(df_merged)} states.")
+
+    # Ensure all geometries are valid before exporting
+    df_merged = df_merged[df_merged["geometry"].notnull() & ~df_merged["geometry"].is_empty]
+
+    # Split into one GeoDataFrame per state (rows keep their dtypes, no iterrows)
+    state_gdfs = {state_name: state_gdf for state_name, state_gdf in df_merged.groupby("State", sort=True)}
+
+    # Save each state separately, skipping the states whose hash is in the manifest and whose files all exist
+    if len(state_gdfs) == 0:
+        print("⚠️ No valid states to save. Check dataset filtering.")
+        return
+    with step("export states", rows_in=len(state_gdfs)) as s:
+        fingerprint = export_fingerprint()
+        hashes = {state_name: state_hash(state_gdf, fingerprint) for state_name, state_gdf in state_gdfs.items()}
+        manifest = {} if args.force else load_manifest()
+        changed = {state_name: state_gdf for state_name, state_gdf in state_gdfs.items()
+                   if manifest.get(state_name) != hashes[state_name]
+                   or not all(os.path.exists(path) for path in state_outputs(state_name))}
+        print(f"✅ {len(changed)} of {len(state_gdfs)} states changed since the last export.")
+
+        for state_name in changed:
+            manifest.pop(state_name, None)
+        for state_name in export_states(changed, args.workers):
+            manifest[state_name] = hashes[state_name]
+        save_manifest(manifest)
+        s.rows_out = len(changed)
+        s.extra.update(workers=args.workers, skipped=len(state_gdfs) - len(changed))
+
+    print(f"✅ All relevant states saved separately in: {output_folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+
+from dotMerging import DotMerger, merge_and_grow_reference
+
+# DotMerger must give the dots of the original GeoDataFrame loop bit for bit, also when a run is resumed
+# (benchmarks/bench_merge.py checks the same on large inputs, with timings)
+
+MAX_ITERATIONS = 30
+
+
+def make_dots(n=300, seed=0):
+    """Herd dots in EPSG:3857 metres with their population as count, spread so they merge over several iterations."""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-12.5e6, -12.47e6, n)
+    y = rng.uniform(4.0e6, 4.03e6, n)
+    gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y), crs="EPSG:3857")
+    gdf["count"] = np.round(rng.lognormal(1.5, 1.0, n))
+    gdf["radius"] = 30
+    return gdf
+
+
+def assert_same(result, reference):
+    if isinstance(result, DotMerger):
+        result = result.to_geodataframe()
+    assert len(result) == len(reference)
+    assert np.array_equal(result.geometry.x.values, reference.geometry.x.values)
+    assert np.array_equal(result.geometry.y.values, reference.geometry.y.values)
+    assert np.array_equal(result["count"].values, reference["count"].values)
+    assert np.array_equal(result["radius"].values, reference["radius"].values)
+
+
+@pytest.mark.parametrize("threshold, growth_step, seed", [(1.10, 30, 0), (1.0, 100, 1), (1.25, 300, 2)])
+def test_run_matches_reference(threshold, growth_step, seed):
+    gdf = make_dots(seed=seed)
+    merger = DotMerger.from_geodataframe(gdf, threshold, growth_step).run(MAX_ITERATIONS, verbose=False)
+    assert_same(merger, merge_and_grow_reference(gdf, threshold, growth_step, MAX_ITERATIONS))
+    assert merger.merge_passes > 0 and len(merger) < len(gdf)
+
+
+@pytest.mark.parametrize("stop", [0, 1, 2])
+def test_resumed_run_matches_reference(stop):
+    # A merger that stopped after `stop` iterations continues from outer_iterations, like one rebuilt from a snapshot
+    gdf = make_dots(seed=3)
+    merger = DotMerger.from_geodataframe(gdf).run(stop, verbose=False)
+    assert merger.outer_iterations == stop
+    if stop:
+        assert_same(merger, merge_and_grow_reference(gdf, max_outer_iterations=stop))
+    merger.run(MAX_ITERATIONS, verbose=False)
+    assert_same(merger, merge_and_grow_reference(gdf, max_outer_iterations=MAX_ITERATIONS))
+    fresh = DotMerger.from_geodataframe(gdf).run(MAX_ITERATIONS, verbose=False)
+    for name in ("outer_iterations", "merge_passes", "converged"):
+        assert getattr(merger, name) == getattr(fresh, name), name
+    assert np.array_equal(merger.labels, fresh.labels)
+
+
+def test_callback_after_every_growth_iteration():
+    gdf = make_dots(seed=4)
+    states = []
+    merger = DotMerger.from_geodataframe(gdf)
+    merger.run(MAX_ITERATIONS, verbose=False,
+               callback=lambda m: states.append((m.outer_iterations, m.to_geodataframe())))
+    assert [iterations for iterations, _ in states] == list(range(1, merger.outer_iterations + 1))
+    for iterations, state in states:
+        assert_same(state, merge_and_grow_reference(gdf, max_outer_iterations=iterations))
+    assert_same(merger, states[-1][1])
+
+
+def test_resume_after_convergence_does_nothing():
+    gdf = make_dots(n=200, seed=5)
+    merger = DotMerger.from_geodataframe(gdf, growth_step=300).run(100, verbose=False)
+    assert merger.converged
+    calls = []
+    iterations, passes = merger.outer_iterations, merger.merge_passes
+    merger.run(merger.outer_iterations, verbose=False, callback=calls.append)
+    assert not calls and (merger.outer_iterations, merger.merge_passes) == (iterations, passes)
+    assert_same(merger, merge_and_grow_reference(gdf, growth_step=300, max_outer_iterations=100))
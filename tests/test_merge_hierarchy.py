@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import mergeHierarchy
+from dotMerging import DotMerger
+from mergeHierarchy import MergeHierarchy, hierarchy_path
+
+# Cuts through the merge hierarchy must be the DotMerger state after run(max_outer_iterations), bit for bit
+# (benchmarks/bench_hierarchy.py checks the same on a large grid of parameters)
+
+ITERATIONS = [0, 1, 2, 3, 5, 8, 30]
+
+
+def make_dots(n=400, seed=0):
+    """Herd dots in EPSG:3857 metres, close enough that most of them merge over several growth iterations."""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-12.5e6, -12.47e6, n)
+    y = rng.uniform(4.0e6, 4.03e6, n)
+    count = np.round(rng.lognormal(1.5, 1.0, n)) + 1
+    radius = np.sqrt(count) * 200
+    return x, y, count, radius
+
+
+def assert_same(merger, cut):
+    for name in ("x", "y", "count", "radius", "labels"):
+        assert np.array_equal(getattr(merger, name), getattr(cut, name)), name
+        assert getattr(merger, name).dtype == getattr(cut, name).dtype, name
+    for name in ("outer_iterations", "merge_passes", "converged"):
+        assert getattr(merger, name) == getattr(cut, name), name
+
+
+@pytest.mark.parametrize("threshold, growth_step", [(1.0, 30), (1.10, 100), (1.25, 300)])
+def test_cut_matches_run(threshold, growth_step):
+    dots = make_dots()
+    hierarchy = MergeHierarchy(*dots, threshold=threshold, growth_step=growth_step).extend(max(ITERATIONS))
+    for iterations in ITERATIONS:
+        merger = DotMerger(*dots, threshold=threshold, growth_step=growth_step).run(iterations, verbose=False)
+        assert_same(merger, hierarchy.cut(iterations))
+    assert hierarchy.levels > 1 and len(hierarchy.x[-1]) < len(dots[0])
+
+
+def test_cut_resumes_the_run():
+    dots = make_dots(seed=1)
+    hierarchy = MergeHierarchy(*dots).extend(1)
+    for iterations in ITERATIONS:
+        assert_same(DotMerger(*dots).run(iterations, verbose=False), hierarchy.cut(iterations))
+
+
+def test_saved_hierarchy(tmp_path):
+    dots = make_dots(seed=2)
+    built, status = MergeHierarchy.load_or_build(*dots, max_outer_iterations=5, folder=str(tmp_path))
+    assert status == "built"
+    loaded, status = MergeHierarchy.load_or_build(*dots, max_outer_iterations=5, folder=str(tmp_path))
+    assert status == "loaded" or built.converged
+    for iterations in ITERATIONS:
+        assert_same(DotMerger(*dots).run(iterations, verbose=False), loaded.cut(iterations))
+
+
+def test_cache_key_includes_merge_source(monkeypatch):
+    dots = make_dots()
+    path = hierarchy_path(*dots, 1.10, 30)
+    assert path == hierarchy_path(*dots, 1.10, 30)
+    assert path != hierarchy_path(*dots, 1.10, 31)
+    monkeypatch.setattr(mergeHierarchy, "source_hash", lambda: "changed merge code")
+    assert path != hierarchy_path(*dots, 1.10, 30)
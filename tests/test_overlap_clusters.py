@@ -0,0 +1,83 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+
+from dotMerging import clusters_from_pairs, find_overlap_pairs, get_overlap_clusters, get_overlap_clusters_bfs
+
+# The KD-tree overlap detection must give the clusters of the original BFS version, in the same order
+# (benchmarks/bench_overlap.py checks the same on large inputs, with timings)
+
+
+def make_dots(n=120, seed=0):
+    """Random dots in EPSG:3857 metres, dense enough that there are clusters of several dots."""
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(n) * 150
+    gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(rng.uniform(0, side, n), rng.uniform(0, side, n)),
+                           crs="EPSG:3857")
+    gdf["radius"] = rng.choice([30, 60, 90, 200], size=n, p=[0.6, 0.2, 0.15, 0.05])
+    return gdf
+
+
+def make_ties(radius):
+    """Chains of dots 100 m apart (3-4-5 triangles, so the distances are exact) and one pair that always overlaps."""
+    x = [0, 60, 120, 180, 1000, 1060, 5000, 5003]
+    y = [0, 80, 160, 240, 1000, 1080, 5000, 5004]
+    gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y), crs="EPSG:3857")
+    gdf["radius"] = float(radius)
+    return gdf
+
+
+def coords_and_radii(gdf):
+    return np.column_stack((gdf.geometry.x.values, gdf.geometry.y.values)), gdf["radius"].values
+
+
+@pytest.mark.parametrize("n, seed", [(1, 0), (2, 1), (30, 2), (80, 3), (120, 4)])
+@pytest.mark.parametrize("threshold", [1.0, 1.10, 1.25])
+def test_clusters_match_bfs(n, seed, threshold):
+    gdf = make_dots(n, seed)
+    assert get_overlap_clusters(gdf, threshold) == get_overlap_clusters_bfs(gdf, threshold)
+
+
+@pytest.mark.parametrize("threshold, radius", [(1.0, 50), (1.25, 40), (0.5, 100)])
+def test_exact_threshold_ties(threshold, radius):
+    # (r1 + r2) * threshold is exactly 100 m: a distance of exactly 100 m is not an overlap, a slightly larger radius is
+    gdf = make_ties(radius)
+    clusters = get_overlap_clusters(gdf, threshold)
+    assert clusters == get_overlap_clusters_bfs(gdf, threshold)
+    assert len(clusters) == len(gdf) - 1
+
+    gdf["radius"] = radius + 1e-6
+    clusters = get_overlap_clusters(gdf, threshold)
+    assert clusters == get_overlap_clusters_bfs(gdf, threshold)
+    assert len(clusters) == 3
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_dirty_mask(seed):
+    gdf = make_dots(150, seed)
+    coords, radii = coords_and_radii(gdf)
+    i_all, j_all = find_overlap_pairs(coords, radii, 1.10)
+    dirty = np.random.default_rng(seed).random(len(gdf)) < 0.3
+
+    # Exactly the overlapping pairs with at least one dirty dot, each once and as (smaller, larger) index
+    i_idx, j_idx = find_overlap_pairs(coords, radii, 1.10, dirty=dirty)
+    pairs = list(zip(i_idx.tolist(), j_idx.tolist()))
+    assert len(pairs) == len(set(pairs)) and all(i < j for i, j in pairs)
+    assert set(pairs) == {(i, j) for i, j in zip(i_all.tolist(), j_all.tolist()) if dirty[i] or dirty[j]}
+
+    # With every dot dirty the mask changes nothing; with none there is nothing to check
+    all_dirty = find_overlap_pairs(coords, radii, 1.10, dirty=np.ones(len(gdf), dtype=bool))
+    assert set(zip(*map(np.ndarray.tolist, all_dirty))) == set(zip(i_all.tolist(), j_all.tolist()))
+    assert len(find_overlap_pairs(coords, radii, 1.10, dirty=np.zeros(len(gdf), dtype=bool))[0]) == 0
+
+
+def test_dirty_pairs_give_bfs_clusters():
+    # If the clean dots do not overlap each other (as in DotMerger), the dirty pairs are all the pairs there are
+    gdf = make_dots(150, 5)
+    coords, radii = coords_and_radii(gdf)
+    i_all, j_all = find_overlap_pairs(coords, radii, 1.10)
+    dirty = np.zeros(len(gdf), dtype=bool)
+    dirty[np.concatenate((i_all, j_all))] = True
+    dirty[::7] = True
+    i_idx, j_idx = find_overlap_pairs(coords, radii, 1.10, dirty=dirty)
+    assert clusters_from_pairs(len(gdf), i_idx, j_idx) == get_overlap_clusters_bfs(gdf, 1.10)
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+import datalamp
+import pipeline
+
+# Every repository module a stage script imports is part of the stage's code, so editing it invalidates the cached
+# outputs of the stage (pipeline.py)
+
+
+def is_local(module):
+    return os.path.exists(os.path.join(pipeline.repo_dir, module.split(".")[0] + ".py"))
+
+
+@pytest.mark.parametrize("stage", pipeline.STAGES, ids=lambda stage: stage.name)
+def test_stage_modules_cover_script_imports(stage):
+    for module in datalamp.script_imports(stage.script):
+        if is_local(module):
+            assert module.split(".")[0] + ".py" in stage.modules, module
+
+
+@pytest.mark.parametrize("stage", pipeline.STAGES, ids=lambda stage: stage.name)
+def test_stage_modules_are_closed_under_imports(stage):
+    # The helper modules' own imports (e.g. herdAreas.py -> centroids.py) belong to the stage as well
+    for file_name in stage.modules:
+        for module in pipeline.imported_modules(os.path.join(pipeline.repo_dir, file_name)):
+            if is_local(module) and module.split(".")[0] + ".py" != stage.script:
+                assert module.split(".")[0] + ".py" in stage.modules, f"{file_name} imports {module}"
+
+
+def test_herd_area_stages_include_centroids():
+    stages = {stage.name: stage for stage in pipeline.STAGES}
+    for name in ("gdb_reader", "mergeHerdData", "clusterHerds"):
+        assert "centroids.py" in stages[name].modules
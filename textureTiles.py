@@ -0,0 +1,364 @@
+import struct
+import time
+import zlib
+
+import numpy as np
+import shapely
+
+from cutoutRender import color_groups, dash_pieces
+
+# High-resolution UV textures of a cutout (uvTexture.py), at 16k-32k pixels and more
+#   stats = write_texture(renderer, {"png": "texture.png", "tiff": "texture.tif"}, width=16384)
+# The layers of a CutoutRenderer (outlines, fills and dots) are rasterized tile by tile into one fixed-size float
+# buffer, with analytic anti-aliasing (the coverage of a pixel falls off over one pixel at the edges of lines and
+# dots), and every finished tile is streamed to disk:
+# - PNG: the rows of one band of tiles are filtered and zlib-compressed into IDAT chunks as soon as the band is done,
+#   so only one band (tile rows x width) is ever in memory
+# - TIFF: every tile is Deflate-compressed into a tiled TIFF as soon as it is done, only one tile is in memory
+# Nothing is ever allocated for the whole image, the peak memory does not grow with the height (PNG) or at all (TIFF)
+# Lines and dots of one layer with the same color are drawn as their union (a pixel covered by two dots of a
+# translucent layer is not blended twice), the title of the renderer is not drawn on a texture
+
+TILE_SIZE = 256
+TEXTURE_FORMATS = ("png", "tiff")
+
+# Bytes of compressed PNG data per IDAT chunk
+PNG_CHUNK_SIZE = 1 << 20
+
+
+def _deflate(level):
+    """zlib compressor for the pixel data: the textures are long runs of one color, Z_RLE compresses them about three
+    times faster than the default strategy and a little smaller (it is still plain Deflate for every reader)."""
+    return zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 8, zlib.Z_RLE)
+
+
+class PngWriter:
+    """8-bit RGB PNG written band by band: write_rows() compresses the rows at once, nothing is kept."""
+
+    def __init__(self, path, width, height, level=6):
+        self.file = open(path, "wb")
+        self.width, self.height = width, height
+        self.rows_written = 0
+        self._compressor = _deflate(level)
+        self._pending = []
+        self._pending_size = 0
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack(">I", len(data)) + kind + data
+                        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def _emit(self, data, final=False):
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= PNG_CHUNK_SIZE or (final and self._pending):
+            self._chunk(b"IDAT", b"".join(self._pending))
+            self._pending, self._pending_size = [], 0
+
+    def write_rows(self, rows):
+        """Appends (n, width, 3) uint8 rows; every row gets filter type 0 (none)."""
+        n = len(rows)
+        scanlines = np.zeros((n, 1 + self.width * 3), dtype=np.uint8)
+        scanlines[:, 1:] = rows.reshape(n, -1)
+        self._emit(self._compressor.compress(scanlines.tobytes()))
+        self.rows_written += n
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG has {self.height} rows, {self.rows_written} were written")
+        self._emit(self._compressor.flush(), final=True)
+        self._chunk(b"IEND", b"")
+        self.file.close()
+
+
+class TiffWriter:
+    """8-bit RGB tiled TIFF (Deflate) written tile by tile, in row-major tile order; the directory goes last."""
+
+    # TIFF field types
+    SHORT, LONG = 3, 4
+
+    def __init__(self, path, width, height, tile=TILE_SIZE, level=6):
+        if tile % 16:
+            raise ValueError("TIFF tiles must be a multiple of 16 pixels")
+        self.file = open(path, "wb")
+        self.width, self.height, self.tile = width, height, tile
+        self.level = level
+        self.offsets, self.byte_counts = [], []
+        self._padded = np.zeros((tile, tile, 3), dtype=np.uint8)
+        self.file.write(b"II*\x00" + struct.pack("<I", 0))  # the directory offset is filled in by close()
+
+    def write_tile(self, pixels):
+        """Appends the next (h, w, 3) uint8 tile; tiles at the right and bottom edges are padded with black."""
+        h, w = pixels.shape[:2]
+        if (h, w) != (self.tile, self.tile):
+            self._padded[:] = 0
+            self._padded[:h, :w] = pixels
+            pixels = self._padded
+        compressor = _deflate(self.level)
+        data = compressor.compress(np.ascontiguousarray(pixels).tobytes()) + compressor.flush()
+        self.offsets.append(self.file.tell())
+        self.byte_counts.append(len(data))
+        self.file.write(data + b"\x00" * (len(data) % 2))  # word-aligned
+
+    def close(self):
+        tiles = -(-self.width // self.tile) * -(-self.height // self.tile)
+        if len(self.offsets) != tiles:
+            raise ValueError(f"TIFF has {tiles} tiles, {len(self.offsets)} were written")
+
+        # Values that do not fit into an entry go after the directory
+        entries = [(256, self.LONG, [self.width]), (257, self.LONG, [self.height]), (258, self.SHORT, [8, 8, 8]),
+                   (259, self.SHORT, [8]), (262, self.SHORT, [2]), (277, self.SHORT, [3]), (284, self.SHORT, [1]),
+                   (322, self.LONG, [self.tile]), (323, self.LONG, [self.tile]),
+                   (324, self.LONG, self.offsets), (325, self.LONG, self.byte_counts)]
+        directory = self.file.tell()
+        extra = directory + 2 + 12 * len(entries) + 4
+        if extra + 4 * 2 * tiles + 8 >= 1 << 32:
+            raise ValueError("The texture is too large for a TIFF (over 4 GB compressed), use PNG or larger tiles")
+        table, values = [], []
+        for tag, kind, items in entries:
+            packed = struct.pack(f"<{len(items)}{'H' if kind == self.SHORT else 'I'}", *items)
+            if len(packed) <= 4:
+                table.append(struct.pack("<HHI", tag, kind, len(items)) + packed.ljust(4, b"\x00"))
+            else:
+                table.append(struct.pack("<HHII", tag, kind, len(items), extra))
+                values.append(packed)
+                extra += len(packed)
+        self.file.write(struct.pack("<H", len(entries)) + b"".join(table) + struct.pack("<I", 0) + b"".join(values))
+        self.file.seek(4)
+        self.file.write(struct.pack("<I", directory))
+        self.file.close()
+
+
+def _coverage_line(px, py, ax, ay, bx, by, half_width):
+    """Coverage of the pixels at px/py by a line from a to b with the given half width (anti-aliased edges)."""
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = ((px - ax) * dx + (py - ay) * dy) / length2 if length2 > 0 else np.zeros_like(px)
+    t = np.clip(t, 0, 1)
+    distance = np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+    return np.clip(half_width + 0.5 - distance, 0, 1)
+
+
+class TextureRaster:
+    """The layers of a CutoutRenderer in pixels of a texture ``width`` pixels wide, rendered one tile at a time."""
+
+    def __init__(self, renderer, width, tile=TILE_SIZE):
+        from matplotlib.colors import to_rgb
+
+        # The layout is linear in the units per inch, so the one for the requested width follows from one inch
+        _, inch_width, _ = renderer.layout(1, title=False)
+        self.units_per_inch = width / inch_width
+        transform, _, height = renderer.layout(self.units_per_inch, title=False)
+        self.width, self.height, self.tile = int(width), max(1, round(height)), tile
+        self.background = np.array(to_rgb(renderer.background) if renderer.background is not None else (1, 1, 1),
+                                   dtype=np.float32)
+        px_per_pt = self.units_per_inch / 72
+
+        # Every layer as (kind, color, alpha, geometry arrays in pixels, with their bounding boxes)
+        self.items = []
+        for layer in renderer.layers:
+            style = layer.style
+            half_width = max(0.5, style.stroke_width * px_per_pt / 2)
+            if layer.kind == "paths":
+                if style.fill is not None:
+                    polygons = shapely.transform(layer.geometries, lambda c: np.column_stack(transform(*c.T)))
+                    polygons = polygons[np.isin(shapely.get_type_id(polygons), (3, 6))]
+                    if len(polygons):
+                        shapely.prepare(polygons)
+                        self.items.append(("fill", to_rgb(style.fill), style.alpha, polygons,
+                                           shapely.bounds(polygons)))
+                if style.stroke is None:
+                    continue
+                segments = []
+                for coords, _ in layer.data:
+                    points = np.column_stack(transform(coords[:, 0], coords[:, 1]))
+                    pieces = (dash_pieces(points, style.dash[0] * px_per_pt, style.dash[1] * px_per_pt)
+                              if style.dash else [points])
+                    segments.extend(np.hstack((piece[:-1], piece[1:])) for piece in pieces if len(piece) > 1)
+                if segments:
+                    segments = np.concatenate(segments)
+                    bounds = np.column_stack((np.minimum(segments[:, 0], segments[:, 2]) - half_width - 1,
+                                              np.minimum(segments[:, 1], segments[:, 3]) - half_width - 1,
+                                              np.maximum(segments[:, 0], segments[:, 2]) + half_width + 1,
+                                              np.maximum(segments[:, 1], segments[:, 3]) + half_width + 1))
+                    self.items.append(("lines", to_rgb(style.stroke), style.alpha, (segments, half_width), bounds))
+            else:
+                x, y, radius = layer.data
+                px, py = transform(x, y)
+                r = radius * px_per_pt
+                stroke_half = half_width if style.stroke is not None else 0.0
+                for color, index in color_groups(layer.colors, len(px)):
+                    index = np.asarray(index, dtype=np.intp)
+                    fill = color if color is not None else style.fill
+                    reach = r[index] + stroke_half + 1
+                    bounds = np.column_stack((px[index] - reach, py[index] - reach,
+                                              px[index] + reach, py[index] + reach))
+                    dots = (px[index], py[index], r[index], stroke_half)
+                    self.items.append(("dots", (None if fill is None else to_rgb(fill),
+                                                None if style.stroke is None else to_rgb(style.stroke)),
+                                       style.alpha, dots, bounds))
+
+    def __len__(self):
+        return -(-self.width // self.tile) * -(-self.height // self.tile)
+
+    def band(self, y0, y1):
+        """The items with something between the pixel rows y0 and y1, cut down to those parts."""
+        band = []
+        for kind, color, alpha, data, bounds in self.items:
+            keep = (bounds[:, 3] >= y0) & (bounds[:, 1] <= y1)
+            if not keep.any():
+                continue
+            if kind == "lines":
+                data = (data[0][keep], data[1])
+            elif kind == "dots":
+                data = (data[0][keep], data[1][keep], data[2][keep], data[3])
+            else:
+                data = data[keep]
+            band.append((kind, color, alpha, data, bounds[keep]))
+        return band
+
+    def render_tile(self, items, x0, y0, out):
+        """Draws the items (of band()) onto ``out``, the (h, w, 3) float32 tile at pixel x0/y0, set to background."""
+        h, w = out.shape[:2]
+        out[:] = self.background
+        for kind, color, alpha, data, bounds in items:
+            inside = np.flatnonzero((bounds[:, 2] >= x0) & (bounds[:, 0] <= x0 + w)
+                                    & (bounds[:, 3] >= y0) & (bounds[:, 1] <= y0 + h))
+            if not len(inside):
+                continue
+            if kind == "fill":
+                # 2 x 2 samples per pixel
+                coverage = np.zeros((h, w), dtype=np.float32)
+                for sx, sy in ((0.25, 0.25), (0.75, 0.25), (0.25, 0.75), (0.75, 0.75)):
+                    gx, gy = np.meshgrid(x0 + sx + np.arange(w), y0 + sy + np.arange(h))
+                    hit = np.zeros((h, w), dtype=bool)
+                    for polygon in data[inside]:
+                        hit |= shapely.contains_xy(polygon, gx, gy)
+                    coverage += hit * np.float32(0.25)
+                _composite(out, coverage, color, alpha)
+            elif kind == "lines":
+                segments, half_width = data
+                coverage = np.zeros((h, w), dtype=np.float32)
+                touched = _Extent()
+                for k in inside:
+                    window = _window(bounds[k], x0, y0, w, h)
+                    if window is None:
+                        continue
+                    rows, cols, py, px = window
+                    ax, ay, bx, by = segments[k]
+                    np.maximum(coverage[rows, cols], _coverage_line(px, py, ax, ay, bx, by, half_width),
+                               out=coverage[rows, cols])
+                    touched.add(rows, cols)
+                if touched:
+                    _composite(out[touched.slices], coverage[touched.slices], color, alpha)
+            else:
+                cx, cy, r, stroke_half = data
+                fill_color, stroke_color = color
+                fill = np.zeros((h, w), dtype=np.float32) if fill_color is not None else None
+                stroke = np.zeros((h, w), dtype=np.float32) if stroke_color is not None else None
+                touched = _Extent()
+                for k in inside:
+                    window = _window(bounds[k], x0, y0, w, h)
+                    if window is None:
+                        continue
+                    rows, cols, py, px = window
+                    distance = np.hypot(px - cx[k], py - cy[k])
+                    if fill is not None:
+                        np.maximum(fill[rows, cols], np.clip(r[k] + 0.5 - distance, 0, 1), out=fill[rows, cols])
+                    if stroke is not None:
+                        np.maximum(stroke[rows, cols], np.clip(stroke_half + 0.5 - np.abs(distance - r[k]), 0, 1),
+                                   out=stroke[rows, cols])
+                    touched.add(rows, cols)
+                if touched and fill is not None:
+                    _composite(out[touched.slices], fill[touched.slices], fill_color, alpha)
+                if touched and stroke is not None:
+                    _composite(out[touched.slices], stroke[touched.slices], stroke_color, alpha)
+        return out
+
+
+def _window(box, x0, y0, w, h):
+    """Slices of a tile covered by a bounding box in pixels, and the pixel centres there (None if outside)."""
+    c0, c1 = max(0, int(box[0]) - x0), min(w, int(np.ceil(box[2])) - x0 + 1)
+    r0, r1 = max(0, int(box[1]) - y0), min(h, int(np.ceil(box[3])) - y0 + 1)
+    if c0 >= c1 or r0 >= r1:
+        return None
+    px = (x0 + c0 + 0.5 + np.arange(c1 - c0))[None, :]
+    py = (y0 + r0 + 0.5 + np.arange(r1 - r0))[:, None]
+    return slice(r0, r1), slice(c0, c1), py, px
+
+
+class _Extent:
+    """Smallest rectangle of a tile around the windows drawn into, so only that part is blended."""
+
+    __slots__ = ("r0", "r1", "c0", "c1")
+
+    def __init__(self):
+        self.r0 = self.c0 = np.inf
+        self.r1 = self.c1 = -np.inf
+
+    def __bool__(self):
+        return self.r1 > self.r0
+
+    def add(self, rows, cols):
+        self.r0, self.r1 = min(self.r0, rows.start), max(self.r1, rows.stop)
+        self.c0, self.c1 = min(self.c0, cols.start), max(self.c1, cols.stop)
+
+    @property
+    def slices(self):
+        return slice(self.r0, self.r1), slice(self.c0, self.c1)
+
+
+def _composite(out, coverage, color, alpha):
+    """Blends a color over the tile with per-pixel coverage (times the layer's alpha)."""
+    weight = (coverage * np.float32(alpha))[:, :, None]
+    out *= 1 - weight
+    out += weight * np.asarray(color, dtype=np.float32)
+
+
+def write_texture(renderer, paths, width, tile=TILE_SIZE, level=6):
+    """Rasterizes a CutoutRenderer ``width`` pixels wide into the files of ``paths`` ({"png"|"tiff": path}).
+
+    Returns the size and the timings of the render.
+    """
+    unknown = set(paths) - set(TEXTURE_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown texture format(s) {sorted(unknown)}, use {', '.join(TEXTURE_FORMATS)}")
+    start = time.perf_counter()
+    raster = TextureRaster(renderer, width, tile)
+    png = PngWriter(paths["png"], raster.width, raster.height, level) if "png" in paths else None
+    tiff = TiffWriter(paths["tiff"], raster.width, raster.height, tile, level) if "tiff" in paths else None
+    buffer = np.empty((tile, tile, 3), dtype=np.float32)
+    pixels = np.empty((tile, tile, 3), dtype=np.uint8)
+    rows = np.empty((tile, raster.width, 3), dtype=np.uint8) if png is not None else None
+    render_time = 0.0
+    try:
+        for y0 in range(0, raster.height, tile):
+            h = min(tile, raster.height - y0)
+            items = raster.band(y0, y0 + h)
+            for x0 in range(0, raster.width, tile):
+                w = min(tile, raster.width - x0)
+                started = time.perf_counter()
+                raster.render_tile(items, x0, y0, buffer[:h, :w])
+                np.multiply(buffer[:h, :w], 255, out=buffer[:h, :w])
+                np.add(buffer[:h, :w], 0.5, out=buffer[:h, :w])
+                tile_pixels = pixels[:h, :w]
+                np.copyto(tile_pixels, buffer[:h, :w], casting="unsafe")
+                render_time += time.perf_counter() - started
+                if tiff is not None:
+                    tiff.write_tile(tile_pixels)
+                if rows is not None:
+                    rows[:h, x0:x0 + w] = tile_pixels
+            if png is not None:
+                png.write_rows(rows[:h])
+    except BaseException:
+        for writer in (png, tiff):  # unfinished files stay as they are
+            if writer is not None:
+                writer.file.close()
+        raise
+    for writer in (png, tiff):
+        if writer is not None:
+            writer.close()
+    return {"width": raster.width, "height": raster.height, "tiles": len(raster),
+            "render_seconds": render_time, "seconds": time.perf_counter() - start}
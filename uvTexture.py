@@ -0,0 +1,42 @@
+import os
+
+import settings
+from cutoutRender import CutoutRenderer, add_cutout_layers, aspect_for, cutout_borders
+from geoio import read_intermediate
+from instrumentation import parse_profile_flag, peak_rss_mb, step
+from textureTiles import write_texture
+
+# The herd cutout of clusterStates_dots.py as a high-resolution UV texture for the lamp model
+# textureTiles renders the layers of the CutoutRenderer tile by tile and streams them to PNG and/or tiled TIFF, so a
+# 16k or 32k texture never has to fit into memory as a whole (settings.texture_width, texture_formats)
+# GeoPandas is used (in geoio and cutoutRender) to read the dots and the state borders
+
+# Command line: only --profile (instrumentation.py)
+parse_profile_flag("Render the cutout as a tiled high-resolution texture.")
+
+# File paths
+dots_path = settings.cutout_dots_path
+us_states_path = settings.us_states_path
+output_dir = settings.project_dir
+texture_paths = {fmt: settings.texture_paths[fmt] for fmt in settings.texture_formats}
+
+# ✅ Step 1: Load the final dots of clusterStates_dots.py and the state borders
+with step("read cutout dots") as s:
+    gdf_dots = read_intermediate(dots_path)
+    s.rows_out = len(gdf_dots)
+gdf_states, gdf_west = cutout_borders(us_states_path)
+
+# ✅ Step 2: The same layers as the cutout PNG and SVG (without the title), at the same aspect
+renderer = CutoutRenderer(24, 15, background="black", aspect=aspect_for(gdf_states))
+add_cutout_layers(renderer, gdf_dots, gdf_states, gdf_west)
+
+# ✅ Step 3: Rasterize tile by tile and stream the tiles to the texture files
+os.makedirs(output_dir, exist_ok=True)
+with step("render texture", rows_in=len(gdf_dots)) as s:
+    stats = write_texture(renderer, texture_paths, settings.texture_width, settings.texture_tile_size)
+    s.extra.update(stats)
+
+peak_rss = peak_rss_mb()  # None where it cannot be measured (Windows without psutil)
+memory = f", peak RSS {peak_rss:.0f} MB" if peak_rss is not None else ""
+print(f"✅ Texture {stats['width']} x {stats['height']} px ({stats['tiles']} tiles) in {stats['seconds']:.1f} s"
+      f"{memory}: {', '.join(texture_paths.values())}")